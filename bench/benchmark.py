@@ -0,0 +1,359 @@
+# pylint: disable=invalid-name
+# pylint: disable=line-too-long
+
+"""
+Benchmark suite for the stages of the digit trajectory workflow.
+
+Each stage (digit extraction, trajectory building, formatting, rendering) is run over a matrix
+of expressions, bases and numbers of digits. Every case runs in a fresh child process, so that
+its peak RSS is not polluted by the previous ones. The results are printed as a table and can be
+saved as JSON, then compared against a stored baseline to flag regressions.
+
+Usage
+-----
+python -m bench.benchmark --sizes 1000 10000 --output bench.json
+python -m bench.benchmark --compare bench.json --threshold 0.2
+
+Constants
+---------
+STAGES : list of str
+    Names of the benchmarked stages.
+DEFAULT_EXPRS : list of str
+    Default expressions: the main constants and a nested expression.
+DEFAULT_BASES : list of int
+    Default bases.
+DEFAULT_SIZES : list of int
+    Default numbers of digits.
+POLL_INTERVAL : float
+    Time waited for the measures of a case before checking that its child process is still alive (s).
+"""
+
+from queue import Empty
+from typing import Any, Dict, List, Optional, Tuple
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+
+STAGES        = ["extract", "trajectory", "format", "render", "raster"]
+DEFAULT_EXPRS = ["pi", "e", "phi", "apery", "1 - atan(log10(sqrt(euler**3 / apery**.6)))"]
+DEFAULT_BASES = [2, 10, 16, 123]
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+POLL_INTERVAL = 1.
+
+Case = Tuple[str, str, int, int]
+
+
+def get_peak_rss_mb() -> float:
+    """
+    Get the peak resident set size of the current process.
+
+    Returns
+    -------
+    peak_rss : float
+        Peak RSS, in MB.
+    """
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS, in kB elsewhere
+    return peak_rss / 2**20 if sys.platform == "darwin" else peak_rss / 2**10
+
+
+def run_stage(stage: str, expr: str, base: int, nb_digits: int) -> Dict[str, float]:
+    """
+    Run one stage on one case, and measure it. The inputs of the stage are prepared beforehand.
+
+    Parameters
+    ----------
+    stage : str
+        Name of the stage, in ``STAGES``.
+    expr : str
+        String expression representing a number.
+    base : int
+        Radix base.
+    nb_digits : int
+        Number of digits.
+
+    Returns
+    -------
+    measures : dict
+        Wall time (s) and peak RSS (MB) of the stage.
+    """
+    # pylint: disable=import-outside-toplevel
+    from core.compute_digits import evaluate_expr, get_points_from_digits
+    from utils.digits import get_nb_digits_base_10, get_digits_in_base, format_digit_sequence
+    from visu.plot_sequence import plot_sequence
+    from visu.raster import plot_sequence_raster
+
+    nb_digits_10 = get_nb_digits_base_10(base, nb_digits)
+    if stage == "extract":
+        def stage_fct() -> Any:
+            return get_digits_in_base(evaluate_expr(expr, nb_digits_10), base, nb_digits)
+    else:
+        digit_sequence = get_digits_in_base(evaluate_expr(expr, nb_digits_10), base, nb_digits)
+        pt_coords = get_points_from_digits(digit_sequence, base)
+        number_params = (expr, base, nb_digits)
+        stage_fcts = {
+            "trajectory": lambda: get_points_from_digits(digit_sequence, base),
+            "format":     lambda: format_digit_sequence(digit_sequence, base),
+            "render":     lambda: plot_sequence(pt_coords, number_params, bool_save=True),
+            "raster":     lambda: plot_sequence_raster(lambda: [pt_coords], number_params, bool_save=True),
+        }
+        stage_fct = stage_fcts[stage]
+
+    start = time.perf_counter()
+    stage_fct()
+    wall_time = time.perf_counter() - start
+
+    return {"time_s": wall_time, "peak_rss_mb": get_peak_rss_mb()}
+
+
+def run_case_in_child(case: Case, queue: Any) -> None:
+    """
+    Entry point of the child process running one case, in a temporary working directory.
+
+    Parameters
+    ----------
+    case : tuple
+        (stage, expr, base, nb_digits).
+    queue : multiprocessing.Queue
+        Queue receiving the measures, or the error message.
+    """
+    repo_dir = os.getcwd()
+    sys.path.insert(0, repo_dir)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.makedirs(os.path.join(tmp_dir, "out"))
+        os.chdir(tmp_dir)
+        try:
+            with open(os.devnull, mode="w", encoding="utf-8") as devnull:
+                sys.stdout = devnull
+                queue.put(run_stage(*case))
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            queue.put({"error": str(e)})
+        finally:
+            sys.stdout = sys.__stdout__
+            os.chdir(repo_dir)
+
+
+def wait_measure(process: Any, queue: Any, timeout: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Wait for the measures of a child process, which may crash (e.g. killed when out of memory) or hang.
+
+    Parameters
+    ----------
+    process : multiprocessing.Process
+        Started child process, see ``run_case_in_child``.
+    queue : multiprocessing.Queue
+        Queue receiving the measures, or the error message.
+    timeout : float, optional
+        Time after which the child process is terminated (s). If ``None`` (default), no limit.
+
+    Returns
+    -------
+    measure : dict
+        Measures of the child process, or error message.
+    """
+    start_time = time.perf_counter()
+    while True:
+        try:
+            measure = queue.get(timeout=POLL_INTERVAL)
+            break
+        except Empty:
+            if not process.is_alive():
+                # the measures may have been put right before the exit
+                try:
+                    measure = queue.get(timeout=POLL_INTERVAL)
+                except Empty:
+                    measure = {"error": f"child process exited with code {process.exitcode}"}
+                break
+            if timeout is not None and time.perf_counter() - start_time > timeout:
+                process.terminate()
+                measure = {"error": f"timeout after {timeout:g}s"}
+                break
+    process.join()
+    if "error" not in measure and process.exitcode != 0:
+        measure = {"error": f"child process exited with code {process.exitcode}"}
+
+    return measure
+
+
+def run_case(case: Case, nb_repeats: int = 1, timeout: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Run one case in fresh child processes, and keep the best of ``nb_repeats`` runs.
+
+    Parameters
+    ----------
+    case : tuple
+        (stage, expr, base, nb_digits).
+    nb_repeats : int, optional
+        Number of runs (default is 1).
+    timeout : float, optional
+        Time after which a run is stopped and the case failed (s). If ``None`` (default), no limit.
+
+    Returns
+    -------
+    result : dict
+        Case parameters, wall time (s), peak RSS (MB) and throughput (digits/s), or error message
+        if a run failed, crashed or timed out.
+    """
+    stage, expr, base, nb_digits = case
+    result: Dict[str, Any] = {"stage": stage, "expr": expr, "base": base, "nb_digits": nb_digits}
+    ctx = multiprocessing.get_context("spawn")
+    measures = []
+    for _ in range(nb_repeats):
+        queue = ctx.Queue()
+        process = ctx.Process(target=run_case_in_child, args=(case, queue))
+        process.start()
+        measure = wait_measure(process, queue, timeout)
+        if "error" in measure:
+            result["error"] = measure["error"]
+            return result
+        measures.append(measure)
+
+    best = min(measures, key=lambda measure: measure["time_s"])
+    result.update(best)
+    result["digits_per_s"] = nb_digits / best["time_s"] if best["time_s"] > 0 else float("inf")
+
+    return result
+
+
+def compare_results(results: List[Dict[str, Any]], baseline: List[Dict[str, Any]],
+                    threshold: float) -> List[Dict[str, Any]]:
+    """
+    Find the cases slower than in a baseline by more than a given relative threshold.
+
+    Parameters
+    ----------
+    results : list of dict
+        Current results.
+    baseline : list of dict
+        Stored results.
+    threshold : float
+        Relative slowdown above which a case is a regression (e.g. 0.2 for +20%).
+
+    Returns
+    -------
+    regressions : list of dict
+        Current results of the regressed cases, with their ``baseline_time_s`` and ``slowdown``.
+    """
+    def key(result: Dict[str, Any]) -> Case:
+        return (result["stage"], result["expr"], result["base"], result["nb_digits"])
+
+    baseline_times = {key(result): result["time_s"] for result in baseline if "time_s" in result}
+    regressions = []
+    for result in results:
+        baseline_time = baseline_times.get(key(result))
+        if baseline_time is None or "time_s" not in result:
+            continue
+        slowdown = result["time_s"] / baseline_time - 1 if baseline_time > 0 else 0.
+        if slowdown > threshold:
+            regressions.append({**result, "baseline_time_s": baseline_time, "slowdown": slowdown})
+
+    return regressions
+
+
+def print_result(result: Dict[str, Any]) -> None:
+    """
+    Print one result as a row of the results table.
+
+    Parameters
+    ----------
+    result : dict
+        Result of one case, see ``run_case``.
+    """
+    expr = result["expr"] if len(result["expr"]) <= 20 else result["expr"][:17] + "..."
+    row = f"{result['stage']:<10} {expr:<20} {result['base']:>4} {result['nb_digits']:>10}"
+    if "error" in result:
+        print(f"{row}  error: {result['error'].splitlines()[0]}")
+    else:
+        print(f"{row} {result['time_s']:>10.4f} {result['peak_rss_mb']:>9.1f} {result['digits_per_s']:>14,.0f}")
+
+
+def get_metadata() -> Dict[str, Any]:
+    """
+    Get the description of the benchmark environment.
+
+    Returns
+    -------
+    metadata : dict
+        Python, NumPy and mpmath versions, mpmath backend and machine description.
+    """
+    # pylint: disable=import-outside-toplevel
+    import numpy as np
+    import mpmath
+    from mpmath.libmp import BACKEND
+
+    return {"python": platform.python_version(), "numpy": np.__version__, "mpmath": mpmath.__version__,
+            "mpmath_backend": BACKEND, "machine": platform.platform(), "cpu_count": os.cpu_count(),
+            "date": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Parse command-line arguments, run the benchmark matrix and report the results.
+
+    Parameters
+    ----------
+    argv : list of str, optional
+        Command-line arguments (default is ``sys.argv[1:]``).
+
+    Returns
+    -------
+    exit_code : int
+        1 if regressions were found in compare mode, 0 otherwise.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the stages of the digit trajectory workflow.")
+    parser.add_argument("-s", "--stages", nargs="+", choices=STAGES, default=STAGES,
+                        help=f"stage(s) to benchmark. Default is all: {' '.join(STAGES)}")
+    parser.add_argument("-e", "--expr", nargs="+", type=str, default=DEFAULT_EXPRS, dest="exprs",
+                        help="expression(s) to benchmark. Default is pi, e, phi, apery and a nested expression")
+    parser.add_argument("-b", "--bases", nargs="+", type=int, default=DEFAULT_BASES,
+                        help=f"base(s) to benchmark. Default is {' '.join(map(str, DEFAULT_BASES))}")
+    parser.add_argument("-d", "--sizes", nargs="+", type=int, default=DEFAULT_SIZES,
+                        help=f"number(s) of digits to benchmark. Default is {' '.join(map(str, DEFAULT_SIZES))}")
+    parser.add_argument("-r", "--repeat", type=int, default=1,
+                        help="number of runs per case, the fastest one is kept. Default is 1")
+    parser.add_argument("-o", "--output", type=str, default=None,
+                        help="if given, save the results as JSON in this file")
+    parser.add_argument("--compare", type=str, default=None,
+                        help="if given, compare the results against this baseline JSON file and flag regressions")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="relative slowdown above which a case is a regression in compare mode. Default is 0.2")
+    parser.add_argument("--timeout", type=float, default=None,
+                        help="if given, time in seconds after which a run is stopped and its case reported as failed")
+    args = parser.parse_args(argv)
+
+    print(f"{'stage':<10} {'expr':<20} {'base':>4} {'digits':>10} {'time (s)':>10} {'RSS (MB)':>9} {'digits/s':>14}")
+    results = []
+    for stage in args.stages:
+        for expr in args.exprs:
+            for base in args.bases:
+                for nb_digits in args.sizes:
+                    result = run_case((stage, expr, base, nb_digits), args.repeat, args.timeout)
+                    print_result(result)
+                    results.append(result)
+
+    if args.output:
+        with open(args.output, mode="w", encoding="utf-8") as f:
+            json.dump({"metadata": get_metadata(), "results": results}, f, indent=2)
+        print(f"Results saved: {args.output}")
+
+    if args.compare:
+        with open(args.compare, mode="r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare_results(results, baseline, args.threshold)
+        print(f"{len(regressions)} regression(s) above +{args.threshold:.0%} against {args.compare}")
+        for regression in regressions:
+            print(f"  {regression['stage']} {regression['expr']} base {regression['base']} {regression['nb_digits']} digits:"
+                  + f" {regression['baseline_time_s']:.4f}s -> {regression['time_s']:.4f}s (+{regression['slowdown']:.0%})")
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
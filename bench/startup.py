@@ -0,0 +1,207 @@
+# pylint: disable=invalid-name
+# pylint: disable=line-too-long
+
+"""
+Startup-time benchmark of the command-line entry point.
+
+Each scenario runs ``digit_explorer.py`` in fresh interpreters: the fastest of several runs gives
+its wall time, and one more run with ``python -X importtime`` tells which heavy modules it imported.
+A scenario fails if it imports a module it does not need (e.g. matplotlib for ``--list`` or for a
+run that neither saves nor shows an image), or if it takes longer than the time budget.
+
+Usage
+-----
+python -m bench.startup
+python -m bench.startup --repeat 10 --max-time 0.4 --output startup.json
+
+Constants
+---------
+HEAVY_MODULES : list of str
+    Top-level modules whose import is tracked.
+SCENARIOS : dict
+    Names of the scenarios mapped to their command-line arguments and forbidden modules.
+DEFAULT_MAX_TIME : float
+    Default time budget of a scenario, in seconds.
+"""
+
+from typing import Any, Dict, List, Optional, Set
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench.benchmark import get_metadata
+
+HEAVY_MODULES    = ["matplotlib", "mpl_toolkits", "mpmath", "numpy"]
+SCENARIOS        = {
+    "help":   {"args": ["--help"], "forbidden": ["matplotlib", "mpl_toolkits"]},
+    "list":   {"args": ["--list"], "forbidden": ["matplotlib", "mpl_toolkits"]},
+    "digits": {"args": ["-d", "1000", "--no-save", "--disp", "--no-cache"], "forbidden": ["matplotlib", "mpl_toolkits"]},
+    "cached": {"args": ["-d", "1000", "--no-save", "--disp", "--cache-dir", "cache"], "forbidden": ["matplotlib", "mpl_toolkits"]},
+}
+DEFAULT_MAX_TIME = 0.5
+
+
+def run_cli(args: List[str], cwd: str, bool_importtime: bool = False) -> subprocess.CompletedProcess:
+    """
+    Run the command-line entry point once, in a fresh interpreter.
+
+    Parameters
+    ----------
+    args : list of str
+        Command-line arguments of ``digit_explorer.py``.
+    cwd : str
+        Working directory of the run.
+    bool_importtime : bool, optional
+        If ``True``, run with ``-X importtime``, which prints the imports on stderr (default is ``False``).
+
+    Returns
+    -------
+    process : subprocess.CompletedProcess
+        Finished process, with its captured stderr.
+    """
+    script = os.path.join(os.getcwd(), "digit_explorer.py")
+    flags = ["-X", "importtime"] if bool_importtime else []
+    env = {**os.environ, "PYTHONPATH": os.getcwd()}
+
+    return subprocess.run([sys.executable, *flags, script, *args], cwd=cwd, env=env, check=False,
+                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+
+
+def get_imported_modules(importtime_log: str) -> Set[str]:
+    """
+    Find the heavy modules imported by a run, from the output of ``-X importtime``.
+
+    Parameters
+    ----------
+    importtime_log : str
+        Standard error of a run with ``-X importtime``.
+
+    Returns
+    -------
+    modules : set of str
+        Modules of ``HEAVY_MODULES`` imported by the run.
+    """
+    modules = set()
+    for line in importtime_log.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            package = line.rsplit("|", 1)[1].strip().split(".")[0]
+            if package in HEAVY_MODULES:
+                modules.add(package)
+
+    return modules
+
+
+def run_scenario(name: str, cwd: str, nb_repeats: int, max_time: float) -> Dict[str, Any]:
+    """
+    Time one scenario, and check the modules it imports.
+
+    Parameters
+    ----------
+    name : str
+        Name of the scenario, in ``SCENARIOS``.
+    cwd : str
+        Working directory of the runs.
+    nb_repeats : int
+        Number of timed runs, the fastest one is kept.
+    max_time : float
+        Time budget of the scenario, in seconds.
+
+    Returns
+    -------
+    result : dict
+        Scenario name, best wall time (s), imported heavy modules, unexpected modules and errors.
+    """
+    scenario = SCENARIOS[name]
+    result: Dict[str, Any] = {"scenario": name, "args": scenario["args"]}
+    # a first run warms up the cache of the "cached" scenario, and the bytecode of every scenario
+    process = run_cli(scenario["args"], cwd, bool_importtime=True)
+    if process.returncode != 0:
+        result["error"] = (process.stderr.strip().splitlines() or [f"exit code {process.returncode}"])[-1]
+        return result
+
+    times = []
+    for _ in range(nb_repeats):
+        start = time.perf_counter()
+        run_cli(scenario["args"], cwd)
+        times.append(time.perf_counter() - start)
+    modules = get_imported_modules(run_cli(scenario["args"], cwd, bool_importtime=True).stderr)
+
+    result["time_s"] = min(times)
+    result["modules"] = sorted(modules)
+    result["unexpected"] = sorted(modules.intersection(scenario["forbidden"]))
+    result["over_budget"] = result["time_s"] > max_time
+
+    return result
+
+
+def print_result(result: Dict[str, Any]) -> None:
+    """
+    Print one result as a row of the results table.
+
+    Parameters
+    ----------
+    result : dict
+        Result of one scenario, see ``run_scenario``.
+    """
+    row = f"{result['scenario']:<8}"
+    if "error" in result:
+        print(f"{row}  error: {result['error']}")
+        return
+
+    issues = [f"imports {', '.join(result['unexpected'])}"] if result["unexpected"] else []
+    issues += ["over budget"] if result["over_budget"] else []
+    print(f"{row} {result['time_s']:>10.3f}  {', '.join(result['modules']) or '-':<30} {'; '.join(issues) or 'ok'}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Parse command-line arguments, run the startup scenarios and report the results.
+
+    Parameters
+    ----------
+    argv : list of str, optional
+        Command-line arguments (default is ``sys.argv[1:]``).
+
+    Returns
+    -------
+    exit_code : int
+        1 if a scenario failed, imported a forbidden module or exceeded its budget, 0 otherwise.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the startup time of digit_explorer.py.")
+    parser.add_argument("-s", "--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS),
+                        help=f"scenario(s) to benchmark. Default is all: {' '.join(SCENARIOS)}")
+    parser.add_argument("-r", "--repeat", type=int, default=5,
+                        help="number of timed runs per scenario, the fastest one is kept. Default is 5")
+    parser.add_argument("--max-time", type=float, default=DEFAULT_MAX_TIME,
+                        help=f"time budget of each scenario, in seconds. Default is {DEFAULT_MAX_TIME}")
+    parser.add_argument("-o", "--output", type=str, default=None,
+                        help="if given, save the results as JSON in this file")
+    args = parser.parse_args(argv)
+
+    print(f"{'scenario':<8} {'time (s)':>10}  {'heavy modules':<30} status")
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # runs happen in a scratch directory, with their own digit cache
+        os.makedirs(os.path.join(tmp_dir, "out"))
+        for name in args.scenarios:
+            result = run_scenario(name, tmp_dir, args.repeat, args.max_time)
+            print_result(result)
+            results.append(result)
+
+    if args.output:
+        with open(args.output, mode="w", encoding="utf-8") as f:
+            json.dump({"metadata": get_metadata(), "max_time_s": args.max_time, "results": results}, f, indent=2)
+        print(f"Results saved: {args.output}")
+
+    failures = [result for result in results if "error" in result or result["unexpected"] or result["over_budget"]]
+    print(f"{len(failures)} scenario(s) failed out of {len(results)}")
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,303 @@
+"""
+Statistics of digit trajectories, computed without drawing them.
+
+The metrics of a trajectory (displacement, extent, time spent per quadrant, returns to the origin,
+digit frequencies) are accumulated chunk by chunk over its points, with vectorized NumPy passes, so
+that memory stays bounded whatever the number of digits. The metrics of every requested prefix of a
+sequence are snapshots taken during a single pass over its longest prefix.
+
+Each trajectory is compared with the null model of a random walk, whose steps are drawn uniformly
+among the ``base`` unit directions:
+- the digit counts are tested against the uniform distribution with a chi-square test;
+- the final displacement ``S`` after ``n`` steps is tested with its Mahalanobis norm
+  ``S^T (n C)^-1 S``, ``C`` being the covariance of one step, which asymptotically follows a
+  chi-square law with as many degrees of freedom as the steps span dimensions (1 in base 2, 2 above).
+
+The quadrants and the returns to the origin depend on exact zero coordinates. In bases 2, 4 and 8,
+the path is followed on integer lattice coordinates (see ``utils.plot.LATTICE_STEPS``), so that they
+are exact. In the other bases, a coordinate is 0 below a tolerance growing with the number of steps,
+as the floating-point drift of the cumulative sum does.
+
+Tables of statistics are saved either as CSV, or as NumPy columnar arrays (one array per column, ``.npz``).
+
+Constants
+---------
+DRIFT_PER_STEP : float
+    Floating-point drift allowed per step on a coordinate of a non-lattice base: after ``k`` steps,
+    a coordinate below ``k * DRIFT_PER_STEP`` is considered to be 0.
+EIGENVALUE_TOLERANCE : float
+    Eigenvalue below which a direction of the covariance of one step is considered to be null.
+"""
+
+from typing import Iterable, List, NamedTuple, Tuple
+import csv
+import math
+
+import numpy as np
+
+from core.compute_digits import get_points_from_digits
+from utils.plot import LATTICE_STEPS, compute_steps
+from utils.profiling import profile_stage
+
+DRIFT_PER_STEP       = 2.**-40
+EIGENVALUE_TOLERANCE = 1e-6
+
+
+class TrajectoryStats(NamedTuple):
+    """
+    Statistics of the trajectory of a digit sequence.
+
+    Attributes
+    ----------
+    expr : str
+        Expression of the sequence.
+    base : int
+        Radix base of the digits.
+    nb_digits : int
+        Number of digits (steps) of the sequence.
+    start : int
+        Index of the first digit of the sequence, 0 being the first decimal place.
+    final_x, final_y : float
+        Coordinates of the last point of the trajectory.
+    final_displacement : float
+        Distance between the last point and the origin.
+    max_radius : float
+        Largest distance between a point and the origin.
+    x_min, x_max, y_min, y_max : float
+        Bounding box of the trajectory, origin included.
+    quadrant_1, quadrant_2, quadrant_3, quadrant_4 : float
+        Fraction of the points (after each step) in each quadrant, counterclockwise from
+        ``x > 0, y >= 0``. Points at the origin belong to no quadrant.
+    nb_origin_returns : int
+        Number of steps ending at the origin.
+    chi2 : float
+        Chi-square statistic of the digit counts against the uniform distribution.
+    chi2_pvalue : float
+        Probability of a larger chi-square statistic for random digits.
+    displacement_ratio : float
+        Final displacement divided by ``sqrt(nb_digits)``, about 1 for a random walk.
+    displacement_pvalue : float
+        Probability of a larger final displacement for a random walk.
+    max_radius_ratio : float
+        Largest distance to the origin divided by ``sqrt(nb_digits)``.
+    """
+    expr: str
+    base: int
+    nb_digits: int
+    start: int
+    final_x: float
+    final_y: float
+    final_displacement: float
+    max_radius: float
+    x_min: float
+    x_max: float
+    y_min: float
+    y_max: float
+    quadrant_1: float
+    quadrant_2: float
+    quadrant_3: float
+    quadrant_4: float
+    nb_origin_returns: int
+    chi2: float
+    chi2_pvalue: float
+    displacement_ratio: float
+    displacement_pvalue: float
+    max_radius_ratio: float
+
+
+def get_chi2_pvalue(chi2: float, nb_dof: int) -> float:
+    """
+    Compute the survival function of the chi-square law, with the Wilson-Hilferty approximation.
+
+    Parameters
+    ----------
+    chi2 : float
+        Chi-square statistic.
+    nb_dof : int
+        Number of degrees of freedom.
+
+    Returns
+    -------
+    pvalue : float
+        Approximate probability of a larger statistic. Exact for 1 and 2 degrees of freedom.
+    """
+    if nb_dof == 1:
+        return math.erfc(math.sqrt(chi2 / 2))
+    if nb_dof == 2:
+        return math.exp(-chi2 / 2)
+    # the cube root of chi2/k is nearly normal
+    variance = 2 / (9*nb_dof)
+    z = ((chi2 / nb_dof)**(1/3) - (1 - variance)) / math.sqrt(variance)
+
+    return .5 * math.erfc(z / math.sqrt(2))
+
+
+def get_step_precision(base: int) -> Tuple[np.ndarray, int]:
+    """
+    Compute the inverse covariance of one step of the random walk of a given base.
+
+    Parameters
+    ----------
+    base : int
+        Radix base (number of possible directions).
+
+    Returns
+    -------
+    precision : ndarray of float
+        Pseudo-inverse of the 2x2 covariance of one step.
+    nb_dof : int
+        Rank of the covariance: 1 if the steps are collinear (base 2), 2 otherwise.
+    """
+    dxs, dys = compute_steps(base)
+    steps = np.stack((dxs, dys))
+    covariance = steps @ steps.T / base
+    eigenvalues, eigenvectors = np.linalg.eigh(covariance)
+    is_kept = eigenvalues > EIGENVALUE_TOLERANCE
+    kept_vectors = eigenvectors[:, is_kept]
+
+    return (kept_vectors @ np.diag(1 / eigenvalues[is_kept]) @ kept_vectors.T, int(is_kept.sum()))
+
+
+def get_lattice_signs(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Compute the exact signs of lattice coordinates ``a + b*sqrt(2)/2``, ``a`` and ``b`` being integers.
+
+    Parameters
+    ----------
+    a, b : ndarray of int
+        Integer and diagonal parts of the coordinates, see ``utils.plot.LATTICE_STEPS``.
+
+    Returns
+    -------
+    signs : ndarray of int
+        -1, 0 or 1 per coordinate, 0 only if ``a`` and ``b`` are both 0 (sqrt(2) being irrational).
+    """
+    sign_a, sign_b = np.sign(a), np.sign(b)
+    # with opposite signs, the part of largest magnitude wins: |a| > |b|*sqrt(2)/2 iff 2a^2 > b^2
+    return np.where(sign_a * sign_b >= 0, np.where(sign_a != 0, sign_a, sign_b),
+                    sign_a * np.sign(2*a*a - b*b))
+
+
+def compute_trajectory_stats(digit_chunks: Iterable[np.ndarray], expr: str, base: int, digits: List[int],
+                             start: int = 0) -> List[TrajectoryStats]:
+    """
+    Compute the statistics of the trajectories of several prefixes of a digit sequence, in a single pass.
+
+    Parameters
+    ----------
+    digit_chunks : iterable of ndarray of int
+        Consecutive chunks of digits, at least ``max(digits)`` digits in total.
+    expr : str
+        Expression of the sequence.
+    base : int
+        Radix base of the digits.
+    digits : list of int
+        Numbers of digits of the prefixes.
+    start : int, optional
+        Index of the first digit of the sequence (default is 0).
+
+    Returns
+    -------
+    stats : list of TrajectoryStats
+        Statistics of each prefix, in the order of ``digits``.
+
+    Raises
+    ------
+    ValueError
+        If the sequence is shorter than a prefix.
+    """
+    checkpoints = sorted(set(digits))
+    precision, nb_dof = get_step_precision(base)
+    snapshots = {}
+    nb_steps = 0
+    last_point = (0., 0.)
+    max_radius2 = 0.
+    bounds = [0., 0., 0., 0.]
+    quadrant_counts = np.zeros(4, dtype=np.int64)
+    nb_origin_returns = 0
+    digit_counts = np.zeros(base, dtype=np.int64)
+    lattice_steps = np.array(LATTICE_STEPS[base], dtype=np.int64) if base in LATTICE_STEPS else None
+    lattice_position = np.zeros(4, dtype=np.int64)
+
+    def add_steps(chunk: np.ndarray) -> None:
+        nonlocal nb_steps, last_point, max_radius2, nb_origin_returns
+        if lattice_steps is not None:
+            positions = np.cumsum(lattice_steps[chunk], axis=0)
+            positions += lattice_position
+            lattice_position[:] = positions[-1]
+            half_sqrt2 = np.sqrt(2)/2
+            xs = positions[:, 0] + half_sqrt2*positions[:, 2]
+            ys = positions[:, 1] + half_sqrt2*positions[:, 3]
+            x_signs = get_lattice_signs(positions[:, 0], positions[:, 2])
+            y_signs = get_lattice_signs(positions[:, 1], positions[:, 3])
+        else:
+            xs, ys = get_points_from_digits(chunk, base, start=last_point)
+            xs, ys = xs[1:], ys[1:]
+            # coordinates within the drift accumulated since the origin lie on the axes
+            tolerances = DRIFT_PER_STEP * np.arange(nb_steps + 1, nb_steps + len(chunk) + 1)
+            x_signs = np.where(np.abs(xs) < tolerances, 0, np.sign(xs))
+            y_signs = np.where(np.abs(ys) < tolerances, 0, np.sign(ys))
+        last_point = (float(xs[-1]), float(ys[-1]))
+        nb_steps += len(chunk)
+        max_radius2 = max(max_radius2, float((xs*xs + ys*ys).max()))
+        bounds[:] = (min(bounds[0], xs.min()), max(bounds[1], xs.max()),
+                     min(bounds[2], ys.min()), max(bounds[3], ys.max()))
+        quadrant_counts[:] += (np.count_nonzero((x_signs > 0) & (y_signs >= 0)),
+                               np.count_nonzero((x_signs <= 0) & (y_signs > 0)),
+                               np.count_nonzero((x_signs < 0) & (y_signs <= 0)),
+                               np.count_nonzero((x_signs >= 0) & (y_signs < 0)))
+        nb_origin_returns += np.count_nonzero((x_signs == 0) & (y_signs == 0))
+        digit_counts[:] += np.bincount(chunk, minlength=base)[:base]
+
+    def take_snapshot() -> TrajectoryStats:
+        final_x, final_y = last_point
+        final_displacement = math.hypot(final_x, final_y)
+        expected_count = nb_steps / base
+        chi2 = float(((digit_counts - expected_count)**2).sum() / expected_count)
+        final_point = np.array(last_point)
+        mahalanobis2 = float(final_point @ precision @ final_point) / nb_steps
+        return TrajectoryStats(expr, base, nb_steps, start, final_x, final_y, final_displacement,
+                               math.sqrt(max_radius2), *map(float, bounds), *(quadrant_counts / nb_steps).tolist(),
+                               int(nb_origin_returns), chi2, get_chi2_pvalue(chi2, base - 1),
+                               final_displacement / math.sqrt(nb_steps), get_chi2_pvalue(mahalanobis2, nb_dof),
+                               math.sqrt(max_radius2 / nb_steps))
+
+    with profile_stage("statistics", checkpoints[-1] if checkpoints else 0):
+        remaining_checkpoints = [checkpoint for checkpoint in checkpoints if checkpoint > 0]
+        for chunk in digit_chunks:
+            chunk = np.asarray(chunk)
+            # the chunk is cut at the checkpoints it crosses
+            while len(chunk) and remaining_checkpoints:
+                nb_taken = min(len(chunk), remaining_checkpoints[0] - nb_steps)
+                add_steps(chunk[:nb_taken])
+                chunk = chunk[nb_taken:]
+                if nb_steps == remaining_checkpoints[0]:
+                    snapshots[remaining_checkpoints.pop(0)] = take_snapshot()
+            if not remaining_checkpoints:
+                break
+        if remaining_checkpoints:
+            raise ValueError(f"Only {nb_steps:,} digits of {expr} in base {base}, not {remaining_checkpoints[0]:,}")
+
+    return [snapshots[nb_digits] for nb_digits in digits]
+
+
+def save_stats_table(stats: List[TrajectoryStats], path: str) -> None:
+    """
+    Save a table of trajectory statistics, one row per sequence.
+
+    Parameters
+    ----------
+    stats : list of TrajectoryStats
+        Statistics of the sequences.
+    path : str
+        Path of the table: NumPy columnar arrays if it ends with ``.npz``, CSV otherwise.
+    """
+    if path.endswith(".npz"):
+        columns = {field: np.array([getattr(row, field) for row in stats]) for field in TrajectoryStats._fields}
+        np.savez(path, **columns)
+        return
+
+    with open(path, mode="w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(TrajectoryStats._fields)
+        writer.writerows(stats)
@@ -0,0 +1,151 @@
+"""
+Persistent on-disk cache of digit sequences.
+
+Each entry holds the longest sequence computed so far for a (normalized expression, base) pair,
+as a packed ``.npy`` array of the smallest unsigned integer type able to hold the digits.
+Any shorter prefix is then read from it through a memory map, without calling mpmath.
+The cache is bounded in size: the least recently used entries are evicted first.
+
+Constants
+---------
+DEFAULT_CACHE_DIR : str
+    Default directory of the cache.
+DEFAULT_CACHE_SIZE : int
+    Default maximal size of the cache, in bytes.
+"""
+
+from typing import Optional
+import hashlib
+import os
+
+import numpy as np
+
+from utils.digits import get_digit_dtype
+from utils.expression import normalize_expr
+
+DEFAULT_CACHE_DIR  = os.path.join(os.path.expanduser("~"), ".cache", "digit_explorer")
+DEFAULT_CACHE_SIZE = 1 << 30
+
+
+def get_cache_path(cache_dir: str, expr: str, base: int) -> str:
+    """
+    Build the path of the cache entry of an expression in a given base.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Directory of the cache.
+    expr : str
+        String expression representing a number.
+    base : int
+        Radix base of the digits.
+
+    Returns
+    -------
+    path : str
+        Path of the ``.npy`` file, named after a hash of the normalized expression and the base.
+    """
+    key = hashlib.sha256(f"{normalize_expr(expr)}\n{base}".encode("utf-8")).hexdigest()[:32]
+
+    return os.path.join(cache_dir, f"{key}.npy")
+
+
+def load_digits(cache_dir: str, expr: str, base: int, nb_digits: Optional[int] = None
+                ) -> Optional[np.ndarray]:
+    """
+    Load the first ``nb_digits`` digits of an expression from the cache, if available.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Directory of the cache.
+    expr : str
+        String expression representing a number.
+    base : int
+        Radix base of the digits.
+    nb_digits : int, optional
+        Number of digits needed. If ``None`` (default), load all the cached digits.
+
+    Returns
+    -------
+    digit_sequence : ndarray of uint or None
+        Read-only memory-mapped array of digits, or ``None`` if the cache holds fewer digits.
+    """
+    path = get_cache_path(cache_dir, expr, base)
+    try:
+        digits = np.load(path, mmap_mode="r")
+    except (OSError, ValueError):
+        return None
+    if nb_digits is not None and len(digits) < nb_digits:
+        return None
+
+    # mark the entry as recently used
+    os.utime(path)
+
+    return digits[:nb_digits]
+
+
+def store_digits(cache_dir: str, expr: str, base: int, digit_sequence: np.ndarray,
+                 max_size: int = DEFAULT_CACHE_SIZE) -> None:
+    """
+    Store a digit sequence in the cache, unless a longer one is already there.
+
+    The file is written atomically, then the least recently used entries are evicted until
+    the cache fits in ``max_size`` bytes.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Directory of the cache.
+    expr : str
+        String expression representing a number.
+    base : int
+        Radix base of the digits.
+    digit_sequence : ndarray of int
+        Array of digits to store.
+    max_size : int, optional
+        Maximal size of the cache, in bytes (default is ``DEFAULT_CACHE_SIZE``).
+    """
+    if load_digits(cache_dir, expr, base, len(digit_sequence)) is not None:
+        return
+
+    os.makedirs(cache_dir, exist_ok=True)
+    path = get_cache_path(cache_dir, expr, base)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, mode="wb") as f:
+        np.save(f, np.asarray(digit_sequence, dtype=get_digit_dtype(base)))
+    os.replace(tmp_path, path)
+
+    evict_entries(cache_dir, max_size, keep=path)
+
+
+def evict_entries(cache_dir: str, max_size: int, keep: Optional[str] = None) -> None:
+    """
+    Delete the least recently used cache entries until the cache fits in ``max_size`` bytes.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Directory of the cache.
+    max_size : int
+        Maximal size of the cache, in bytes.
+    keep : str, optional
+        Path of an entry that must not be evicted (typically the one just stored).
+    """
+    entries = []
+    for entry in os.scandir(cache_dir):
+        if entry.name.endswith(".npy"):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+    total_size = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total_size <= max_size:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total_size -= size
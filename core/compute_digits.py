@@ -5,43 +5,71 @@ This module provides functions to extract digit sequences of mathematical consta
 arbitrary bases, and to convert those sequences into xy-plane coordinates for visualization.
 """
 
-from typing import Tuple, Any
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union, Any
+import glob
+import os
+import shutil
+import sys
 
 import numpy as np
-from mpmath import mp, floor, log10, fabs
+from mpmath import mp, mpf, floor, log10, fabs, ldexp
 
-from utils.digits import get_nb_digits_base_10, get_digits_in_base, format_digit_sequence
-from utils.plot import compute_steps, compute_points
-from utils.expression import parse_expr, build_basename
+from utils.digits import (DIGIT_CHUNK_SIZE, get_nb_digits_base_10, get_nb_certified_digits, get_digit_dtype,
+                          get_digits_in_base, get_digits_window, iter_chunks, write_digit_sequence,
+                          get_row_length, parse_digit_sequence)
+from utils.plot import LATTICE_STEPS, compute_steps, compute_points, compute_lattice_points, iter_points
+from utils.constants import FAST_CONSTANTS, get_fast_constant
+from utils.expression import parse_expr, build_basename, normalize_expr, get_window_label
+from utils.profiling import profile_stage
+from utils.pyramid import LOD_EXTENSION, TrajectoryPyramid, build_pyramid, save_pyramid
+from utils.packed import PACKED_EXTENSION, write_packed_sequence, load_packed_sequence, iter_packed_sequence
+from utils.spigot import iter_spigot_digits
 
-def compute_digit_sequence(expr: str, base: int, nb_digits: int,
-                           bool_disp: bool = False, bool_save: bool = True
-                           ) -> np.ndarray:  # type: ignore
+# number of already known digits recomputed when a sequence is extended, to check the join
+EXTENSION_OVERLAP = 32
+
+# extra base-10 digits of precision, and maximal number of times they are doubled to certify digits
+GUARD_DIGITS    = 10
+MAX_ESCALATIONS = 4
+
+# relative error bound of a Python float result, a few ulps to allow for intermediate roundings
+FLOAT_ERROR_BITS = 50
+
+def evaluate_expr(expr: str, nb_digits_10: int, guard_digits: int = GUARD_DIGITS) -> Any:
     """
-    Compute the first ``nb_digits`` digits of a constant in a given base.
+    Evaluate an expression with enough precision to get ``nb_digits_10`` decimal places.
+
+    This sets the global ``mp.dps`` accordingly. Bare constants of ``FAST_CONSTANTS``
+    (e.g. ``"pi"``) are computed by their dedicated generator instead.
 
     Parameters
     ----------
     expr : str
         String expression representing a number.
-    base : int
-        Radix base for conversion.
-    nb_digits : int
-        Number of digits to extract in the given base.
-    bool_save : bool
-        If ``True``, save the digit sequence in a text file
+    nb_digits_10 : int
+        Number of base-10 decimal places needed.
+    guard_digits : int, optional
+        Number of extra decimal places computed, so that the last needed ones are not
+        spoiled by rounding (default is ``GUARD_DIGITS``).
 
     Returns
     -------
-    digit_sequence : ndarray of int
-        Array of digits in the given base.
+    number : mpmath.mpf
+        Value of the expression.
     """
+    name = normalize_expr(expr)
+    if name in FAST_CONSTANTS:
+        mp.dps = max(15, nb_digits_10 + guard_digits + 1)
+        with profile_stage("evaluate", nb_digits_10):
+            return get_fast_constant(name, nb_digits_10 + guard_digits)
 
     # convert expression into rough mpf number.
     # on the first iteration, eval() uses the default precision (15 significant digits);
     # so we will need to re-eval() later with the precision needed.
-    # Fortunately we just need the whole part here
-    number_rough = parse_expr(expr)
+    # Fortunately we just need the whole part here (and the expression is compiled once, for both)
+    mp.dps = 15
+    with profile_stage("parse_expr"):
+        number_rough = parse_expr(expr)
 
     # compute precision in base 10.
     # mp.dps is the number of significant digits, including the whole part,
@@ -50,31 +78,428 @@ def compute_digit_sequence(expr: str, base: int, nb_digits: int,
     # if   1 <= |x|,       shift = number of digits in int(|x|)
     # if 0.1 <= |x| < 1,   shift = 0
     # if        |x| < 0.1, shift = -1*(number of leading 0s in the decimal places)
-    nb_digits_10 = get_nb_digits_base_10(base, nb_digits)
-    shift = floor(log10(fabs(number_rough))) + 1
-    mp.dps = nb_digits_10 + shift
-    number = parse_expr(expr)
+    shift = floor(log10(fabs(number_rough))) + 1 if number_rough else 0
+    mp.dps = max(15, nb_digits_10 + guard_digits + int(shift))
+    with profile_stage("evaluate", mp.dps):
+        number = parse_expr(expr)
 
-    # compute base-b digit sequence
-    digit_sequence = get_digits_in_base(number, base, nb_digits)
+    return number
 
-    # show or display sequence?
-    if bool_save or bool_disp:
-        sequence_block = format_digit_sequence(digit_sequence, base)
+
+def evaluate_certified(expr: str, bases: List[int], nb_digits: Union[int, Dict[int, int]],
+                       guard_digits: int = GUARD_DIGITS, max_escalations: int = MAX_ESCALATIONS
+                       ) -> Tuple[Any, Dict[int, int]]:
+    """
+    Evaluate an expression, and certify its first ``nb_digits`` digits in each base.
+
+    The expression is evaluated with ``guard_digits`` extra decimal places, then once more with
+    twice as many: their difference bounds the error of the first value. The guard is only doubled
+    again while the digits of some base are ambiguous at this error, e.g. because they end with
+    a long run of ``base - 1`` digits. Bare constants of ``FAST_CONSTANTS`` have a known error
+    bound, and are evaluated once. Expressions of plain Python numbers (e.g. ``"1/3"``) do not
+    depend on the precision: an ``int`` is exact, and a ``float`` is only certified to float precision.
+    A value that is exactly 0 at both precisions has only 0 digits.
+
+    Parameters
+    ----------
+    expr : str
+        String expression representing a number.
+    bases : list of int
+        Radix bases of the digits.
+    nb_digits : int or dict
+        Number of digits to certify in each base, or per base.
+    guard_digits : int, optional
+        Initial number of extra decimal places (default is ``GUARD_DIGITS``).
+    max_escalations : int, optional
+        Maximal number of times the guard is doubled (default is ``MAX_ESCALATIONS``).
+
+    Returns
+    -------
+    number : mpmath.mpf
+        Value of the expression.
+    nb_certified : dict
+        Number of certified digits, at most ``nb_digits``, per base.
+    """
+    targets = nb_digits if isinstance(nb_digits, dict) else dict.fromkeys(bases, nb_digits)
+    nb_digits_10 = max(get_nb_digits_base_10(base, targets[base]) for base in bases)
+    number = evaluate_expr(expr, nb_digits_10, guard_digits)
+    if normalize_expr(expr) in FAST_CONSTANTS:
+        error = mpf(10)**(-(nb_digits_10 + guard_digits))
+        return (number, {base: get_nb_certified_digits(number, error, base, targets[base]) for base in bases})
+    if not isinstance(number, mpf):
+        error = mpf(0) if isinstance(number, int) else ldexp(fabs(number), -FLOAT_ERROR_BITS)
+        return (number, {base: get_nb_certified_digits(number, error, base, targets[base]) for base in bases})
+
+    for escalation in range(max_escalations + 1):
+        with profile_stage("certify", nb_digits_10):
+            reference = evaluate_expr(expr, nb_digits_10, 2*guard_digits)
+            if not (number or reference):
+                return (reference, dict(targets))
+            # plus one unit in the last place: equal values may still be both rounded
+            error = fabs(number - reference) + ldexp(fabs(reference) or 1, -mp.prec)
+            nb_certified = {base: get_nb_certified_digits(number, error, base, targets[base]) for base in bases}
+        if escalation == max_escalations or nb_certified == targets:
+            break
+        number, guard_digits = reference, 2*guard_digits
+
+    return (number, nb_certified)
+
+
+def freeze_number(number: Any) -> Any:
+    """
+    Convert a value into a form that keeps its full precision when sent to another process.
+
+    An ``mpf`` is rounded to the working precision of the process that unpickles it,
+    so its raw ``(sign, mantissa, exponent, bit count)`` tuple is sent instead.
+
+    Parameters
+    ----------
+    number : mpmath.mpf or None
+        Value of an expression.
+
+    Returns
+    -------
+    frozen_number : tuple or None
+        Raw tuple of the value, see ``thaw_number``.
+    """
+    return number._mpf_ if isinstance(number, mpf) else number
+
+
+def thaw_number(frozen_number: Any) -> Any:
+    """
+    Rebuild a value sent by another process, at its full precision (see ``freeze_number``).
+
+    Parameters
+    ----------
+    frozen_number : tuple or None
+        Raw tuple of the value, or the value itself.
+
+    Returns
+    -------
+    number : mpmath.mpf or None
+        Value of the expression.
+    """
+    return mp.make_mpf(frozen_number) if isinstance(frozen_number, tuple) else frozen_number
+
+
+def find_saved_sequence(expr: str, base: int, max_nb_digits: Optional[int] = None,
+                        extensions: Tuple[str, ...] = (PACKED_EXTENSION, ".txt")) -> Optional[Tuple[str, int]]:
+    """
+    Find the longest digit sequence of an expression saved in out/ for a given base.
+
+    Parameters
+    ----------
+    expr : str
+        String expression representing a number.
+    base : int
+        Radix base of the digits.
+    max_nb_digits : int, optional
+        If given, ignore the sequences longer than ``max_nb_digits``.
+    extensions : tuple of str, optional
+        Extensions of the files to search, by order of preference at equal length
+        (default is packed files, then text files).
+
+    Returns
+    -------
+    saved_sequence : tuple or None
+        (path, nb_digits) of the longest saved sequence, ``None`` if there is none.
+    """
+    prefix = f"out/{build_basename(expr)}_{base:03d}_"
+    saved_sequences = []
+    for preference, extension in enumerate(extensions):
+        for path in glob.glob(f"{glob.escape(prefix)}*{extension}"):
+            nb_digits = path[len(prefix):-len(extension)]
+            if nb_digits.isdigit() and (max_nb_digits is None or int(nb_digits) <= max_nb_digits):
+                saved_sequences.append((path, int(nb_digits), -preference))
+
+    saved_sequence = max(saved_sequences, key=lambda saved_sequence: saved_sequence[1:], default=None)
+
+    return saved_sequence[:2] if saved_sequence else None
+
+
+def load_saved_sequence(path: str, base: int) -> np.ndarray:
+    """
+    Load a digit sequence from a packed or text file written by ``output_digit_sequence``.
+
+    Parameters
+    ----------
+    path : str
+        Path of the packed or text file.
+    base : int
+        Radix base of the digits.
+
+    Returns
+    -------
+    digit_sequence : ndarray of uint
+        Array of digits, stored on the smallest unsigned integer type.
+    """
+    if path.endswith(PACKED_EXTENSION):
+        return load_packed_sequence(path)
+    with open(path, mode="r", encoding="utf-8") as f:
+        return parse_digit_sequence(f.read(), base, dtype=get_digit_dtype(base))
+
+
+def extend_digit_sequence(expr: str, base: int, digit_sequence: np.ndarray, nb_digits: int,
+                          number: Any = None, overlap: int = EXTENSION_OVERLAP) -> np.ndarray:
+    """
+    Extend a known digit sequence up to ``nb_digits`` digits.
+
+    Only the new digits, plus an overlap window at the end of the known ones, are converted.
+    The known last digits may have been rounded: they are replaced by the new ones from the
+    first disagreement on, as long as it lies in the second half of the overlap window.
+
+    Parameters
+    ----------
+    expr : str
+        String expression representing a number.
+    base : int
+        Radix base of the digits.
+    digit_sequence : ndarray of int
+        Known first digits of the expression.
+    nb_digits : int
+        Number of digits wanted.
+    number : mpmath.mpf, optional
+        Value of ``expr`` already evaluated with enough precision. If ``None`` (default),
+        the expression is evaluated here.
+    overlap : int, optional
+        Number of known digits recomputed to check the join (default is ``EXTENSION_OVERLAP``).
+
+    Returns
+    -------
+    digit_sequence : ndarray of uint
+        Array of the first ``nb_digits`` digits.
+
+    Raises
+    ------
+    ValueError
+        If the known digits disagree with the new ones before the end of the overlap window.
+    """
+    nb_known_digits = len(digit_sequence)
+    if nb_digits <= nb_known_digits:
+        return digit_sequence[:nb_digits]
+    if number is None:
+        number = evaluate_expr(expr, get_nb_digits_base_10(base, nb_digits))
+
+    start = max(0, nb_known_digits - overlap)
+    new_digits = get_digits_window(number, base, start, nb_digits, dtype=get_digit_dtype(base))
+    mismatches = np.flatnonzero(digit_sequence[start:] != new_digits[:(nb_known_digits-start)])
+    join = nb_known_digits
+    if mismatches.size:
+        join = start + mismatches[0]
+        if nb_known_digits - join > overlap // 2:
+            raise ValueError(f"Known digits of {expr} in base {base} disagree with the new ones at digit {join}")
+
+    extended_sequence = np.empty(nb_digits, dtype=get_digit_dtype(base))
+    extended_sequence[:join] = digit_sequence[:join]
+    extended_sequence[join:] = new_digits[(join-start):]
+
+    return extended_sequence
+
+
+def append_digit_sequence(digit_sequence: np.ndarray, base: int, previous_path: str, savepath: str,
+                          chunk_size: int = DIGIT_CHUNK_SIZE) -> None:
+    """
+    Save an extended digit sequence by appending its new digits to a copy of a shorter saved one.
+
+    The saved file is rewritten from the first row where it disagrees with the new sequence,
+    so that its possibly rounded last digits are fixed.
+
+    Parameters
+    ----------
+    digit_sequence : ndarray of int
+        Extended array of digits.
+    base : int
+        Radix base of the digits.
+    previous_path : str
+        Path of the text file of a prefix of the sequence.
+    savepath : str
+        Path of the text file to write.
+    chunk_size : int, optional
+        Number of digits formatted at once (default is ``DIGIT_CHUNK_SIZE``).
+    """
+    nb_digits_per_row = 100
+    previous_sequence = load_saved_sequence(previous_path, base)
+    nb_common_digits = min(len(previous_sequence), len(digit_sequence))
+    mismatches = np.flatnonzero(previous_sequence[:nb_common_digits] != digit_sequence[:nb_common_digits])
+    first_new_digit = mismatches[0] if mismatches.size else nb_common_digits
+    first_new_row = first_new_digit // nb_digits_per_row
+
+    if previous_path != savepath:
+        shutil.copyfile(previous_path, savepath)
+    with open(savepath, mode="rb+") as f:
+        f.truncate(min(first_new_row * get_row_length(base, nb_digits_per_row), os.path.getsize(savepath)))
+        f.seek(0, os.SEEK_END)
+        if f.tell():
+            # the last kept row must end with a newline before the new rows
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+    with open(savepath, mode="a", encoding="utf-8") as f:
+        write_digit_sequence(f, iter_chunks(digit_sequence[(first_new_row*nb_digits_per_row):], chunk_size),
+                             base, nb_digits_per_row)
+
+
+def output_digit_sequence(digit_sequence: np.ndarray, expr: str, base: int,
+                          bool_disp: bool = False, bool_save: bool = True,
+                          chunk_size: Optional[int] = None, bool_append: bool = False,
+                          bool_text: bool = False, metadata: Optional[Dict[str, Any]] = None) -> None:
+    """
+    Display a digit sequence as a text block, and/or save it as a packed file (see ``utils.packed``).
+
+    Parameters
+    ----------
+    digit_sequence : ndarray of int
+        Array of digits in the given base.
+    expr : str
+        String expression representing a number.
+    base : int
+        Radix base of the digits.
+    bool_disp : bool
+        If ``True``, print the digit sequence
+    bool_save : bool
+        If ``True``, save the digit sequence in a packed file
+    chunk_size : int, optional
+        If given, the text block is formatted and written by chunks of ``chunk_size`` digits,
+        instead of being built in memory at once.
+    bool_append : bool
+        If ``True`` and a shorter sequence is already exported as text, only append the new digits
+        to a copy of it
+    bool_text : bool
+        If ``True``, also export the saved sequence as a text block, read back from the packed file
+    metadata : dict, optional
+        Additional header fields of the packed file, e.g. ``precision`` or ``nb_certified``.
+    """
+    if not (bool_save or bool_disp):
+        return
+
+    nb_digits = len(digit_sequence)
+    chunk_size = chunk_size or max(1, nb_digits)
+    if bool_disp:
+        print(f"First {nb_digits} digits of '{expr}' in base {base}:")
+        write_digit_sequence(sys.stdout, iter_chunks(digit_sequence, chunk_size), base)
+        print()
+    if bool_save:
+        basename = build_basename(expr)
+        savepath = f"out/{basename}_{base:03d}_{nb_digits:06d}"
+        write_packed_sequence(savepath + PACKED_EXTENSION, iter_chunks(digit_sequence, chunk_size), expr, base,
+                              nb_digits, metadata)
+        print(f"  Sequence saved: {savepath + PACKED_EXTENSION}")
+        if bool_text:
+            saved_sequence = find_saved_sequence(expr, base, nb_digits, extensions=(".txt",)) if bool_append else None
+            if saved_sequence is not None:
+                append_digit_sequence(digit_sequence, base, saved_sequence[0], savepath + ".txt", chunk_size)
+            else:
+                with open(savepath + ".txt", mode="w", encoding="utf-8") as f:
+                    write_digit_sequence(f, iter_packed_sequence(savepath + PACKED_EXTENSION, chunk_size), base)
+            print(f"  Text exported:  {savepath}.txt")
+
+
+def compute_digit_sequence(expr: str, base: int, nb_digits: int,
+                           bool_disp: bool = False, bool_save: bool = True,
+                           number: Any = None, method: str = "fast", start: int = 0) -> np.ndarray:  # type: ignore
+    """
+    Compute the first ``nb_digits`` digits of a constant in a given base.
+
+    This is the single-job counterpart of ``core.runner.run_grid``: the expression is evaluated
+    and certified by ``core.planner.evaluate_for_bases``, then converted by
+    ``core.planner.get_longest_sequence``.
+    With the ``"spigot"`` method, the digits are generated chunk by chunk (see
+    ``utils.spigot.iter_spigot_digits``), possibly from a ``start`` position deep into the expansion,
+    and displayed or written to the packed file as soon as they are produced.
+
+    Parameters
+    ----------
+    expr : str
+        String expression representing a number.
+    base : int
+        Radix base for conversion.
+    nb_digits : int
+        Number of digits to extract in the given base.
+    bool_disp : bool
+        If ``True``, print the digit sequence
+    bool_save : bool
+        If ``True``, save the digit sequence in a packed file, see ``output_digit_sequence``
+    number : mpmath.mpf, optional
+        Value of ``expr`` already evaluated with enough precision. If ``None`` (default),
+        the expression is evaluated here. Not used by the ``"spigot"`` method.
+    method : str, optional
+        ``"fast"`` (default) or ``"loop"`` to convert a full-precision value, see
+        ``utils.digits.get_digits_in_base``, or ``"spigot"`` to generate the digits chunk by chunk.
+    start : int, optional
+        Index of the first digit, only with the ``"spigot"`` method (default is 0).
+
+    Returns
+    -------
+    digit_sequence : ndarray of int
+        Array of digits in the given base.
+    """
+    # pylint: disable=import-outside-toplevel
+    from core.planner import evaluate_for_bases, get_longest_sequence
+
+    if method == "spigot":
+        digit_sequence = np.empty(nb_digits, dtype=get_digit_dtype(base))
+        digit_chunks = fill_digit_sequence(digit_sequence, iter_spigot_digits(expr, base, start, start + nb_digits))
+        label = get_window_label(expr, start)
         if bool_disp:
-            print(f"First {nb_digits} digits of '{expr}' in base {base} (rounded):")
-            print(sequence_block)
-        if bool_save:
-            basename = build_basename(expr)
-            savepath = f"out/{basename}_{base:03d}_{nb_digits:06d}.txt"
-            with open(savepath, mode="w", encoding="utf-8") as f:
-                f.write(sequence_block)
+            print(f"Digits {start} to {start + nb_digits - 1} of '{expr}' in base {base}:")
+            write_digit_sequence(sys.stdout, digit_chunks, base)
+            print()
+            output_digit_sequence(digit_sequence, label, base, bool_save=bool_save, metadata={"start": start})
+        elif bool_save:
+            # the packed file is written as the digits are produced
+            savepath = f"out/{build_basename(label)}_{base:03d}_{nb_digits:06d}{PACKED_EXTENSION}"
+            write_packed_sequence(savepath, digit_chunks, label, base, nb_digits, {"start": start})
             print(f"  Sequence saved: {savepath}")
+        else:
+            for _ in digit_chunks:
+                pass
+        return digit_sequence
+
+    nb_certified: Dict[int, int] = {}
+    if number is None:
+        number, nb_certified = evaluate_for_bases(expr, [base], nb_digits)
+        if nb_certified[base] < nb_digits:
+            print(f"/!\\ Only the first {nb_certified[base]:,} digits of {expr} in base {base} are certified")
+
+    # compute base-b digit sequence
+    if method == "loop":
+        digit_sequence = get_digits_in_base(number, base, nb_digits, method=method)
+    else:
+        digit_sequence = get_longest_sequence(expr, base, nb_digits, number, nb_certified=nb_certified.get(base))
+
+    # show or display sequence?
+    output_digit_sequence(digit_sequence, expr, base, bool_disp=bool_disp, bool_save=bool_save)
 
     return digit_sequence
 
 
-def get_points_from_digits(digit_sequence: Any, base: int) -> Tuple[np.ndarray, np.ndarray]:
+def fill_digit_sequence(digit_sequence: np.ndarray, digit_chunks: Iterator[np.ndarray]) -> Iterator[np.ndarray]:
+    """
+    Copy chunks of digits into a preallocated array, while passing them through.
+
+    Parameters
+    ----------
+    digit_sequence : ndarray of int
+        Array receiving the digits, as long as all the chunks together.
+    digit_chunks : iterator of ndarray
+        Chunks of digits.
+
+    Yields
+    ------
+    digits : ndarray of int
+        Next chunk of digits, once copied.
+    """
+    position = 0
+    for chunk in digit_chunks:
+        digit_sequence[position:(position+len(chunk))] = chunk
+        position += len(chunk)
+        yield chunk
+
+
+def get_points_from_digits(digit_sequence: Any, base: int, dtype: Any = np.float64,
+                           out: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+                           exact: bool = False, start: Tuple[float, float] = (0., 0.)
+                           ) -> Tuple[np.ndarray, np.ndarray]:
     """
     Convert a sequence of digits into a sequence of points on the xy plane.
 
@@ -84,6 +509,16 @@ def get_points_from_digits(digit_sequence: Any, base: int) -> Tuple[np.ndarray,
         Sequence of digits representing the path.
     base : int
         Radix base (number of possible directions).
+    dtype : data-type, optional
+        Type of the coordinates (default is ``np.float64``). Ignored if ``out`` is given.
+    out : tuple of ndarray, optional
+        Preallocated (xs, ys) arrays of length ``len(digit_sequence)+1`` to write into.
+    exact : bool, optional
+        If ``True`` and ``base`` is 2, 4 or 8, accumulate the path on integer lattice
+        coordinates, without floating-point drift (default is ``False``).
+    start : tuple of float, optional
+        Starting point, e.g. the saved end point of the trajectory of the previous digits,
+        to continue it without rebuilding its coordinates (default is (0,0)).
 
     Returns
     -------
@@ -92,7 +527,79 @@ def get_points_from_digits(digit_sequence: Any, base: int) -> Tuple[np.ndarray,
     ys : ndarray of float
         Array of y-coordinates of the trajectory.
     """
-    dxs, dys = compute_steps(base)
-    xs, ys   = compute_points(digit_sequence, dxs, dys)
+    with profile_stage("points", len(digit_sequence)):
+        if exact and base in LATTICE_STEPS:
+            xs, ys = compute_lattice_points(digit_sequence, base, dtype=dtype, out=out)
+            xs += start[0]
+            ys += start[1]
+            return (xs, ys)
+
+        dxs, dys = compute_steps(base)
+        xs, ys   = compute_points(digit_sequence, dxs, dys, dtype=dtype, out=out, start=start)
 
     return (xs, ys)
+
+
+def iter_points_from_digits(digit_sequence: Any, base: int, chunk_size: int = DIGIT_CHUNK_SIZE,
+                            dtype: Any = np.float64) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Convert a sequence of digits into points on the xy plane, chunk by chunk.
+
+    Parameters
+    ----------
+    digit_sequence : array-like of int
+        Sequence of digits representing the path.
+    base : int
+        Radix base (number of possible directions).
+    chunk_size : int, optional
+        Number of digits per chunk (default is ``DIGIT_CHUNK_SIZE``).
+    dtype : data-type, optional
+        Type of the coordinates (default is ``np.float64``).
+
+    Yields
+    ------
+    xs : ndarray of float
+        x-coordinates of the next points (the first chunk starts with (0,0)).
+    ys : ndarray of float
+        y-coordinates of the next points.
+    """
+    point_chunks = iter_points(iter_chunks(digit_sequence, chunk_size), base, dtype=dtype)
+    while True:
+        with profile_stage("points", min(chunk_size, len(digit_sequence))):
+            point_chunk = next(point_chunks, None)
+        if point_chunk is None:
+            return
+        yield point_chunk
+
+
+def output_pyramid(point_chunks: Iterable[Tuple[np.ndarray, np.ndarray]], expr: str, base: int, nb_digits: int,
+                   bool_save: bool = True) -> TrajectoryPyramid:
+    """
+    Build the level-of-detail pyramid of a trajectory, and save it next to its digit sequence.
+
+    Parameters
+    ----------
+    point_chunks : iterable of tuple of ndarray
+        Consecutive (xs, ys) chunks of the trajectory, read once.
+    expr : str
+        String expression representing a number.
+    base : int
+        Radix base of the digits.
+    nb_digits : int
+        Number of digits of the sequence.
+    bool_save : bool, optional
+        If ``True``, save the pyramid in out/ (default is ``True``).
+
+    Returns
+    -------
+    pyramid : TrajectoryPyramid
+        Pyramid of the trajectory, see ``utils.pyramid``.
+    """
+    with profile_stage("pyramid", nb_digits):
+        pyramid = build_pyramid(point_chunks)
+    if bool_save:
+        savepath = f"out/{build_basename(expr)}_{base:03d}_{nb_digits:06d}{LOD_EXTENSION}"
+        save_pyramid(savepath, pyramid)
+        print(f"  Pyramid saved:  {savepath}")
+
+    return pyramid
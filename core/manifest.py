@@ -0,0 +1,468 @@
+"""
+Batch runs of irregular lists of jobs, read from a manifest file.
+
+A manifest lists (expression, base, digits) jobs, each with an optional style (renderer and text export),
+instead of the cross product of the command-line arguments. It is a JSON list of objects (or an object
+with a ``jobs`` list), a TOML file of ``[[jobs]]`` tables, or a CSV file with a header row, e.g.::
+
+    expr,base,digits,renderer,text
+    pi,10,100000,raster,false
+    sqrt(2),16,5000,,
+
+The jobs are turned into a graph: one evaluation per expression, at the precision needed by its most
+demanding (base, digits) pair, on which depend its sequence tasks, one per (family of bases sharing a root,
+list of digits, style), which process all their prefixes from a single conversion (see ``core.runner``).
+The evaluations needing the most precision are scheduled first, so that the longest tasks do not end up
+alone on the pool, and each sequence task is submitted as soon as its evaluation is done.
+
+Every finished job is appended to a completion log next to the manifest (one JSON object per line).
+A job whose parameters match a successful entry of the log, and whose outputs all still exist,
+is skipped: a run interrupted by a crash resumes where it stopped, reading the log once. A job run
+with ``--no-save`` has no outputs, and is never skipped.
+
+Constants
+---------
+MANIFEST_FIELDS : list of str
+    Fields of a job, the first three being required.
+COMPLETION_LOG_SUFFIX : str
+    Suffix of the completion log, appended to the path of the manifest.
+"""
+
+from argparse import Namespace
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from typing import Any, Dict, List, NamedTuple, TextIO, Tuple
+import csv
+import json
+import os
+
+from core.runner import JobResult, TaskOutput, evaluate_task, get_failed_task_output, sequence_task
+from utils.digits import get_nb_digits_base_10, group_base_families
+from utils.expression import build_basename, get_window_label
+from utils.packed import PACKED_EXTENSION
+from utils.profiling import enable_profiling, merge_records
+from utils.pyramid import LOD_EXTENSION
+
+MANIFEST_FIELDS       = ["expr", "base", "digits", "renderer", "text"]
+COMPLETION_LOG_SUFFIX = ".done.jsonl"
+
+
+class ManifestJob(NamedTuple):
+    """One (expression, base, digits) job of a manifest, with its style."""
+    expr: str
+    base: int
+    nb_digits: int
+    renderer: str
+    bool_text: bool
+
+
+class SequenceNode(NamedTuple):
+    """Sequence task of a job graph: the digits of an expression in a family of bases, in one style."""
+    expr: str
+    bases: List[int]
+    digits: List[int]
+    renderer: str
+    bool_text: bool
+
+
+class EvaluationNode(NamedTuple):
+    """
+    Evaluation of an expression in a job graph, with the number of digits needed per base,
+    the base-10 precision they need, and the sequence tasks depending on it.
+    """
+    expr: str
+    targets: Dict[int, int]
+    nb_digits_10: int
+    sequences: List[SequenceNode]
+
+
+def parse_bool(value: Any) -> bool:
+    """
+    Parse a boolean field of a manifest.
+
+    Parameters
+    ----------
+    value : bool, int or str
+        Value of the field, e.g. ``true``, ``"yes"`` or ``"0"``.
+
+    Returns
+    -------
+    bool
+        Parsed value.
+
+    Raises
+    ------
+    ValueError
+        If the value is not a boolean.
+    """
+    if isinstance(value, (bool, int)):
+        return bool(value)
+    if str(value).strip().lower() in ("true", "yes", "1"):
+        return True
+    if str(value).strip().lower() in ("false", "no", "0"):
+        return False
+
+    raise ValueError(f"Invalid boolean: {value!r}")
+
+
+def read_manifest_rows(path: str) -> List[Dict[str, Any]]:
+    """
+    Read the raw rows of a manifest file, according to its extension.
+
+    Parameters
+    ----------
+    path : str
+        Path of the manifest: ``.json``, ``.toml`` or ``.csv``.
+
+    Returns
+    -------
+    rows : list of dict
+        Fields of each job, as written in the file.
+
+    Raises
+    ------
+    ValueError
+        If the extension is not supported, or if the file does not hold a list of jobs.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".csv":
+        with open(path, mode="r", encoding="utf-8", newline="") as f:
+            # empty cells fall back to the defaults
+            return [{field: value for field, value in row.items() if value not in (None, "")}
+                    for row in csv.DictReader(f)]
+
+    if extension == ".json":
+        with open(path, mode="r", encoding="utf-8") as f:
+            content = json.load(f)
+    elif extension == ".toml":
+        try:
+            import tomllib  # pylint: disable=import-outside-toplevel
+        except ImportError as e:
+            raise ValueError("TOML manifests require Python 3.11 or later, use JSON or CSV instead") from e
+        with open(path, mode="rb") as f:
+            content = tomllib.load(f)
+    else:
+        raise ValueError(f"Unsupported manifest format: {extension or path}, must be .json, .toml or .csv")
+
+    rows = content.get("jobs") if isinstance(content, dict) else content
+    if not (isinstance(rows, list) and all(isinstance(row, dict) for row in rows)):
+        raise ValueError(f"{path} must hold a list of jobs, or a 'jobs' list of them")
+
+    return rows
+
+
+def load_manifest(path: str, default_renderer: str = "matplotlib", default_text: bool = False) -> List[ManifestJob]:
+    """
+    Load and check the jobs of a manifest, dropping the duplicates.
+
+    Parameters
+    ----------
+    path : str
+        Path of the manifest: ``.json``, ``.toml`` or ``.csv``.
+    default_renderer : str, optional
+        Renderer of the jobs that do not give one (default is ``matplotlib``).
+    default_text : bool, optional
+        Text export of the jobs that do not tell (default is ``False``).
+
+    Returns
+    -------
+    jobs : list of ManifestJob
+        Jobs of the manifest, in their order of first appearance.
+
+    Raises
+    ------
+    ValueError
+        If a job has a missing, unknown or invalid field.
+    """
+    jobs: Dict[ManifestJob, None] = {}
+    for index, row in enumerate(read_manifest_rows(path), start=1):
+        unknown_fields = sorted(set(row) - set(MANIFEST_FIELDS))
+        missing_fields = [field for field in MANIFEST_FIELDS[:3] if field not in row]
+        if missing_fields:
+            raise ValueError(f"Job {index} of {path}: missing field(s) {', '.join(missing_fields)}")
+        if unknown_fields:
+            raise ValueError(f"Job {index} of {path}: unknown field(s) {', '.join(unknown_fields)},"
+                             + f" must be among {', '.join(MANIFEST_FIELDS)}")
+        try:
+            job = ManifestJob(str(row["expr"]), int(row["base"]), int(row["digits"]),
+                              str(row.get("renderer", default_renderer)), parse_bool(row.get("text", default_text)))
+        except ValueError as e:
+            raise ValueError(f"Job {index} of {path}: {e}") from e
+        if job.base < 2 or job.nb_digits < 1 or job.renderer not in ("matplotlib", "raster"):
+            raise ValueError(f"Job {index} of {path}: invalid base, digits or renderer in {row}")
+        jobs[job] = None
+
+    return list(jobs)
+
+
+def get_job_key(job: ManifestJob, options: Namespace) -> str:
+    """
+    Build the key identifying the parameters of a job in the completion log.
+
+    Parameters
+    ----------
+    job : ManifestJob
+        Job of a manifest.
+    options : argparse.Namespace
+        Parsed command-line options shared by the jobs (``method``, ``offset``, ``save`` and ``stream``).
+
+    Returns
+    -------
+    key : str
+        Canonical JSON of the parameters of the job.
+    """
+    params = {**job._asdict(), "method": options.method, "offset": options.offset, "save": options.save,
+              "stream": options.stream}
+
+    return json.dumps(params, sort_keys=True)
+
+
+def get_job_outputs(job: ManifestJob, options: Namespace) -> List[str]:
+    """
+    List the files saved by a job.
+
+    Parameters
+    ----------
+    job : ManifestJob
+        Job of a manifest.
+    options : argparse.Namespace
+        Parsed command-line options shared by the jobs (``method``, ``offset`` and ``save``).
+
+    Returns
+    -------
+    outputs : list of str
+        Paths of the packed sequence, pyramid, image and text export of the job, none without ``save``.
+    """
+    if not options.save:
+        return []
+    start = options.offset if options.method == "spigot" else 0
+    savepath = f"out/{build_basename(get_window_label(job.expr, start))}_{job.base:03d}_{job.nb_digits:06d}"
+    extensions = [PACKED_EXTENSION, LOD_EXTENSION, ".png"] + ([".txt"] if job.bool_text else [])
+
+    return [savepath + extension for extension in extensions]
+
+
+def load_completion_log(path: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Load the successful entries of a completion log.
+
+    Parameters
+    ----------
+    path : str
+        Path of the completion log. It may be missing, or end with a line truncated by a crash.
+
+    Returns
+    -------
+    entries : dict
+        Last successful entry per job key, see ``get_job_key``.
+    """
+    entries: Dict[str, Dict[str, Any]] = {}
+    if not os.path.exists(path):
+        return entries
+    with open(path, mode="r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if entry.get("status") == "ok":
+                entries[entry["key"]] = entry
+
+    return entries
+
+
+def is_job_done(job: ManifestJob, options: Namespace, entries: Dict[str, Dict[str, Any]]) -> bool:
+    """
+    Check whether a job succeeded in a previous run, and its outputs still exist.
+    A job that saved nothing (e.g. with ``--no-save``) is never done.
+
+    Parameters
+    ----------
+    job : ManifestJob
+        Job of a manifest.
+    options : argparse.Namespace
+        Parsed command-line options shared by the jobs.
+    entries : dict
+        Successful entries of the completion log, see ``load_completion_log``.
+
+    Returns
+    -------
+    bool
+        ``True`` if the job can be skipped.
+    """
+    entry = entries.get(get_job_key(job, options))
+
+    return entry is not None and bool(entry["outputs"]) and all(os.path.exists(output)
+                                                               for output in entry["outputs"])
+
+
+def plan_jobs(jobs: List[ManifestJob]) -> List[EvaluationNode]:
+    """
+    Turn a list of jobs into a graph of evaluations and sequence tasks, most demanding first.
+
+    Parameters
+    ----------
+    jobs : list of ManifestJob
+        Jobs to run.
+
+    Returns
+    -------
+    graph : list of EvaluationNode
+        One evaluation per expression, sorted by decreasing base-10 precision (which also orders the
+        sequence tasks when the evaluations are skipped, e.g. with the spigot method), each with its
+        sequence tasks sorted by decreasing number of digits to process.
+    """
+    digits_per_style: Dict[str, Dict[Tuple[str, bool], Dict[int, List[int]]]] = {}
+    for job in jobs:
+        styles = digits_per_style.setdefault(job.expr, {})
+        styles.setdefault((job.renderer, job.bool_text), {}).setdefault(job.base, []).append(job.nb_digits)
+
+    graph = []
+    for expr, styles in digits_per_style.items():
+        targets: Dict[int, int] = {}
+        sequences = []
+        for (renderer, bool_text), digits_per_base in styles.items():
+            # bases asking for the same digits are converted together if they share a root
+            bases_per_digits: Dict[Tuple[int, ...], List[int]] = {}
+            for base, digits in digits_per_base.items():
+                targets[base] = max(targets.get(base, 0), *digits)
+                bases_per_digits.setdefault(tuple(sorted(digits)), []).append(base)
+            for digits, bases in bases_per_digits.items():
+                sequences.extend(SequenceNode(expr, family, list(digits), renderer, bool_text)
+                                 for family in group_base_families(bases))
+        sequences.sort(key=lambda node: -max(node.digits) * len(node.bases))
+        nb_digits_10 = max(get_nb_digits_base_10(base, nb_digits) for base, nb_digits in targets.items())
+        graph.append(EvaluationNode(expr, targets, nb_digits_10, sequences))
+
+    # the precisions are compared in base 10, the numbers of digits of different bases being not comparable
+    return sorted(graph, key=lambda node: -node.nb_digits_10)
+
+
+def write_completion_entries(log_file: TextIO, node: SequenceNode, results: List[JobResult],
+                             options: Namespace) -> None:
+    """
+    Append the finished jobs of a sequence task to the completion log.
+
+    Parameters
+    ----------
+    log_file : file
+        Completion log, opened for appending.
+    node : SequenceNode
+        Sequence task of the jobs.
+    results : list of JobResult
+        Outcome of each job of the task.
+    options : argparse.Namespace
+        Parsed command-line options shared by the jobs.
+    """
+    for result in results:
+        job = ManifestJob(node.expr, result.base, result.nb_digits, node.renderer, node.bool_text)
+        entry = {"key": get_job_key(job, options), "expr": job.expr, "base": job.base, "digits": job.nb_digits,
+                 "status": "ok" if result.error is None else "failed", "error": result.error,
+                 "outputs": get_job_outputs(job, options)}
+        log_file.write(json.dumps(entry) + "\n")
+    log_file.flush()
+
+
+def run_manifest(path: str, options: Namespace, nb_jobs: int = 1) -> List[JobResult]:
+    """
+    Run the jobs of a manifest that are not done yet, and log each finished job.
+
+    Parameters
+    ----------
+    path : str
+        Path of the manifest. Its completion log is ``path + COMPLETION_LOG_SUFFIX``.
+    options : argparse.Namespace
+        Parsed command-line options, shared by the jobs, the jobs giving ``renderer`` and ``text``.
+    nb_jobs : int, optional
+        Number of worker processes. If 1 (default), everything runs in the current process.
+
+    Returns
+    -------
+    results : list of JobResult
+        Outcome of each job run, in the order of completion of the tasks.
+    """
+    jobs = load_manifest(path, options.renderer, options.text)
+    log_path = path + COMPLETION_LOG_SUFFIX
+    entries = load_completion_log(log_path)
+    pending_jobs = [job for job in jobs if not is_job_done(job, options, entries)]
+    print(f"# Manifest {path}: {len(jobs):,} job(s), {len(jobs) - len(pending_jobs):,} already done"
+          + f" (see {log_path}), {len(pending_jobs):,} to run")
+
+    bool_evaluate = options.method != "spigot"
+    graph = plan_jobs(pending_jobs)
+    results: List[JobResult] = []
+
+    def get_options(node: SequenceNode) -> Namespace:
+        return Namespace(**{**vars(options), "renderer": node.renderer, "text": node.bool_text})
+
+    with open(log_path, mode="a", encoding="utf-8") as log_file:
+
+        def collect(node: SequenceNode, task: TaskOutput) -> None:
+            task_results, log, records = task
+            print(log, end="", flush=True)
+            merge_records(records)
+            write_completion_entries(log_file, node, task_results, options)
+            results.extend(task_results)
+
+        def get_failed_outputs(evaluation: EvaluationNode, error: str) -> List[Tuple[SequenceNode, TaskOutput]]:
+            outputs = [(node, get_failed_task_output(node.expr, node.bases, node.digits, error))
+                       for node in evaluation.sequences]
+            # the evaluation error is printed once
+            return [(node, (task_results, log if index == 0 else "", records))
+                    for index, (node, (task_results, log, records)) in enumerate(outputs)]
+
+        if nb_jobs == 1:
+            for evaluation in graph:
+                number, nb_certified, error, records = (
+                    evaluate_task(evaluation.expr, list(evaluation.targets), evaluation.targets, options.cache_dir)
+                    if bool_evaluate else (None, {}, None, []))
+                merge_records(records)
+                if error is not None:
+                    for node, task in get_failed_outputs(evaluation, error):
+                        collect(node, task)
+                    continue
+                for node in evaluation.sequences:
+                    collect(node, sequence_task(node.expr, node.bases, node.digits, number, get_options(node),
+                                                bool_capture=False, nb_certified=nb_certified))
+            return results
+
+        initializer = enable_profiling if getattr(options, "profile", False) else None
+        with ProcessPoolExecutor(max_workers=nb_jobs, initializer=initializer) as pool:
+            evaluations: Dict[Future, EvaluationNode] = {}
+            sequences: Dict[Future, SequenceNode] = {}
+
+            def submit_sequences(evaluation: EvaluationNode, number: Any, nb_certified: Dict[int, int]) -> None:
+                for node in evaluation.sequences:
+                    sequences[pool.submit(sequence_task, node.expr, node.bases, node.digits, number,
+                                          get_options(node), nb_certified=nb_certified)] = node
+
+            for evaluation in graph:
+                if bool_evaluate:
+                    evaluations[pool.submit(evaluate_task, evaluation.expr, list(evaluation.targets),
+                                            evaluation.targets, options.cache_dir)] = evaluation
+                else:
+                    submit_sequences(evaluation, None, {})
+
+            while evaluations or sequences:
+                done, _ = wait(list(evaluations) + list(sequences), return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future in evaluations:
+                        evaluation = evaluations.pop(future)
+                        try:
+                            number, nb_certified, error, records = future.result()
+                            merge_records(records)
+                        except Exception as e:  # pylint: disable=broad-exception-caught
+                            number, nb_certified, error = None, {}, str(e)
+                        if error is not None:
+                            for node, task in get_failed_outputs(evaluation, error):
+                                collect(node, task)
+                        else:
+                            submit_sequences(evaluation, number, nb_certified)
+                        continue
+                    node = sequences.pop(future)
+                    try:
+                        task = future.result()
+                    except Exception as e:  # pylint: disable=broad-exception-caught
+                        task = get_failed_task_output(node.expr, node.bases, node.digits, str(e))
+                    collect(node, task)
+
+    return results
@@ -0,0 +1,243 @@
+"""
+Planning of the expression × base × digits job grid.
+
+Each expression is evaluated only once, at the largest precision needed by any of its
+(base, digits) pairs. For each base, the longest requested sequence is extracted from this
+single value, and the shorter ones are cut as prefixes of it. Bases that are powers of a
+same root (e.g. 2, 8 and 16) share a single conversion.
+If a digit cache is used, the sequences found in it are not recomputed, and the expression
+is not evaluated at all if every sequence is cached.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from core.cache import DEFAULT_CACHE_SIZE, load_digits, store_digits
+from core.compute_digits import (evaluate_certified, extend_digit_sequence, fill_digit_sequence, find_saved_sequence,
+                                 load_saved_sequence)
+from utils.profiling import profile_stage
+from utils.spigot import iter_spigot_digits
+from utils.digits import get_digit_dtype, get_digits_in_base, get_digits_in_bases, group_base_families
+
+
+def evaluate_for_bases(expr: str, bases: List[int], max_nb_digits: Union[int, Dict[int, int]],
+                       cache_dir: Optional[str] = None) -> Tuple[Any, Dict[int, int]]:
+    """
+    Evaluate an expression once, with the precision needed by the bases missing from the cache,
+    and certify its digits in these bases (see ``core.compute_digits.evaluate_certified``).
+
+    Parameters
+    ----------
+    expr : str
+        String expression representing a number.
+    bases : list of int
+        Radix bases for conversion.
+    max_nb_digits : int or dict
+        Largest number of digits to extract in each base, or per base.
+    cache_dir : str, optional
+        Directory of the digit cache. If ``None`` (default), no cache is used.
+
+    Returns
+    -------
+    number : mpmath.mpf or None
+        Value of the expression, or ``None`` if every sequence is already cached.
+    nb_certified : dict
+        Number of certified digits (at most ``max_nb_digits``) per missing base.
+    """
+    targets = max_nb_digits if isinstance(max_nb_digits, dict) else dict.fromkeys(bases, max_nb_digits)
+    missing_bases = [base for base in bases
+                     if not (cache_dir and load_digits(cache_dir, expr, base, targets[base]) is not None)]
+    if not missing_bases:
+        return (None, {})
+
+    return evaluate_certified(expr, missing_bases, {base: targets[base] for base in missing_bases})
+
+
+def store_certified_digits(cache_dir: str, expr: str, base: int, digit_sequence: np.ndarray,
+                           nb_certified: Optional[int], cache_size: int) -> None:
+    """
+    Store the certified prefix of a digit sequence in the cache, see ``core.cache.store_digits``.
+
+    Parameters
+    ----------
+    cache_dir : str
+        Directory of the digit cache.
+    expr : str
+        String expression representing a number.
+    base : int
+        Radix base of the digits.
+    digit_sequence : ndarray of uint
+        Array of digits in the given base.
+    nb_certified : int or None
+        Number of certified digits of the sequence, ``None`` if they are all certified.
+    cache_size : int
+        Maximal size of the digit cache, in bytes.
+    """
+    if nb_certified is not None:
+        digit_sequence = digit_sequence[:nb_certified]
+    if len(digit_sequence):
+        store_digits(cache_dir, expr, base, digit_sequence, max_size=cache_size)
+
+
+def find_known_sequence(expr: str, base: int, cache_dir: Optional[str] = None) -> Optional[np.ndarray]:
+    """
+    Find the longest known digit sequence of an expression in a given base.
+
+    Parameters
+    ----------
+    expr : str
+        String expression representing a number.
+    base : int
+        Radix base of the digits.
+    cache_dir : str, optional
+        Directory of the digit cache. If ``None`` (default), only the saved sequence files are searched.
+
+    Returns
+    -------
+    digit_sequence : ndarray of uint or None
+        Longest sequence found in the cache or in the saved sequence files, ``None`` if there is none.
+    """
+    cached_sequence = load_digits(cache_dir, expr, base) if cache_dir else None
+    saved_sequence = find_saved_sequence(expr, base)
+    if saved_sequence is not None and (cached_sequence is None or saved_sequence[1] > len(cached_sequence)):
+        return load_saved_sequence(saved_sequence[0], base)
+
+    return cached_sequence
+
+
+def get_longest_sequence(expr: str, base: int, max_nb_digits: int, number: Any,
+                         cache_dir: Optional[str] = None, cache_size: int = DEFAULT_CACHE_SIZE,
+                         bool_extend: bool = False, nb_certified: Optional[int] = None) -> np.ndarray:
+    """
+    Get the longest digit sequence of an expression in a given base, from the cache if possible.
+
+    Only the certified digits are cached, so that a later run asking for more digits evaluates
+    the expression again, and warns again that they are not all certified.
+
+    Parameters
+    ----------
+    expr : str
+        String expression representing a number.
+    base : int
+        Radix base for conversion.
+    max_nb_digits : int
+        Number of digits to extract.
+    number : mpmath.mpf or None
+        Value of the expression, see ``evaluate_for_bases``. Only used if the sequence is not cached.
+    cache_dir : str, optional
+        Directory of the digit cache. If ``None`` (default), no cache is used.
+    cache_size : int, optional
+        Maximal size of the digit cache, in bytes (default is ``DEFAULT_CACHE_SIZE``).
+    bool_extend : bool, optional
+        If ``True``, extend the longest shorter sequence found in the cache or in the saved
+        sequence files, instead of converting all the digits (default is ``False``).
+    nb_certified : int, optional
+        Number of certified digits of ``number`` in this base, see ``evaluate_for_bases``.
+        If ``None`` (default), they are all certified.
+
+    Returns
+    -------
+    digit_sequence : ndarray of uint
+        Array of digits in the given base, stored on the smallest unsigned integer type.
+    """
+    longest_sequence = load_digits(cache_dir, expr, base, max_nb_digits) if cache_dir else None
+    if longest_sequence is None:
+        known_sequence = find_known_sequence(expr, base, cache_dir) if bool_extend else None
+        with profile_stage("convert", max_nb_digits):
+            if known_sequence is not None:
+                longest_sequence = extend_digit_sequence(expr, base, known_sequence, max_nb_digits, number)
+            else:
+                longest_sequence = get_digits_in_base(number, base, max_nb_digits, dtype=get_digit_dtype(base))
+        if cache_dir:
+            store_certified_digits(cache_dir, expr, base, longest_sequence, nb_certified, cache_size)
+
+    return longest_sequence
+
+
+def get_family_sequences(expr: str, bases: List[int], max_nb_digits: int, number: Any,
+                         cache_dir: Optional[str] = None, cache_size: int = DEFAULT_CACHE_SIZE,
+                         bool_extend: bool = False, nb_certified: Optional[Dict[int, int]] = None
+                         ) -> Dict[int, np.ndarray]:
+    """
+    Get the longest digit sequences of an expression in a family of bases sharing a root
+    (see ``utils.digits.group_base_families``), from the cache if possible.
+
+    The sequences missing from the cache are all derived from one conversion, see
+    ``utils.digits.get_digits_in_bases``.
+
+    Parameters
+    ----------
+    expr : str
+        String expression representing a number.
+    bases : list of int
+        Radix bases of the family.
+    max_nb_digits : int
+        Number of digits to extract in each base.
+    number : mpmath.mpf or None
+        Value of the expression, see ``evaluate_for_bases``. Only used if a sequence is not cached.
+    cache_dir : str, optional
+        Directory of the digit cache. If ``None`` (default), no cache is used.
+    cache_size : int, optional
+        Maximal size of the digit cache, in bytes (default is ``DEFAULT_CACHE_SIZE``).
+    bool_extend : bool, optional
+        If ``True``, extend the known sequences base by base instead, see ``get_longest_sequence``
+        (default is ``False``).
+    nb_certified : dict, optional
+        Number of certified digits of ``number`` per base, see ``get_longest_sequence``.
+        If ``None`` (default), they are all certified.
+
+    Returns
+    -------
+    digit_sequences : dict
+        Array of digits, stored on the smallest unsigned integer type, per base.
+    """
+    digit_sequences = {base: load_digits(cache_dir, expr, base, max_nb_digits) if cache_dir else None
+                       for base in bases}
+    missing_bases = [base for base, digit_sequence in digit_sequences.items() if digit_sequence is None]
+    nb_certified = nb_certified or {}
+    if bool_extend or len(missing_bases) < 2:
+        for base in missing_bases:
+            digit_sequences[base] = get_longest_sequence(expr, base, max_nb_digits, number, cache_dir, cache_size,
+                                                         bool_extend, nb_certified.get(base))
+        return digit_sequences
+
+    with profile_stage("convert", max_nb_digits * len(missing_bases)):
+        digit_sequences.update(get_digits_in_bases(number, missing_bases, max_nb_digits))
+    if cache_dir:
+        for base in missing_bases:
+            store_certified_digits(cache_dir, expr, base, digit_sequences[base], nb_certified.get(base), cache_size)
+
+    return digit_sequences
+
+
+def get_spigot_sequence(expr: str, base: int, start: int, nb_digits: int) -> np.ndarray:
+    """
+    Generate a digit sequence of a constant chunk by chunk, see ``utils.spigot.iter_spigot_digits``.
+
+    Spigot sequences start anywhere in the expansion, so they bypass the cache and the saved sequences.
+    The whole window is collected, to be plotted: ``core.compute_digits.compute_digit_sequence``
+    streams it to the display or to the packed file instead.
+
+    Parameters
+    ----------
+    expr : str
+        String expression representing a number, see ``utils.spigot.has_spigot``.
+    base : int
+        Radix base.
+    start : int
+        Index of the first digit (0 being the first decimal place).
+    nb_digits : int
+        Number of digits to generate.
+
+    Returns
+    -------
+    digit_sequence : ndarray of uint
+        Array of digits in the given base, stored on the smallest unsigned integer type.
+    """
+    digit_sequence = np.empty(nb_digits, dtype=get_digit_dtype(base))
+    with profile_stage("spigot", nb_digits):
+        for _ in fill_digit_sequence(digit_sequence, iter_spigot_digits(expr, base, start, start + nb_digits)):
+            pass
+
+    return digit_sequence
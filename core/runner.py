@@ -0,0 +1,388 @@
+# pylint: disable=broad-exception-caught
+
+"""
+Execution of the expression × base × digits job grid, serially or on a process pool.
+
+The grid is cut into two kinds of tasks:
+- one evaluation task per expression, at the largest precision needed by its missing bases
+  (skipped with the spigot method, which generates the digits without a full-precision value);
+- one sequence task per (expression, family of bases sharing a root), extracting the longest
+  sequences once and then saving and plotting every requested prefix of them.
+
+Each task runs within its own ``mp.workdps`` context, so that the global precision of a worker
+never leaks from one task to the next. Failures are isolated per job, and the output of the tasks
+is printed in the order of the grid. When profiling is enabled, the stage records of each task
+are sent back along its output and merged into the records of the main process.
+
+The renderers, and matplotlib with them, are only imported when a trajectory is drawn: runs that
+neither save nor show an image only output the digits, and skip the trajectory altogether.
+Animations of the growth of the trajectories (see ``visu.animate``) are saved before the images.
+In statistics mode, nothing is drawn nor saved: the statistics of the trajectories are computed
+(see ``core.analytics``) and sent back with the outcome of each job.
+
+Constants
+---------
+STREAM_THRESHOLD : int
+    Number of digits above which sequences are always processed chunk by chunk.
+"""
+
+from argparse import Namespace
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextlib import redirect_stdout, nullcontext
+from functools import partial
+from typing import Any, Deque, Dict, List, NamedTuple, Optional, Tuple, Union
+import io
+
+import numpy as np
+from mpmath import mp, mpf
+
+from core.analytics import TrajectoryStats, compute_trajectory_stats
+from core.compute_digits import (output_digit_sequence, output_pyramid, get_points_from_digits,
+                                 iter_points_from_digits, freeze_number, thaw_number)
+from core.planner import evaluate_for_bases, get_family_sequences, get_spigot_sequence
+from core.window import is_window_mode, render_window
+from utils.digits import DIGIT_CHUNK_SIZE, group_base_families, iter_chunks
+from utils.expression import get_window_label
+from utils.profiling import enable_profiling, merge_records, pop_records, profile_job
+
+STREAM_THRESHOLD = 1_000_000
+
+
+class JobResult(NamedTuple):
+    """
+    Outcome of one (expression, base, digits) job, ``error`` being ``None`` on success,
+    and ``stats`` holding the statistics of the trajectory in statistics mode.
+    """
+    expr: str
+    base: int
+    nb_digits: int
+    error: Optional[str] = None
+    stats: Optional[TrajectoryStats] = None
+
+
+ProfileRecords = List[Dict[str, Any]]
+TaskOutput = Tuple[List[JobResult], str, ProfileRecords]
+
+
+def process_sequence(digit_sequence: np.ndarray, number_params: Tuple[str, int, int],
+                     options: Namespace, metadata: Optional[Dict[str, Any]] = None) -> None:
+    """
+    Save and/or display a digit sequence, and plot its trajectory.
+
+    Parameters
+    ----------
+    digit_sequence : ndarray of int
+        Array of digits in the given base.
+    number_params : tuple
+        (expr, base, nb_digits) for the sequence.
+    options : argparse.Namespace
+        Parsed command-line options (``disp``, ``save``, ``text``, ``show``, ``stream``, ``renderer`` and ``extend``).
+    metadata : dict, optional
+        Additional header fields of the saved packed file.
+    """
+    expr, base, nb_digits = number_params
+    s = "" if nb_digits == 1 else "s"
+    print(f"# Plotting {expr} in base {base} with {nb_digits:,} digit{s}")
+
+    with profile_job(f"{expr}, base {base}, {nb_digits} digits"):
+        _process_sequence(digit_sequence, number_params, options, metadata)
+
+
+def _process_sequence(digit_sequence: np.ndarray, number_params: Tuple[str, int, int],
+                      options: Namespace, metadata: Optional[Dict[str, Any]]) -> None:
+    # pylint: disable=import-outside-toplevel
+    expr, base, nb_digits = number_params
+    bool_stream = options.stream or nb_digits > STREAM_THRESHOLD
+    # bounded memory: digits, points and text are processed chunk by chunk
+    output_digit_sequence(digit_sequence, expr, base, bool_disp=options.disp, bool_save=options.save,
+                          chunk_size=DIGIT_CHUNK_SIZE if bool_stream else None, bool_append=options.extend,
+                          bool_text=options.text, metadata=metadata)
+    if getattr(options, "animate", None) and options.save:
+        from visu.animate import animate_sequence
+        animate_sequence(digit_sequence, number_params, options.animate, fps=options.fps,
+                         digits_per_frame=options.digits_per_frame, bool_growing=options.viewport == "growing")
+    if not (options.save or options.show):
+        # no image to save nor show: the trajectory is not even built
+        return
+
+    from visu.raster import plot_sequence_raster
+    if bool_stream:
+        point_chunks_factory = partial(iter_points_from_digits, digit_sequence, base)
+        pyramid = output_pyramid(point_chunks_factory(), expr, base, nb_digits, bool_save=options.save)
+        plot_sequence_raster(point_chunks_factory, number_params, bool_show=options.show, bool_save=options.save,
+                             pyramid=pyramid)
+        return
+
+    pt_coords = get_points_from_digits(digit_sequence, base)
+    pyramid = output_pyramid([pt_coords], expr, base, nb_digits, bool_save=options.save)
+    if options.renderer == "raster":
+        plot_sequence_raster(partial(iter, [pt_coords]), number_params, bool_show=options.show,
+                             bool_save=options.save, pyramid=pyramid)
+    else:
+        from visu.plot_sequence import plot_sequence
+        plot_sequence(pt_coords, number_params, bool_show=options.show, bool_save=options.save, pyramid=pyramid)
+
+
+def evaluate_task(expr: str, bases: List[int], max_nb_digits: Union[int, Dict[int, int]],
+                  cache_dir: Optional[str]) -> Tuple[Any, Dict[int, int], Optional[str], ProfileRecords]:
+    """
+    Evaluate an expression for all its bases, see ``core.planner.evaluate_for_bases``.
+
+    Parameters
+    ----------
+    expr : str
+        String expression representing a number.
+    bases : list of int
+        Radix bases for conversion.
+    max_nb_digits : int or dict
+        Largest number of digits to extract in each base, or per base.
+    cache_dir : str or None
+        Directory of the digit cache, ``None`` if no cache is used.
+
+    Returns
+    -------
+    number : tuple or None
+        Value of the expression, frozen to be sent to another process (see ``core.compute_digits.freeze_number``),
+        ``None`` if every sequence is cached or if the evaluation failed.
+    nb_certified : dict
+        Number of certified digits per evaluated base.
+    error : str or None
+        Error message if the evaluation failed, ``None`` otherwise.
+    records : list of dict
+        Profiling records of the task, empty if profiling is disabled.
+    """
+    try:
+        with mp.workdps(mp.dps), profile_job(expr):
+            number, nb_certified = evaluate_for_bases(expr, bases, max_nb_digits, cache_dir)
+        return (freeze_number(number), nb_certified, None, pop_records())
+    except Exception as e:
+        return (None, {}, str(e), pop_records())
+
+
+def sequence_task(expr: str, bases: List[int], digits: List[int], number: Any, options: Namespace,
+                  bool_capture: bool = True, nb_certified: Optional[Dict[int, int]] = None) -> TaskOutput:
+    """
+    Extract the longest sequences of an expression in a family of bases, then process all their prefixes.
+
+    Parameters
+    ----------
+    expr : str
+        String expression representing a number.
+    bases : list of int
+        Radix bases for conversion, sharing a root (see ``utils.digits.group_base_families``).
+    digits : list of int
+        Numbers of digits to process.
+    number : tuple or None
+        Frozen value of the expression, see ``evaluate_task``.
+    options : argparse.Namespace
+        Parsed command-line options. With ``options.method == "spigot"``, the digits are generated
+        from position ``options.offset``, see ``core.planner.get_spigot_sequence``. With a region
+        of interest, the saved trajectories are plotted instead, see ``core.window.render_window``.
+        With ``options.stats``, only the statistics of the trajectories are computed,
+        see ``core.analytics.compute_trajectory_stats``.
+    bool_capture : bool, optional
+        If ``True`` (default), capture the printed output instead of printing it right away.
+    nb_certified : dict, optional
+        Number of certified digits of ``number`` per base, see ``evaluate_task``.
+        A warning is printed if fewer digits than needed are certified.
+
+    Returns
+    -------
+    results : list of JobResult
+        Outcome of each job, in the order of ``bases`` then ``digits``.
+    log : str
+        Captured output of the task (empty if ``bool_capture`` is ``False``).
+    records : list of dict
+        Profiling records of the task, empty if profiling is disabled.
+    """
+    results = []
+    log = io.StringIO()
+    number = thaw_number(number)
+    nb_certified = nb_certified or {}
+    bases_str = ("base " if len(bases) == 1 else "bases ") + ", ".join(map(str, bases))
+    with (redirect_stdout(log) if bool_capture else nullcontext()), mp.workdps(mp.dps):
+        if is_window_mode(options):
+            # regions of interest are read from the saved files, nothing is computed
+            for base in bases:
+                for nb_digits in digits:
+                    try:
+                        with profile_job(f"{expr}, base {base}, {nb_digits} digits, window"):
+                            render_window(expr, base, nb_digits, options)
+                        results.append(JobResult(expr, base, nb_digits))
+                    except Exception as e:
+                        print(f"/!\\ Failed to plot {expr} in base {base} with {nb_digits} digits: {e}")
+                        results.append(JobResult(expr, base, nb_digits, str(e)))
+            return (results, log.getvalue(), pop_records())
+
+        try:
+            with profile_job(f"{expr}, {bases_str}"):
+                if options.method == "spigot":
+                    longest_sequences = {base: get_spigot_sequence(expr, base, options.offset, max(digits))
+                                         for base in bases}
+                else:
+                    longest_sequences = get_family_sequences(expr, bases, max(digits), number, options.cache_dir,
+                                                             options.cache_size, options.extend, nb_certified)
+        except Exception as e:
+            print(f"/!\\ Failed to compute {expr} in {bases_str}: {e}")
+            return ([JobResult(expr, base, nb_digits, str(e)) for base in bases for nb_digits in digits],
+                    log.getvalue(), pop_records())
+
+        start = options.offset if options.method == "spigot" else 0
+        label = get_window_label(expr, start)
+        precision = number._mpf_[3] if isinstance(number, mpf) else None
+        for base in bases:
+            if nb_certified.get(base, max(digits)) < max(digits):
+                print(f"/!\\ Only the first {nb_certified[base]:,} digits of {expr} in base {base} are certified")
+            if getattr(options, "stats", None):
+                try:
+                    with profile_job(f"{expr}, base {base}, statistics"):
+                        digit_chunks = iter_chunks(longest_sequences[base], DIGIT_CHUNK_SIZE)
+                        stats = compute_trajectory_stats(digit_chunks, expr, base, digits, start)
+                    results.extend(JobResult(expr, base, nb_digits, stats=row) for nb_digits, row in zip(digits, stats))
+                except Exception as e:
+                    print(f"/!\\ Failed to compute the statistics of {expr} in base {base}: {e}")
+                    results.extend(JobResult(expr, base, nb_digits, str(e)) for nb_digits in digits)
+                continue
+            for nb_digits in digits:
+                metadata = {"start": start, "precision": precision,
+                            "nb_certified": min(nb_certified[base], nb_digits) if base in nb_certified else None}
+                try:
+                    process_sequence(longest_sequences[base][:nb_digits], (label, base, nb_digits), options, metadata)
+                    results.append(JobResult(expr, base, nb_digits))
+                except Exception as e:
+                    print(f"/!\\ Failed to plot {expr} in base {base} with {nb_digits} digits: {e}")
+                    results.append(JobResult(expr, base, nb_digits, str(e)))
+
+    return (results, log.getvalue(), pop_records())
+
+
+def get_failed_task_output(expr: str, bases: List[int], digits: List[int], error: str) -> TaskOutput:
+    """
+    Build the output of the tasks of an expression that could not be evaluated.
+
+    Parameters
+    ----------
+    expr : str
+        String expression representing a number.
+    bases : list of int
+        Radix bases of the failed jobs.
+    digits : list of int
+        Numbers of digits of the failed jobs.
+    error : str
+        Error message.
+
+    Returns
+    -------
+    results : list of JobResult
+        Failed outcome of each job.
+    log : str
+        Error message to print.
+    records : list of dict
+        Empty profiling records.
+    """
+    results = [JobResult(expr, base, nb_digits, error) for base in bases for nb_digits in digits]
+
+    return (results, f"/!\\ Failed to evaluate {expr}: {error}\n", [])
+
+
+def run_grid(exprs: List[str], bases: List[int], digits: List[int], options: Namespace,
+             nb_jobs: int = 1) -> List[JobResult]:
+    """
+    Run the expression × base × digits job grid.
+
+    Parameters
+    ----------
+    exprs : list of str
+        Expressions to plot.
+    bases : list of int
+        Radix bases for conversion.
+    digits : list of int
+        Numbers of digits to plot.
+    options : argparse.Namespace
+        Parsed command-line options.
+    nb_jobs : int, optional
+        Number of worker processes. If 1 (default), everything runs in the current process.
+        If ``options.profile`` is set, the workers profile their tasks too.
+
+    Returns
+    -------
+    results : list of JobResult
+        Outcome of each job, in the order of the grid (the bases of a family being processed together).
+    """
+    results: List[JobResult] = []
+    if not (bases and digits):
+        return results
+    max_nb_digits = max(digits)
+    families = group_base_families(bases)
+    bool_evaluate = options.method != "spigot" and not is_window_mode(options)
+
+    if nb_jobs == 1:
+        for expr in exprs:
+            number, nb_certified, error, records = (evaluate_task(expr, bases, max_nb_digits, options.cache_dir)
+                                                    if bool_evaluate else (None, {}, None, []))
+            merge_records(records)
+            if error is not None:
+                task_results, log, _ = get_failed_task_output(expr, bases, digits, error)
+                print(log, end="")
+                results.extend(task_results)
+                continue
+            for family in families:
+                task_results, _, records = sequence_task(expr, family, digits, number, options, bool_capture=False,
+                                                         nb_certified=nb_certified)
+                merge_records(records)
+                results.extend(task_results)
+        return results
+
+    def flush(pending: Deque[Tuple[str, List[int], Union[Future, TaskOutput]]], bool_wait: bool) -> None:
+        # print the outputs of the finished tasks at the head of the queue, in order
+        while pending and (bool_wait or not isinstance(pending[0][2], Future) or pending[0][2].done()):
+            expr, family, task = pending.popleft()
+            if isinstance(task, Future):
+                try:
+                    task = task.result()
+                except Exception as e:
+                    task = get_failed_task_output(expr, family, digits, str(e))
+            task_results, log, records = task
+            print(log, end="", flush=True)
+            merge_records(records)
+            results.extend(task_results)
+
+    initializer = enable_profiling if getattr(options, "profile", False) else None
+    with ProcessPoolExecutor(max_workers=nb_jobs, initializer=initializer) as pool:
+        evaluations = [pool.submit(evaluate_task, expr, bases, max_nb_digits, options.cache_dir)
+                       if bool_evaluate else None for expr in exprs]
+        pending: Deque[Tuple[str, List[int], Union[Future, TaskOutput]]] = deque()
+        for expr, evaluation in zip(exprs, evaluations):
+            try:
+                number, nb_certified, error, records = (evaluation.result() if evaluation is not None
+                                                        else (None, {}, None, []))
+                merge_records(records)
+            except Exception as e:
+                number, nb_certified, error = None, {}, str(e)
+            if error is not None:
+                pending.append((expr, bases, get_failed_task_output(expr, bases, digits, error)))
+            else:
+                for family in families:
+                    pending.append((expr, family, pool.submit(sequence_task, expr, family, digits, number, options,
+                                                              nb_certified=nb_certified)))
+            flush(pending, bool_wait=False)
+        flush(pending, bool_wait=True)
+
+    return results
+
+
+def print_summary(results: List[JobResult]) -> None:
+    """
+    Print the number of succeeded and failed jobs, and the reason of each failure.
+
+    Parameters
+    ----------
+    results : list of JobResult
+        Outcome of each job.
+    """
+    failures = [result for result in results if result.error is not None]
+    print(f"# Summary: {len(results)} job(s), {len(results) - len(failures)} succeeded, {len(failures)} failed")
+    for result in failures:
+        error = result.error.splitlines()[0] if result.error else ""
+        print(f"  {result.expr} in base {result.base} with {result.nb_digits} digits: {error}")
@@ -0,0 +1,571 @@
+# pylint: disable=broad-exception-caught
+
+"""
+Local render server: a long-running process answering (expression, base, digits) requests over HTTP.
+
+Calling ``digit_explorer.py`` once per image pays the interpreter startup, the imports of mpmath
+and matplotlib, and a cold evaluation of the expression every time. The server pays them once:
+- an asyncio event loop parses the requests, and hands the CPU-heavy work (evaluations, conversions,
+  statistics and rendering) to a pool of worker processes, which keep their imports, mpmath
+  constants and figure templates warm from one request to the next;
+- the evaluated numbers and the longest digit sequences are kept in a memory-bounded LRU cache,
+  shared by all the requests: a prefix is sliced from a longer cached sequence, and a number
+  evaluated with enough precision is converted into a new base without being evaluated again;
+- identical requests in flight are coalesced into a single computation, and so are the requests
+  of digits already being computed (or a prefix of them).
+
+Endpoints (``GET``, with the query parameters ``expr``, ``base`` and ``digits``):
+- ``/render``: PNG image of the trajectory, saved in out/ like the command line does
+  (``renderer=matplotlib|raster``, default is ``matplotlib``);
+- ``/digits``: digits as plain text, by rows of 100;
+- ``/stats``: statistics of the trajectory as JSON, see ``core.analytics``;
+- ``/status``: contents and counters of the memory cache as JSON (no parameter).
+
+Numbers converted into a base other than the ones they were evaluated for are not certified again:
+their guard digits are trusted, as for the shorter sequences cut from a longer one.
+
+Constants
+---------
+DEFAULT_HOST : str
+    Default interface of the server, local only.
+DEFAULT_PORT : int
+    Default TCP port of the server.
+DEFAULT_MEMORY_SIZE : int
+    Default maximal size of the memory cache, in bytes.
+MAX_HEADER_LINES : int
+    Maximal number of header lines of a request.
+"""
+
+from argparse import Namespace
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import redirect_stdout
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, NamedTuple, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+import asyncio
+import io
+import json
+import multiprocessing
+
+import numpy as np
+from mpmath import mp
+
+from core.analytics import compute_trajectory_stats
+from core.cache import DEFAULT_CACHE_SIZE
+from core.compute_digits import freeze_number, thaw_number
+from core.planner import evaluate_for_bases, get_longest_sequence
+from core.runner import process_sequence
+from utils.digits import DIGIT_CHUNK_SIZE, format_digit_sequence, get_nb_digits_base_10, iter_chunks
+from utils.expression import build_basename, normalize_expr
+
+DEFAULT_HOST        = "127.0.0.1"
+DEFAULT_PORT        = 8765
+DEFAULT_MEMORY_SIZE = 1 << 28
+MAX_HEADER_LINES    = 100
+
+HTTP_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+                500: "Internal Server Error"}
+
+Response = Tuple[int, str, bytes, Dict[str, str]]
+
+
+class MemoryCache(NamedTuple):
+    """
+    Least-recently-used cache bounded by the total size of its values, ``size`` being kept in ``counters``
+    along with the numbers of hits, misses, reused numbers, coalesced requests and evictions.
+    """
+    entries: "OrderedDict[Hashable, Tuple[Any, int]]"
+    max_size: int
+    counters: Dict[str, int]
+
+
+def build_memory_cache(max_size: int = DEFAULT_MEMORY_SIZE) -> MemoryCache:
+    """
+    Build an empty memory cache.
+
+    Parameters
+    ----------
+    max_size : int, optional
+        Maximal total size of the values, in bytes (default is ``DEFAULT_MEMORY_SIZE``).
+
+    Returns
+    -------
+    cache : MemoryCache
+        Empty cache.
+    """
+    return MemoryCache(OrderedDict(), max_size, {"size": 0, "hits": 0, "misses": 0, "number_hits": 0, "coalesced": 0,
+                                                "evictions": 0})
+
+
+def cache_get(cache: MemoryCache, key: Hashable) -> Any:
+    """
+    Get a value from a memory cache, and mark it as recently used.
+
+    Parameters
+    ----------
+    cache : MemoryCache
+        Memory cache.
+    key : hashable
+        Key of the value.
+
+    Returns
+    -------
+    value : any
+        Cached value, ``None`` if it is missing.
+    """
+    entry = cache.entries.get(key)
+    if entry is None:
+        return None
+    cache.entries.move_to_end(key)
+
+    return entry[0]
+
+
+def cache_put(cache: MemoryCache, key: Hashable, value: Any, nb_bytes: int) -> None:
+    """
+    Store a value in a memory cache, then evict the least recently used values until it fits.
+
+    Values larger than the whole cache are not stored.
+
+    Parameters
+    ----------
+    cache : MemoryCache
+        Memory cache.
+    key : hashable
+        Key of the value, replacing the previous value of this key.
+    value : any
+        Value to store.
+    nb_bytes : int
+        Size of the value, in bytes.
+    """
+    previous_entry = cache.entries.pop(key, None)
+    if previous_entry is not None:
+        cache.counters["size"] -= previous_entry[1]
+    if nb_bytes > cache.max_size:
+        return
+
+    cache.entries[key] = (value, nb_bytes)
+    cache.counters["size"] += nb_bytes
+    while cache.counters["size"] > cache.max_size:
+        _, (_, evicted_bytes) = cache.entries.popitem(last=False)
+        cache.counters["size"] -= evicted_bytes
+        cache.counters["evictions"] += 1
+
+
+def get_number_size(number: Any) -> int:
+    """
+    Estimate the memory size of an evaluated number.
+
+    Parameters
+    ----------
+    number : tuple or float or int
+        Frozen value of an expression, see ``core.compute_digits.freeze_number``.
+
+    Returns
+    -------
+    nb_bytes : int
+        Size of its mantissa, plus a fixed overhead.
+    """
+    return (int(number[3]) // 8 if isinstance(number, tuple) else 8) + 100
+
+
+def init_worker() -> None:
+    """Import the renderers in a worker process, so that its first request does not pay for them."""
+    # pylint: disable=import-outside-toplevel,unused-import
+    import visu.plot_sequence
+    import visu.raster
+
+
+def compute_task(expr: str, base: int, nb_digits: int, number: Any, cache_dir: Optional[str],
+                 cache_size: int) -> Tuple[Any, np.ndarray]:
+    """
+    Get the digits of an expression in a given base, evaluating it if needed (run by a worker).
+
+    Parameters
+    ----------
+    expr : str
+        String expression representing a number.
+    base : int
+        Radix base of the digits.
+    nb_digits : int
+        Number of digits.
+    number : tuple or None
+        Frozen value of the expression with enough precision (see ``core.compute_digits.freeze_number``),
+        ``None`` to evaluate it if the digits are not cached on disk.
+    cache_dir : str or None
+        Directory of the digit cache, ``None`` if no cache is used.
+    cache_size : int
+        Maximal size of the digit cache, in bytes.
+
+    Returns
+    -------
+    number : tuple or None
+        Frozen value of the expression, ``None`` if the digits were read from the disk cache.
+    digit_sequence : ndarray of uint
+        Array of digits in the given base, stored on the smallest unsigned integer type.
+    """
+    number, nb_certified = thaw_number(number), {}
+    with mp.workdps(mp.dps):
+        if number is None:
+            number, nb_certified = evaluate_for_bases(expr, [base], nb_digits, cache_dir)
+        digit_sequence = get_longest_sequence(expr, base, nb_digits, number, cache_dir, cache_size,
+                                              nb_certified=nb_certified.get(base))
+
+    # memory-mapped cache entries are sent back as plain arrays
+    return (freeze_number(number), np.array(digit_sequence))
+
+
+def render_task(digit_sequence: np.ndarray, number_params: Tuple[str, int, int],
+                renderer: str) -> Tuple[str, bytes, str]:
+    """
+    Save the digits and the image of a trajectory in out/, like the command line (run by a worker).
+
+    Parameters
+    ----------
+    digit_sequence : ndarray of int
+        Array of digits in the given base.
+    number_params : tuple
+        (expr, base, nb_digits) for the sequence.
+    renderer : str
+        ``"matplotlib"`` or ``"raster"``.
+
+    Returns
+    -------
+    savepath : str
+        Path of the PNG image.
+    image : bytes
+        Content of the PNG image.
+    log : str
+        Output printed while saving.
+    """
+    expr, base, nb_digits = number_params
+    options = Namespace(disp=False, save=True, text=False, show=False, stream=False, extend=False,
+                        renderer=renderer, animate=None)
+    log = io.StringIO()
+    with redirect_stdout(log), mp.workdps(mp.dps):
+        process_sequence(digit_sequence, number_params, options)
+    savepath = f"out/{build_basename(expr)}_{base:03d}_{nb_digits:06d}.png"
+    with open(savepath, mode="rb") as f:
+        image = f.read()
+
+    return (savepath, image, log.getvalue())
+
+
+def format_task(digit_sequence: np.ndarray, base: int) -> bytes:
+    """
+    Format a digit sequence as plain text, see ``utils.digits.format_digit_sequence`` (run by a worker).
+
+    Parameters
+    ----------
+    digit_sequence : ndarray of int
+        Array of digits in the given base.
+    base : int
+        Radix base of the digits.
+
+    Returns
+    -------
+    text : bytes
+        Digits by rows of 100, encoded in UTF-8.
+    """
+    return format_digit_sequence(digit_sequence, base).encode("utf-8")
+
+
+def stats_task(digit_sequence: np.ndarray, number_params: Tuple[str, int, int]) -> Dict[str, Any]:
+    """
+    Compute the statistics of a trajectory, see ``core.analytics.compute_trajectory_stats`` (run by a worker).
+
+    Parameters
+    ----------
+    digit_sequence : ndarray of int
+        Array of digits in the given base.
+    number_params : tuple
+        (expr, base, nb_digits) for the sequence.
+
+    Returns
+    -------
+    stats : dict
+        Statistics of the trajectory, by field name.
+    """
+    expr, base, nb_digits = number_params
+    stats = compute_trajectory_stats(iter_chunks(digit_sequence, DIGIT_CHUNK_SIZE), expr, base, [nb_digits])
+
+    return stats[0]._asdict()
+
+
+def parse_job_params(params: Dict[str, List[str]], max_digits: int) -> Tuple[str, int, int]:
+    """
+    Parse and check the (expression, base, digits) parameters of a request.
+
+    Parameters
+    ----------
+    params : dict
+        Query parameters of the request, see ``urllib.parse.parse_qs``.
+    max_digits : int
+        Largest number of digits allowed.
+
+    Returns
+    -------
+    number_params : tuple
+        (expr, base, nb_digits) of the request.
+
+    Raises
+    ------
+    ValueError
+        If a parameter is missing or invalid.
+    """
+    missing = [name for name in ("expr", "base", "digits") if name not in params]
+    if missing:
+        raise ValueError(f"Missing parameter(s): {', '.join(missing)}")
+    expr, base, nb_digits = params["expr"][0], int(params["base"][0]), int(params["digits"][0])
+    if base < 2:
+        raise ValueError(f"Invalid base: {base}, must be > 1")
+    if not 0 < nb_digits <= max_digits:
+        raise ValueError(f"Invalid number of digits: {nb_digits}, must be between 1 and {max_digits}")
+
+    return (expr, base, nb_digits)
+
+
+def build_handler(pool: Executor, cache: MemoryCache, cache_dir: Optional[str], cache_size: int,
+                  max_digits: int) -> Callable[[str, Dict[str, List[str]]], Awaitable[Response]]:
+    """
+    Build the coroutine answering the requests of the server.
+
+    Parameters
+    ----------
+    pool : concurrent.futures.Executor
+        Pool of workers running the CPU-heavy tasks.
+    cache : MemoryCache
+        Memory cache of the numbers and digit sequences.
+    cache_dir : str or None
+        Directory of the digit cache on disk, ``None`` if no cache is used.
+    cache_size : int
+        Maximal size of the digit cache on disk, in bytes.
+    max_digits : int
+        Largest number of digits of a request.
+
+    Returns
+    -------
+    handle_request : coroutine function
+        Coroutine taking the path and the query parameters of a request, and returning
+        its (status, content type, body, extra headers).
+    """
+    in_flight: Dict[Hashable, asyncio.Future] = {}
+    digit_tasks: Dict[Tuple[str, int], Tuple[int, asyncio.Future]] = {}
+    path_locks: Dict[str, asyncio.Lock] = {}
+
+    async def coalesce(key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        # identical requests in flight share the same task
+        task = in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            in_flight[key] = task
+            task.add_done_callback(lambda _: in_flight.pop(key, None))
+        else:
+            cache.counters["coalesced"] += 1
+
+        return await asyncio.shield(task)
+
+    async def get_digits(expr: str, base: int, nb_digits: int) -> np.ndarray:
+        key = (normalize_expr(expr), base)
+        digit_sequence = cache_get(cache, ("digits", *key))
+        if digit_sequence is not None and len(digit_sequence) >= nb_digits:
+            cache.counters["hits"] += 1
+            return digit_sequence[:nb_digits]
+
+        # a computation of as many digits or more is already in flight
+        digit_task = digit_tasks.get(key)
+        if digit_task is not None and digit_task[0] >= nb_digits:
+            cache.counters["coalesced"] += 1
+            _, digit_sequence = await asyncio.shield(digit_task[1])
+            return digit_sequence[:nb_digits]
+
+        cache.counters["misses"] += 1
+        number, nb_digits_10 = cache_get(cache, ("number", key[0])) or (None, 0)
+        if nb_digits_10 < get_nb_digits_base_10(base, nb_digits):
+            number = None
+        elif number is not None:
+            cache.counters["number_hits"] += 1
+        future = asyncio.get_running_loop().run_in_executor(pool, compute_task, expr, base, nb_digits, number,
+                                                            cache_dir, cache_size)
+        digit_tasks[key] = (nb_digits, future)
+        try:
+            new_number, digit_sequence = await future
+        finally:
+            if digit_tasks.get(key, (0, None))[1] is future:
+                del digit_tasks[key]
+
+        # a longer sequence or a more precise number cached meanwhile is kept
+        digit_sequence.flags.writeable = False
+        cached_sequence = cache_get(cache, ("digits", *key))
+        if cached_sequence is None or len(cached_sequence) < len(digit_sequence):
+            cache_put(cache, ("digits", *key), digit_sequence, digit_sequence.nbytes)
+        new_nb_digits_10 = get_nb_digits_base_10(base, nb_digits)
+        cached_number = cache_get(cache, ("number", key[0]))
+        if new_number is not None and (cached_number is None or cached_number[1] < new_nb_digits_10):
+            cache_put(cache, ("number", key[0]), (new_number, new_nb_digits_10), get_number_size(new_number))
+
+        return digit_sequence[:nb_digits]
+
+    async def run_in_pool(function: Callable[..., Any], *args: Any) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(pool, function, *args)
+
+    async def render(expr: str, base: int, nb_digits: int, renderer: str) -> Tuple[str, bytes]:
+        digit_sequence = await get_digits(expr, base, nb_digits)
+        # both renderers write the same files
+        savepath = f"out/{build_basename(expr)}_{base:03d}_{nb_digits:06d}.png"
+        async with path_locks.setdefault(savepath, asyncio.Lock()):
+            savepath, image, _ = await run_in_pool(render_task, digit_sequence, (expr, base, nb_digits), renderer)
+
+        return (savepath, image)
+
+    async def handle_request(path: str, params: Dict[str, List[str]]) -> Response:
+        if path == "/status":
+            status = {**cache.counters, "max_size": cache.max_size, "in_flight": len(in_flight),
+                      "entries": [list(key) + [nb_bytes] for key, (_, nb_bytes) in cache.entries.items()]}
+            return (200, "application/json", json.dumps(status).encode("utf-8"), {})
+        if path not in ("/render", "/digits", "/stats"):
+            return (404, "text/plain", f"Unknown endpoint: {path}".encode("utf-8"), {})
+
+        expr, base, nb_digits = parse_job_params(params, max_digits)
+        key = (path, normalize_expr(expr), base, nb_digits)
+        if path == "/digits":
+            async def get_text() -> bytes:
+                return await run_in_pool(format_task, await get_digits(expr, base, nb_digits), base)
+            text = await coalesce(key, get_text)
+            return (200, "text/plain", text, {})
+        if path == "/stats":
+            async def get_stats() -> Dict[str, Any]:
+                return await run_in_pool(stats_task, await get_digits(expr, base, nb_digits), (expr, base, nb_digits))
+            stats = await coalesce(key, get_stats)
+            return (200, "application/json", json.dumps(stats).encode("utf-8"), {})
+
+        renderer = params.get("renderer", ["matplotlib"])[0]
+        if renderer not in ("matplotlib", "raster"):
+            raise ValueError(f"Invalid renderer: {renderer}, must be matplotlib or raster")
+        savepath, image = await coalesce((*key, renderer), lambda: render(expr, base, nb_digits, renderer))
+        return (200, "image/png", image, {"X-Output-Path": savepath})
+
+    return handle_request
+
+
+async def read_request(reader: asyncio.StreamReader) -> Tuple[str, str]:
+    """
+    Read the request line and the headers of an HTTP request.
+
+    Parameters
+    ----------
+    reader : asyncio.StreamReader
+        Stream of the connection.
+
+    Returns
+    -------
+    method : str
+        HTTP method, e.g. ``"GET"``.
+    target : str
+        Requested path, with its query string.
+
+    Raises
+    ------
+    ValueError
+        If the request is malformed.
+    """
+    request_line = (await reader.readline()).decode("latin-1").split()
+    if len(request_line) != 3:
+        raise ValueError("Malformed request line")
+    # the headers are skipped: requests have no body
+    for _ in range(MAX_HEADER_LINES):
+        if (await reader.readline()).strip() == b"":
+            break
+    else:
+        raise ValueError("Too many header lines")
+
+    return (request_line[0], request_line[1])
+
+
+def build_response(status: int, content_type: str, body: bytes, headers: Dict[str, str]) -> bytes:
+    """
+    Build an HTTP/1.1 response, closing the connection.
+
+    Parameters
+    ----------
+    status : int
+        HTTP status code.
+    content_type : str
+        MIME type of the body.
+    body : bytes
+        Body of the response.
+    headers : dict
+        Extra headers.
+
+    Returns
+    -------
+    response : bytes
+        Status line, headers and body.
+    """
+    lines = [f"HTTP/1.1 {status} {HTTP_REASONS[status]}", f"Content-Type: {content_type}",
+             f"Content-Length: {len(body)}", "Connection: close"]
+    lines += [f"{name}: {value}" for name, value in headers.items()]
+
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body
+
+
+async def serve(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, nb_jobs: int = 1, cache_dir: Optional[str] = None,
+                cache_size: int = DEFAULT_CACHE_SIZE, memory_size: int = DEFAULT_MEMORY_SIZE,
+                max_digits: int = 100_000_000, on_ready: Optional[Callable[[str, int], None]] = None) -> None:
+    """
+    Run the render server until it is cancelled.
+
+    Parameters
+    ----------
+    host : str, optional
+        Interface to listen on (default is ``DEFAULT_HOST``).
+    port : int, optional
+        TCP port to listen on (default is ``DEFAULT_PORT``), 0 for any free port.
+    nb_jobs : int, optional
+        Number of worker processes (default is 1).
+    cache_dir : str, optional
+        Directory of the digit cache on disk. If ``None`` (default), no cache is used.
+    cache_size : int, optional
+        Maximal size of the digit cache on disk, in bytes (default is ``DEFAULT_CACHE_SIZE``).
+    memory_size : int, optional
+        Maximal size of the memory cache, in bytes (default is ``DEFAULT_MEMORY_SIZE``).
+    max_digits : int, optional
+        Largest number of digits of a request (default is 100,000,000).
+    on_ready : callable, optional
+        Function called with the host and the port once the server listens, e.g. to get the port
+        picked when ``port`` is 0. If ``None`` (default), nothing is called.
+    """
+    cache = build_memory_cache(memory_size)
+    # forked workers would inherit the sockets of the connections open at that time, and keep them open
+    with ProcessPoolExecutor(max_workers=nb_jobs, initializer=init_worker,
+                             mp_context=multiprocessing.get_context("forkserver")) as pool:
+        handle_request = build_handler(pool, cache, cache_dir, cache_size, max_digits)
+
+        async def handle_connection(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+            try:
+                method, target = await read_request(reader)
+                url = urlsplit(target)
+                if method != "GET":
+                    response: Response = (405, "text/plain", b"Only GET requests are supported", {})
+                else:
+                    response = await handle_request(url.path, parse_qs(url.query))
+            except ValueError as e:
+                response = (400, "text/plain", str(e).encode("utf-8"), {})
+            except Exception as e:
+                response = (500, "text/plain", f"{type(e).__name__}: {e}".encode("utf-8"), {})
+            try:
+                writer.write(build_response(*response))
+                await writer.drain()
+            except ConnectionError:
+                pass
+            finally:
+                writer.close()
+
+        server = await asyncio.start_server(handle_connection, host, port)
+        host, port = server.sockets[0].getsockname()[:2]
+        print(f"Serving on http://{host}:{port} with {nb_jobs} worker(s),"
+              + f" memory cache of {memory_size // 2**20:,} MiB. Press Ctrl+C to stop", flush=True)
+        if on_ready is not None:
+            on_ready(host, port)
+        async with server:
+            await server.serve_forever()
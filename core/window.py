@@ -0,0 +1,245 @@
+"""
+Region-of-interest rendering of saved digit trajectories.
+
+A region of interest is a bounding box of the plane and/or a range of digits. It is rendered from
+the files saved by a previous run, without evaluating the expression again nor rebuilding the whole
+path: the level-of-detail pyramid of the trajectory (see ``utils.pyramid``) selects the visible blocks,
+and only the digits of the blocks that must be drawn point by point are read back from the packed
+sequence, by memory-mapped slices. A zoom thus costs in proportion to what is visible.
+
+Constants
+---------
+WINDOW_MARGIN : float
+    Relative margin around the path of a range of digits.
+"""
+
+from argparse import Namespace
+from typing import Optional, Tuple
+import os
+
+import numpy as np
+
+from core.compute_digits import find_saved_sequence, get_points_from_digits, output_pyramid
+from utils.expression import build_basename
+from utils.packed import PACKED_EXTENSION, iter_packed_sequence, open_packed_sequence, unpack_digits
+from utils.plot import build_latex_name, iter_points
+from utils.pyramid import (LOD_BLOCK_SIZE, LOD_EXTENSION, BlockLoader, TrajectoryPyramid, get_pyramid_bounds,
+                           get_window_bounds, load_pyramid, select_window)
+
+WINDOW_MARGIN = .05
+
+
+def is_window_mode(options: Namespace) -> bool:
+    """
+    Check whether a region of interest is requested.
+
+    Parameters
+    ----------
+    options : argparse.Namespace
+        Parsed command-line options (``roi_box`` and ``roi_digits``).
+
+    Returns
+    -------
+    bool
+        ``True`` if a bounding box or a range of digits is given.
+    """
+    return getattr(options, "roi_box", None) is not None or getattr(options, "roi_digits", None) is not None
+
+
+def get_window_suffix(box: Optional[Tuple[float, float, float, float]],
+                      digit_range: Optional[Tuple[int, int]]) -> str:
+    """
+    Build the suffix of the output file of a region of interest.
+
+    Parameters
+    ----------
+    box : tuple of float or None
+        (x_min, x_max, y_min, y_max) of the region of interest.
+    digit_range : tuple of int or None
+        (start, stop) indices of the digits of interest.
+
+    Returns
+    -------
+    suffix : str
+        E.g. ``"digits_40000_60000"`` or ``"box__mn_10_10_0_20"`` for the box (-10, 10, 0, 20).
+    """
+    parts = []
+    if digit_range is not None:
+        parts.append(f"digits_{digit_range[0]}_{digit_range[1]}")
+    if box is not None:
+        parts.append("box_" + "_".join(build_basename(f"{bound:g}") for bound in box))
+
+    return "_".join(parts)
+
+
+def load_saved_trajectory(expr: str, base: int, nb_digits: int) -> Tuple[str, int, TrajectoryPyramid]:
+    """
+    Find the longest saved sequence of an expression, and load the pyramid of its trajectory.
+
+    If the pyramid is missing, it is built in one pass over the saved digits, and saved.
+
+    Parameters
+    ----------
+    expr : str
+        String expression representing a number.
+    base : int
+        Radix base of the digits.
+    nb_digits : int
+        Largest number of digits of the sequence.
+
+    Returns
+    -------
+    path : str
+        Path of the packed sequence.
+    nb_saved : int
+        Number of saved digits.
+    pyramid : TrajectoryPyramid
+        Pyramid of the trajectory.
+
+    Raises
+    ------
+    ValueError
+        If no sequence of the expression is saved in this base.
+    """
+    saved_sequence = find_saved_sequence(expr, base, nb_digits, extensions=(PACKED_EXTENSION,))
+    if saved_sequence is None:
+        raise ValueError(f"No saved sequence of {expr} in base {base} with up to {nb_digits} digits,"
+                         + " run without region of interest first")
+    path, nb_saved = saved_sequence
+
+    pyramid_path = path[:-len(PACKED_EXTENSION)] + LOD_EXTENSION
+    pyramid = load_pyramid(pyramid_path) if os.path.exists(pyramid_path) else None
+    if pyramid is None or pyramid.nb_points != nb_saved + 1:
+        pyramid = output_pyramid(iter_points(iter_packed_sequence(path), base), expr, base, nb_saved)
+
+    return (path, nb_saved, pyramid)
+
+
+def get_block_loader(path: str, pyramid: TrajectoryPyramid, base: int) -> BlockLoader:
+    """
+    Build a function rebuilding the points of blocks of level 0 from the saved digits.
+
+    Parameters
+    ----------
+    path : str
+        Path of the packed sequence.
+    pyramid : TrajectoryPyramid
+        Pyramid of the trajectory.
+    base : int
+        Radix base of the digits.
+
+    Returns
+    -------
+    load_points : callable
+        Function returning the (xs, ys) coordinates of all the points of some sorted blocks,
+        see ``utils.pyramid.select_window``.
+    """
+    header, data = open_packed_sequence(path)
+
+    def load_points(blocks: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        xs, ys = [np.empty(0)], [np.empty(0)]
+        # runs of consecutive blocks are read as one slice of digits
+        run_starts = np.flatnonzero(np.diff(blocks, prepend=-2) != 1)
+        run_stops = np.append(run_starts[1:], len(blocks))
+        for first_block, last_block in zip(blocks[run_starts], blocks[run_stops - 1]):
+            first_point = first_block * LOD_BLOCK_SIZE
+            last_point = min((last_block + 1)*LOD_BLOCK_SIZE, pyramid.nb_points) - 1
+            digits = unpack_digits(data, header["bits_per_digit"], first_point, last_point)
+            run_xs, run_ys = get_points_from_digits(digits, base, start=tuple(pyramid.anchors[first_block]))
+            xs.append(run_xs)
+            ys.append(run_ys)
+
+        return (np.concatenate(xs), np.concatenate(ys))
+
+    return load_points
+
+
+def get_point(load_points: BlockLoader, index: int) -> Tuple[float, float]:
+    """
+    Get the coordinates of a single point of the trajectory.
+
+    Parameters
+    ----------
+    load_points : callable
+        Function returning the coordinates of the points of some blocks, see ``get_block_loader``.
+    index : int
+        Index of the point.
+
+    Returns
+    -------
+    point : tuple of float
+        (x, y) coordinates of the point.
+    """
+    xs, ys = load_points(np.array([index // LOD_BLOCK_SIZE]))
+
+    return (float(xs[index % LOD_BLOCK_SIZE]), float(ys[index % LOD_BLOCK_SIZE]))
+
+
+def render_window(expr: str, base: int, nb_digits: int, options: Namespace) -> None:
+    """
+    Plot a region of interest of the saved trajectory of an expression.
+
+    Parameters
+    ----------
+    expr : str
+        String expression representing a number.
+    base : int
+        Radix base of the digits.
+    nb_digits : int
+        Largest number of digits of the saved sequence to use.
+    options : argparse.Namespace
+        Parsed command-line options (``roi_box``, ``roi_digits``, ``renderer``, ``save`` and ``show``).
+
+    Raises
+    ------
+    ValueError
+        If no sequence is saved, or if the range of digits goes beyond the saved digits.
+    """
+    # pylint: disable=import-outside-toplevel
+    from visu.raster import RASTER_SIZE, get_raster_transform, plot_window_raster
+    path, nb_saved, pyramid = load_saved_trajectory(expr, base, nb_digits)
+    load_points = get_block_loader(path, pyramid, base)
+    box = tuple(options.roi_box) if options.roi_box is not None else None
+    digit_range = tuple(options.roi_digits) if options.roi_digits is not None else None
+
+    index_range, bounds = None, box
+    markers = [(tuple(pyramid.endpoints[0]), 0), (tuple(pyramid.endpoints[1]), nb_saved)]
+    if digit_range is not None:
+        start, stop = digit_range
+        if stop > nb_saved:
+            raise ValueError(f"Only {nb_saved:,} digits of {expr} in base {base} are saved, not {stop:,}")
+        # the digits start to stop-1 lead from point start to point stop
+        index_range = (start, stop + 1)
+        markers = [(get_point(load_points, start), start), (get_point(load_points, stop), stop)]
+        if bounds is None:
+            x_min, x_max, y_min, y_max = get_window_bounds(pyramid, load_points, index_range)
+            margin = WINDOW_MARGIN * max(x_max - x_min, y_max - y_min, 1.)
+            bounds = (x_min - margin, x_max + margin, y_min - margin, y_max + margin)
+    if bounds is None:
+        bounds = get_pyramid_bounds(pyramid)
+
+    if options.renderer == "raster":
+        scale = get_raster_transform(bounds, RASTER_SIZE)[0]
+    else:
+        from visu.plot_sequence import PLOT_SIZE
+        scale = PLOT_SIZE / max(bounds[1] - bounds[0], bounds[3] - bounds[2], 1.)
+    window_points = select_window(pyramid, scale, load_points, box=box, index_range=index_range)
+
+    latex_name = build_latex_name(expr)
+    if digit_range is not None:
+        description = f"digits {digit_range[0]:,} to {digit_range[1] - 1:,}"
+        title = f"Digits {digit_range[0]:,} to {digit_range[1] - 1:,} of {latex_name} (base {base})"
+    else:
+        description = f"box {box}"
+        title = f"{nb_saved:,} digits of {latex_name} (base {base}), zoom"
+    print(f"# Plotting {expr} in base {base}, {description} of {path}: {len(window_points[0]):,} points drawn")
+    savepath = None
+    if options.save:
+        savepath = f"out/{build_basename(expr)}_{base:03d}_{nb_saved:06d}_{get_window_suffix(box, digit_range)}.png"
+
+    number_params = (expr, base, nb_saved)
+    if options.renderer == "raster":
+        plot_window_raster(window_points, bounds, number_params, markers, savepath, bool_show=options.show)
+    else:
+        from visu.plot_sequence import plot_window
+        plot_window(window_points, bounds, number_params, title, markers, savepath, bool_show=options.show)
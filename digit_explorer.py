@@ -24,16 +24,24 @@ python digit_explorer.py --expr "phi-1" "sin(log10(sqrt(pi/e**2))" --digits "69"
 """
 
 import argparse
+import asyncio
+import cProfile
+import os
+import sys
 
-import matplotlib.pyplot as plt
-
-from core.compute_digits import compute_digit_sequence, get_points_from_digits
-from visu.plot_sequence import plot_sequence
+from core.analytics import save_stats_table
+from core.cache import DEFAULT_CACHE_DIR, DEFAULT_CACHE_SIZE
+from core.manifest import COMPLETION_LOG_SUFFIX, run_manifest
+from core.runner import STREAM_THRESHOLD, run_grid, print_summary
+from core.server import DEFAULT_HOST, DEFAULT_PORT, DEFAULT_MEMORY_SIZE, serve
 from utils.expression import STANDARD_FCTS, STANDARD_CSTS
+from utils.profiling import enable_profiling, pop_records, print_profile_table, dump_profile_json
+from utils.spigot import BBP_BASES, has_spigot
 
-MAX_DIGITS     = 100_000
+MAX_DIGITS     = 100_000_000
 DEFAULT_DIGITS = 31_416
 DEFAULT_BASE   = 10
+DEFAULT_FPS    = 30
 
 
 def main() -> None:
@@ -41,7 +49,7 @@ def main() -> None:
 
     parser = argparse.ArgumentParser(
         description=("Plot the digit trajectory of a given constant or expression in a given base. The image and the digit sequence"
-                     + " are saved in folder out/ as '<expression>_<base>_<digits>.png' and '(idem).txt'"),
+                     + " are saved in folder out/ as '<expression>_<base>_<digits>.png' and '(idem).digits' (packed binary)"),
         formatter_class=argparse.RawDescriptionHelpFormatter)
     parser.add_argument("-e", "--expr", "--expression", nargs="+", type=str, default=["pi"], dest="expr",
                         help="expressions(s) of which to plot the digit trajectory. Expressions can be constants (see examples). Default is 'pi'")
@@ -54,8 +62,67 @@ def main() -> None:
     parser.add_argument("--disp", action="store_true", default=False,
                         help="if given, display the digit sequence. Default is False")
     parser.add_argument("--no-save", action="store_false", dest="save", default=True,
-                        help="if given, do not save PNG image(s) nor text file(s). If not, images and sequences"
-                        + " are saved in folder out/ as '<expr>_<base>_<digits>.png' and '(idem).txt', Default is False")
+                        help="if given, do not save PNG image(s) nor sequence file(s). If not, images and sequences"
+                        + " are saved in folder out/ as '<expr>_<base>_<digits>.png' and '(idem).digits', Default is False")
+    parser.add_argument("--text", action="store_true", default=False,
+                        help="if given, also export each saved sequence as a text block in '<expr>_<base>_<digits>.txt'. Default is False")
+    parser.add_argument("--renderer", choices=["matplotlib", "raster"], default="matplotlib",
+                        help="backend drawing the image(s): 'matplotlib' (scatter plot, with title) or 'raster' (direct pixel binning,"
+                        + " faster and lighter for long sequences). Default is 'matplotlib'")
+    parser.add_argument("--stream", action="store_true", default=False,
+                        help="if given, process the sequence(s) chunk by chunk with bounded memory, and rasterize the image(s) directly."
+                        + f" Always enabled above {STREAM_THRESHOLD} digits. Default is False")
+    parser.add_argument("--extend", action="store_true", default=False,
+                        help="if given, extend the longest sequence already cached or saved in out/ instead of converting all digits again,"
+                        + " and append the new digits to a copy of its text file when exported with --text. Default is False")
+    parser.add_argument("--no-cache", action="store_false", dest="cache", default=True,
+                        help="if given, do not read nor write the digit cache. Default is False")
+    parser.add_argument("--cache-dir", type=str, default=DEFAULT_CACHE_DIR,
+                        help=f"directory of the digit cache. Default is '{DEFAULT_CACHE_DIR}'")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_SIZE // 2**20,
+                        help=f"maximal size of the digit cache in MB, least recently used sequences are evicted first. Default is {DEFAULT_CACHE_SIZE // 2**20}")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="number of worker processes running the expression x base x digits grid. 0 uses all cores. Default is 1")
+    parser.add_argument("--method", choices=["fast", "spigot"], default="fast",
+                        help="'fast' evaluates each expression once at full precision, then converts it."
+                           + " 'spigot' extracts the digits of pi in bases 2, 4, 8 and 16 chunk by chunk with the BBP formula,"
+                           + " from any offset. Default is 'fast'")
+    parser.add_argument("--offset", type=int, default=0,
+                        help="index of the first digit to plot, 0 being the first decimal place. Only with --method spigot. Default is 0")
+    parser.add_argument("--roi-digits", nargs=2, type=int, default=None, metavar=("START", "STOP"),
+                        help="if given, only plot the path of the digits START to STOP-1 of the sequence(s) saved by a previous run,"
+                        + " without computing anything. Default is None")
+    parser.add_argument("--roi-box", nargs=4, type=float, default=None, metavar=("XMIN", "XMAX", "YMIN", "YMAX"),
+                        help="if given, only plot the part of the trajectories saved by a previous run that lies in this box,"
+                        + " without computing anything. Can be combined with --roi-digits. Default is None")
+    parser.add_argument("--stats", type=str, default=None, metavar="PATH",
+                        help="if given, draw and save nothing, but compute the statistics of each trajectory (displacement, extent,"
+                        + " quadrants, returns to the origin, digit frequencies, comparison with a random walk) and save them"
+                        + " as a table in PATH: CSV, or NumPy columnar arrays if PATH ends with '.npz'. Default is None")
+    parser.add_argument("--animate", choices=["png", "mp4"], default=None,
+                        help="if given, also save an animation of the growth of each trajectory: numbered PNG frames in"
+                        + " out/<expression>_<base>_<digits>_frames/, or an MP4 video (requires ffmpeg). Default is None")
+    parser.add_argument("--fps", type=int, default=DEFAULT_FPS,
+                        help=f"frame rate of the animations, in frames per second. Default is {DEFAULT_FPS}")
+    parser.add_argument("--digits-per-frame", type=int, default=None,
+                        help="number of digits added by each frame of the animations. Default is such that they last about 10 s")
+    parser.add_argument("--viewport", choices=["fixed", "growing"], default="fixed",
+                        help="viewport of the animations: fitted to the whole trajectory, or growing with it. Default is 'fixed'")
+    parser.add_argument("--manifest", type=str, default=None, metavar="PATH",
+                        help="if given, run the jobs listed in this JSON, TOML or CSV file (fields expr, base, digits, and optionally"
+                        + " renderer and text) instead of the cross product of --expr, --digits and --base. Finished jobs are logged in"
+                        + f" PATH{COMPLETION_LOG_SUFFIX}, and skipped by the next runs while their outputs exist. Default is None")
+    parser.add_argument("--serve", type=int, nargs="?", const=DEFAULT_PORT, default=None, metavar="PORT",
+                        help=f"if given, run a local render server on this port (default {DEFAULT_PORT}) instead, answering"
+                        + " /render, /digits and /stats requests with warm workers and a shared memory cache. Default is None")
+    parser.add_argument("--memory-cache", type=int, default=DEFAULT_MEMORY_SIZE // 2**20, metavar="MIB",
+                        help=f"maximal size of the memory cache of the server, in MiB. Default is {DEFAULT_MEMORY_SIZE // 2**20}")
+    parser.add_argument("--profile", action="store_true", default=False,
+                        help="if given, measure the time and memory peak of each stage of each job, and print them at the end")
+    parser.add_argument("--profile-json", type=str, default=None,
+                        help="if given, save the profiling records as JSON in this file. Implies --profile")
+    parser.add_argument("--profile-pstats", type=str, default=None,
+                        help="if given, save a cProfile dump of the main process in this file, to be read with pstats or snakeviz. Implies --profile")
     parser.add_argument("-l", "--list", action="store_true",
                         help="if given, show the lists of valid mathematical functions and constants.")
 
@@ -64,13 +131,19 @@ def main() -> None:
                   + f'  python {parser.prog} --expr "phi" --digits 2000 --base 16 --disp     -> plot the first 2000 digits of phi in base 16 and display them in plain text\n'
                   + f'  python {parser.prog} -e "phi" -d 20000 -base 16 --show --no-save     -> show the previous trajectory and do not save it, nor the digits\n'
                   + f'  python {parser.prog} -e "e" "pi" -d 1234 5678 -b 7 11 13             -> plot the first 1234 and 5678 digits of e and pi'
-                  +  ' in bases 7, 11 and 13, and save them in 12 separate PNG files and 12 separate text files\n'
-                  + f'  python {parser.prog} -e "sin(log10(sqrt(apery**3/(euler+1))))" -d 50 -> plot the first 50 digits of this awful expression\n\n'
+                  +  ' in bases 7, 11 and 13, and save them in 12 separate PNG files and 12 separate sequence files\n'
+                  + f'  python {parser.prog} -e "sin(log10(sqrt(apery**3/(euler+1))))" -d 50 -> plot the first 50 digits of this awful expression\n'
+                  + f'  python {parser.prog} -d 100000 --roi-digits 40000 60000              -> zoom on digits 40000 to 59999 of the saved 100000 digits of pi\n'
+                  + f'  python {parser.prog} -d 100000 --animate mp4 --viewport growing    -> save a video of the growth of the trajectory of pi\n'
+                  + f'  python {parser.prog} --manifest nightly.csv -j 8                       -> run the jobs listed in nightly.csv, resuming after the last finished one\n'
+                  + f'  python {parser.prog} --serve 8765 -j 4                                -> serve images on http://127.0.0.1:8765/render?expr=pi&base=10&digits=1000\n'
+                  + f'  python {parser.prog} -e pi e -b {{2..64}} -d 1000 10000 --stats s.csv -> tabulate the statistics of 252 trajectories, without any image\n\n'
                   +  'Important note:\n'
                   +  '  An expression cannot start with "-" (like --expr "-2*pi"). Either add an initial space (--expr " -2*pi")'
                   +  ' or rephrase the expression (--expr "pi*(-2)").\n\n'
                   +  'Note for --nerds-- astute users:\n'
-                  +  '  You may have noticed that the very last digits are sometimes rounded up. This is due to how digits are computed given a precision.\n')
+                  +  '  Expressions are evaluated with guard digits, then checked at a higher precision. If the last digits are still ambiguous'
+                  +  ' (e.g. a long run of 0s or base-1 digits), a warning tells how many digits are certified.\n')
     args = parser.parse_args()
 
     # Check inputs
@@ -91,20 +164,99 @@ def main() -> None:
             print(f"/!\\ Invalid base: {b}, must be > 1. Ignored")
     args.base = [b for b in args.base if b > 1]
 
-    # Loopy loops
-    for expr in args.expr:
-        for base in args.base:
-            for nb_digits in args.digits:
-                s = "" if args.digits == 1 else "s"
-                print(f"# Plotting {expr} in base {base} with {nb_digits:,} digit{s}")
-                constant_params = (expr, base, nb_digits)
-                digit_sequence = compute_digit_sequence(expr, base, nb_digits,
-                                                        bool_disp=args.disp, bool_save=args.save)
-                pt_coords = get_points_from_digits(digit_sequence, base)
-                plot_sequence(pt_coords, constant_params, bool_show=args.show, bool_save=args.save)
+    if args.offset < 0 or (args.offset and args.method != "spigot"):
+        print(f"/!\\ Invalid offset: {args.offset}, must be >= 0 and used with --method spigot. Ignored")
+        args.offset = 0
+
+    if args.method == "spigot" and not args.manifest:
+        no_spigot = [(expr, b) for expr in args.expr for b in args.base if not has_spigot(expr, b)]
+        for expr, b in no_spigot:
+            print(f"/!\\ No spigot for {expr} in base {b}, only for pi in bases {', '.join(map(str, BBP_BASES))}")
+        if no_spigot:
+            return
+
+    if args.roi_digits is not None and not (0 <= args.roi_digits[0] < args.roi_digits[1]):
+        print(f"/!\\ Invalid range of digits: {args.roi_digits}, must be 0 <= START < STOP. Ignored")
+        args.roi_digits = None
+    if args.roi_box is not None and not (args.roi_box[0] < args.roi_box[1] and args.roi_box[2] < args.roi_box[3]):
+        print(f"/!\\ Invalid box: {args.roi_box}, must be XMIN < XMAX and YMIN < YMAX. Ignored")
+        args.roi_box = None
+
+    if args.stats and (args.roi_digits is not None or args.roi_box is not None):
+        print("/!\\ --stats cannot be used with a region of interest. Region of interest ignored")
+        args.roi_digits, args.roi_box = None, None
+
+    if args.manifest and (args.stats or args.roi_digits is not None or args.roi_box is not None):
+        print("/!\\ --manifest cannot be used with --stats nor a region of interest. Statistics and region of interest ignored")
+        args.stats, args.roi_digits, args.roi_box = None, None, None
+
+    if args.fps < 1:
+        print(f"/!\\ Invalid frame rate: {args.fps}, must be > 0. Using {DEFAULT_FPS}")
+        args.fps = DEFAULT_FPS
+    if args.digits_per_frame is not None and args.digits_per_frame < 1:
+        print(f"/!\\ Invalid number of digits per frame: {args.digits_per_frame}, must be > 0. Ignored")
+        args.digits_per_frame = None
+    if args.animate and (args.stats or args.roi_digits is not None or args.roi_box is not None):
+        print("/!\\ --animate cannot be used with --stats nor a region of interest. Animation ignored")
+        args.animate = None
+    if args.animate and not args.save:
+        print("/!\\ --animate cannot be used with --no-save, the animation being written in out/. Animation ignored")
+        args.animate = None
+
+    args.cache_dir = args.cache_dir if args.cache else None
+    args.cache_size = args.cache_size * 2**20
+
+    nb_jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    if args.show and nb_jobs > 1:
+        print("/!\\ --show cannot be used with several jobs. Running with 1 job")
+        nb_jobs = 1
+
+    if args.serve is not None:
+        try:
+            asyncio.run(serve(DEFAULT_HOST, args.serve, nb_jobs, args.cache_dir, args.cache_size,
+                              args.memory_cache * 2**20, MAX_DIGITS))
+        except KeyboardInterrupt:
+            print("Server stopped")
+        return
+
+    args.profile = args.profile or bool(args.profile_json) or bool(args.profile_pstats)
+    if args.profile:
+        enable_profiling()
+    profiler = cProfile.Profile() if args.profile_pstats else None
+
+    # Loopy loops: each expression is evaluated once, for all bases and numbers of digits
+    if profiler is not None:
+        profiler.enable()
+    if args.manifest:
+        try:
+            results = run_manifest(args.manifest, args, nb_jobs=nb_jobs)
+        except (OSError, ValueError) as e:
+            print(f"/!\\ Invalid manifest {args.manifest}: {e}")
+            return
+    else:
+        results = run_grid(args.expr, args.base, args.digits, args, nb_jobs=nb_jobs)
+    if profiler is not None:
+        profiler.disable()
+    print_summary(results)
+
+    if args.stats:
+        stats = [result.stats for result in results if result.stats is not None]
+        save_stats_table(stats, args.stats)
+        print(f"Statistics saved: {args.stats} ({len(stats)} rows)")
+
+    if args.profile:
+        records = pop_records()
+        print_profile_table(records)
+        if args.profile_json:
+            dump_profile_json(records, args.profile_json, metadata={"argv": sys.argv[1:], "jobs": nb_jobs})
+            print(f"Profile saved:  {args.profile_json}")
+        if profiler is not None:
+            profiler.dump_stats(args.profile_pstats)
+            print(f"Profile saved:  {args.profile_pstats}")
 
     if args.show:
-        # keep windows open
+        # keep windows open, pyplot being only imported by the runs that plot
+        import matplotlib.pyplot as plt  # pylint: disable=import-outside-toplevel
         plt.show()
 
 
@@ -0,0 +1,50 @@
+"""Tests of the trajectory statistics, mostly the exact returns to the origin and quadrants."""
+
+import numpy as np
+import pytest
+
+from core.analytics import compute_trajectory_stats, get_lattice_signs
+
+
+def get_stats(digits, base, nb_chunks=1):
+    digits = np.array(digits, dtype=np.int64)
+    return compute_trajectory_stats(np.array_split(digits, nb_chunks), "test", base, [len(digits)])[0]
+
+
+def test_get_lattice_signs():
+    rng = np.random.default_rng(0)
+    a, b = rng.integers(-1000, 1001, size=(2, 10_000))
+    a[:10], b[:10] = 0, 0
+    expected = np.sign(a + b * np.sqrt(2)/2)
+
+    assert np.array_equal(get_lattice_signs(a, b), expected)
+    # 2*665857^2 - 941664^2 = 2: both parts nearly cancel, the integer part being slightly larger
+    assert get_lattice_signs(np.array([-665_857]), np.array([941_664]))[0] == -1
+    assert get_lattice_signs(np.array([665_857]), np.array([-941_664]))[0] == 1
+
+
+@pytest.mark.parametrize("base, loop", [(2, [0, 1]), (4, [0, 1, 2, 3]), (8, [1, 5]), (8, [1, 3, 5, 7]),
+                                        (3, [0, 1, 2]), (6, [0, 3]), (6, [0, 2, 4])])
+@pytest.mark.parametrize("nb_chunks", [1, 3])
+def test_origin_returns(base, loop, nb_chunks):
+    stats = get_stats(loop * 100, base, nb_chunks)
+
+    assert stats.nb_origin_returns == 100
+    assert stats.final_displacement < 1e-9
+
+
+@pytest.mark.parametrize("base, away, back", [(8, 1, 5), (6, 1, 4), (12, 1, 7)])
+def test_long_return(base, away, back):
+    nb_steps = 200_000
+    stats = get_stats([away] * nb_steps + [back] * nb_steps, base, nb_chunks=7)
+
+    assert stats.nb_origin_returns == 1
+    assert stats.max_radius == pytest.approx(nb_steps)
+
+
+def test_quadrants():
+    # base 8, directions clockwise from up: the points (0,1), (1,1), (1,0), (0,0), (-1,0) and (-1,-1)
+    stats = get_stats([0, 2, 4, 6, 6, 4], 8)
+
+    assert stats.nb_origin_returns == 1
+    assert (stats.quadrant_1, stats.quadrant_2, stats.quadrant_3, stats.quadrant_4) == (2/6, 1/6, 2/6, 0)
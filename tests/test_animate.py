@@ -0,0 +1,75 @@
+"""Tests of the incremental animation of trajectories."""
+
+import numpy as np
+import pytest
+
+from core.compute_digits import iter_points_from_digits
+from visu import animate
+from visu.animate import (VIEWPORT_GROWTH, animate_sequence, get_digits_per_frame, grow_viewport,
+                          iter_animation_frames, open_frame_writer)
+from visu.raster import rasterize_sequence
+
+
+@pytest.mark.parametrize("nb_digits, fps, duration, expected", [
+    (300, 30, 10., 1), (301, 30, 10., 2), (0, 30, 10., 1), (1000, 1, .5, 1000),
+])
+def test_get_digits_per_frame(nb_digits, fps, duration, expected):
+    assert get_digits_per_frame(nb_digits, fps, duration) == expected
+
+
+def test_grow_viewport():
+    bounds = (-1., 1., -1., 1.)
+    assert grow_viewport(bounds, np.array([0., 1.]), np.array([-1., .5])) is None
+
+    x_min, x_max, y_min, y_max = grow_viewport(bounds, np.array([0., 1.5]), np.array([0., -3.]))
+    assert x_max - x_min == y_max - y_min == 4.
+    assert x_min <= -1. and x_max >= 1.5 and y_min <= -3. and y_max >= 1.
+
+    # a small overflow still zooms out by VIEWPORT_GROWTH
+    x_min, x_max, _, _ = grow_viewport(bounds, np.array([1.1]), np.array([0.]))
+    assert x_max - x_min == VIEWPORT_GROWTH * 2.
+
+
+@pytest.mark.parametrize("digits_per_frame", [1, 7, 100])
+def test_last_frame_is_the_whole_image(digits_per_frame):
+    digits = np.random.default_rng(0).integers(0, 10, 100)
+    frames = [frame.copy() for frame in iter_animation_frames(digits, 10, digits_per_frame, size=96)]
+    rgba = rasterize_sequence(lambda: iter_points_from_digits(digits, 10), ("test", 10, 100), size=96)
+
+    assert len(frames) == -(-100 // digits_per_frame)
+    np.testing.assert_array_equal(frames[-1], rgba)
+
+
+def test_growing_viewport():
+    # a walk drifting up and right leaves the initial viewport
+    digits = np.random.default_rng(0).integers(0, 2, 400)
+    frames = [frame.copy() for frame in iter_animation_frames(digits, 4, 20, size=96, bool_growing=True,
+                                                              legend_position=None)]
+
+    assert len(frames) == 20
+    assert all(frame.shape == (96, 96, 4) for frame in frames)
+    assert not np.array_equal(frames[0], frames[-1])
+
+
+def test_png_frame_writer(tmp_path):
+    savepath = str(tmp_path / "frames")
+    frame = np.zeros((8, 8, 4), dtype=np.uint8)
+    frame[..., 3] = 255
+    with open_frame_writer(savepath, 8) as write_frame:
+        for _ in range(3):
+            write_frame(frame)
+    with open_frame_writer(savepath, 8) as write_frame:
+        write_frame(frame)
+
+    # the frames of the previous animation are removed
+    assert sorted(path.name for path in (tmp_path / "frames").iterdir()) == ["frame_000000.png"]
+
+
+def test_mp4_falls_back_to_png_without_ffmpeg(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(animate.shutil, "which", lambda _: None)
+    digits = np.random.default_rng(0).integers(0, 10, 50)
+    savepath = animate_sequence(digits, ("test", 10, 50), "mp4", digits_per_frame=10, size=32)
+
+    assert savepath == "out/test_010_000050_frames"
+    assert len(list((tmp_path / savepath).iterdir())) == 5
@@ -0,0 +1,39 @@
+"""Tests of the benchmark runner on child processes that crash or hang."""
+
+import multiprocessing
+import os
+import time
+
+from bench.benchmark import compare_results, wait_measure
+
+
+def start_child(target, *args):
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    process = ctx.Process(target=target, args=args)
+    process.start()
+
+    return process, queue
+
+
+def test_wait_measure_crash():
+    process, queue = start_child(os._exit, 3)
+    assert wait_measure(process, queue) == {"error": "child process exited with code 3"}
+
+
+def test_wait_measure_timeout():
+    process, queue = start_child(time.sleep, 60)
+    start_time = time.perf_counter()
+    assert wait_measure(process, queue, timeout=0.5) == {"error": "timeout after 0.5s"}
+    assert time.perf_counter() - start_time < 30
+    assert not process.is_alive()
+
+
+def test_compare_results():
+    baseline = [{"stage": "extract", "expr": "pi", "base": 10, "nb_digits": 1000, "time_s": 1.},
+                {"stage": "render", "expr": "pi", "base": 10, "nb_digits": 1000, "time_s": 1.}]
+    results = [{"stage": "extract", "expr": "pi", "base": 10, "nb_digits": 1000, "time_s": 1.5},
+               {"stage": "render", "expr": "pi", "base": 10, "nb_digits": 1000, "error": "timeout after 1s"}]
+    regressions = compare_results(results, baseline, 0.2)
+
+    assert len(regressions) == 1 and regressions[0]["stage"] == "extract"
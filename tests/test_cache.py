@@ -0,0 +1,47 @@
+"""Tests of the persistent on-disk digit cache."""
+
+import os
+
+import numpy as np
+
+from core.cache import get_cache_path, load_digits, store_digits
+
+
+def test_store_and_load(tmp_path):
+    digits = np.random.default_rng(0).integers(0, 10, 1000)
+    store_digits(str(tmp_path), "pi", 10, digits)
+
+    assert load_digits(str(tmp_path), "pi", 10, 1001) is None
+    assert load_digits(str(tmp_path), "e", 10) is None
+    assert load_digits(str(tmp_path), "pi", 16) is None
+    cached = load_digits(str(tmp_path), "pi", 10, 500)
+    assert cached.dtype == np.uint8
+    np.testing.assert_array_equal(cached, digits[:500])
+    # the expression is normalized
+    np.testing.assert_array_equal(load_digits(str(tmp_path), " pi ", 10), digits)
+
+
+def test_keep_longest(tmp_path):
+    digits = np.random.default_rng(0).integers(0, 256, 1000)
+    store_digits(str(tmp_path), "e", 256, digits)
+    store_digits(str(tmp_path), "e", 256, digits[:10])
+    np.testing.assert_array_equal(load_digits(str(tmp_path), "e", 256), digits)
+
+    longer_digits = np.concatenate((digits, digits))
+    store_digits(str(tmp_path), "e", 256, longer_digits)
+    np.testing.assert_array_equal(load_digits(str(tmp_path), "e", 256), longer_digits)
+
+
+def test_evict_least_recently_used(tmp_path):
+    digits = np.zeros(1000, dtype=np.uint8)
+    for index, expr in enumerate(["pi", "e", "phi"]):
+        store_digits(str(tmp_path), expr, 10, digits)
+        os.utime(get_cache_path(str(tmp_path), expr, 10), (index, index))
+    # reading an entry makes it the most recently used
+    assert load_digits(str(tmp_path), "pi", 10) is not None
+
+    entry_size = os.path.getsize(get_cache_path(str(tmp_path), "pi", 10))
+    store_digits(str(tmp_path), "apery", 10, digits, max_size=3*entry_size)
+
+    assert [load_digits(str(tmp_path), expr, 10) is not None for expr in ["pi", "e", "phi", "apery"]] \
+        == [True, False, True, True]
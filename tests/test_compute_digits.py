@@ -0,0 +1,104 @@
+"""Tests of the evaluation of expressions and of the digit sequences built from it."""
+
+import pickle
+
+import numpy as np
+import pytest
+from mpmath import mp, mpf
+
+from core.compute_digits import evaluate_certified, evaluate_expr, extend_digit_sequence, freeze_number, thaw_number
+from utils.digits import (get_digit_dtype, get_digits_in_base, get_digits_window, get_nb_certified_digits,
+                          get_nb_digits_base_10)
+
+
+@pytest.fixture(autouse=True)
+def restore_precision():
+    with mp.workprec(mp.prec):
+        yield
+
+
+@pytest.mark.parametrize("base", [3, 10, 16])
+def test_get_digits_window(base):
+    number = evaluate_expr("sqrt(2)", get_nb_digits_base_10(base, 3000))
+    digits = get_digits_in_base(number, base, 3000)
+
+    np.testing.assert_array_equal(get_digits_window(number, base, 1234, 3000), digits[1234:])
+    np.testing.assert_array_equal(get_digits_window(number, base, 0, 1), digits[:1])
+
+
+@pytest.mark.parametrize("base", [7, 10])
+def test_extend_digit_sequence(base):
+    number = evaluate_expr("pi", get_nb_digits_base_10(base, 3000))
+    digits = get_digits_in_base(number, base, 3000, dtype=get_digit_dtype(base))
+
+    extended = extend_digit_sequence("pi", base, digits[:1000], 3000, number)
+    assert extended.dtype == get_digit_dtype(base)
+    np.testing.assert_array_equal(extended, digits)
+    np.testing.assert_array_equal(extend_digit_sequence("pi", base, digits, 500), digits[:500])
+
+
+def test_extend_rounded_sequence():
+    number = evaluate_expr("e", 2000)
+    digits = get_digits_in_base(number, 10, 2000, dtype=np.uint8)
+
+    # the last known digits were rounded up
+    known = digits[:1000].copy()
+    known[-1] += 1
+    np.testing.assert_array_equal(extend_digit_sequence("e", 10, known, 2000, number), digits)
+
+    # an early mismatch means that the known digits are not those of the expression
+    known = digits[:1000].copy()
+    known[980] = (known[980] + 1) % 10
+    with pytest.raises(ValueError, match="disagree"):
+        extend_digit_sequence("e", 10, known, 2000, number)
+
+
+def test_freeze_number():
+    number = evaluate_expr("sqrt(3)", 2000)
+    frozen_number = pickle.loads(pickle.dumps(freeze_number(number)))
+    # the receiving process works at a lower precision
+    with mp.workdps(15):
+        assert thaw_number(frozen_number) == number
+        assert thaw_number(freeze_number(None)) is None
+        assert thaw_number(freeze_number(0.25)) == 0.25
+
+
+def test_get_nb_certified_digits():
+    x = mpf(1) / 3
+    assert get_nb_certified_digits(x, mpf(0), 10, 50) == 50
+    assert get_nb_certified_digits(x, mpf(10)**-20, 10, 50) in (18, 19)
+    # 0.0999999... +- 1e-10 may be 0.1000..., so that not even the first digit is known
+    assert get_nb_certified_digits(mpf("0.1") - mpf(10)**-15, mpf(10)**-10, 10, 20) == 0
+
+
+@pytest.mark.parametrize("expr", ["pi", "sqrt(2)", "exp(1)/7 - 0.25", "1 - atan(log10(sqrt(euler**3 / apery**.6)))"])
+def test_evaluate_certified(expr):
+    bases = [2, 10, 60]
+    number, nb_certified = evaluate_certified(expr, bases, 1000)
+    assert nb_certified == dict.fromkeys(bases, 1000)
+
+    with mp.workdps(15):
+        reference = evaluate_expr(expr, get_nb_digits_base_10(60, 1000) + 100)
+    for base in bases:
+        np.testing.assert_array_equal(get_digits_in_base(number, base, 1000),
+                                      get_digits_in_base(reference, base, 1000))
+
+
+def test_evaluate_certified_near_carry():
+    # 1 - 10**-30 is 0.999...999000..., but any approximation reads either 0.999...998999...
+    # or 0.999...999000...: the 30th digit cannot be certified, whatever the precision
+    number, nb_certified = evaluate_certified("1 - exp(-30*ln(10))", [10], 40)
+    assert nb_certified == {10: 29}
+    assert get_digits_in_base(number, 10, 29).tolist() == [9] * 29
+
+
+def test_evaluate_certified_plain_numbers():
+    number, nb_certified = evaluate_certified("1/3", [2, 10], 100)
+    assert isinstance(number, float)
+    assert 40 <= nb_certified[2] < 53 and 12 <= nb_certified[10] < 17
+
+    _, nb_certified = evaluate_certified("2**100", [10], 100)
+    assert nb_certified == {10: 100}
+
+    _, nb_certified = evaluate_certified("sin(pi) - sin(pi)", [10], 100)
+    assert nb_certified == {10: 100}
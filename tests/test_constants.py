@@ -0,0 +1,35 @@
+"""Tests of the dedicated generators of the famous constants against mpmath."""
+
+from fractions import Fraction
+import math
+
+import pytest
+from mpmath import mp, mpf, nstr
+
+from utils.constants import FAST_CONSTANTS, bsplit, get_fast_constant
+
+REFERENCES = {"pi": lambda: +mp.pi, "e": lambda: +mp.e, "phi": lambda: +mp.phi, "apery": lambda: +mp.apery}
+
+
+@pytest.mark.parametrize("name", list(FAST_CONSTANTS))
+@pytest.mark.parametrize("nb_digits_10", [1, 15, 100, 5000])
+def test_fast_constants(name, nb_digits_10):
+    with mp.workdps(nb_digits_10 + 20):
+        number = get_fast_constant(name, nb_digits_10)
+        reference = REFERENCES[name]()
+        assert abs(number - reference) < mpf(10)**(-nb_digits_10 - 5)
+
+
+def test_fast_constant_not_rounded():
+    # the value keeps all its bits whatever the working precision
+    with mp.workdps(15):
+        number = get_fast_constant("pi", 1000)
+    with mp.workdps(1000):
+        assert nstr(number, 1000) == nstr(+mp.pi, 1000)
+
+
+def test_bsplit():
+    # sum of 1/k! for k < 20, i.e. with p = 1 and q = k
+    _, Q, T = bsplit(lambda k: 1, lambda k: k, lambda k: 1, 0, 20)
+
+    assert Fraction(int(T), int(Q)) == sum(Fraction(1, math.factorial(k)) for k in range(20))
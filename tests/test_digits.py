@@ -0,0 +1,116 @@
+"""Tests of the fast digit conversion against the one-digit-at-a-time reference."""
+
+import io
+
+import numpy as np
+import pytest
+from mpmath import mp, mpf, pi, sqrt
+
+from utils.digits import (format_digit_sequence, get_base_root, get_digit_dtype, get_digits_in_base,
+                          get_digits_in_bases, get_leaf_size, get_nb_digits_base_10, group_base_families,
+                          int_to_digits, iter_chunks, iter_int_digits, parse_digit_sequence, regroup_digits,
+                          write_digit_sequence)
+
+BASES = [2, 3, 10, 16, 60, 256]
+
+
+def get_lengths(base):
+    leaf_size = get_leaf_size(base)
+    return [0, 1, leaf_size - 1, leaf_size, leaf_size + 1, 2*leaf_size, 2*leaf_size + 1, 1000]
+
+
+@pytest.mark.parametrize("base", BASES)
+@pytest.mark.parametrize("expr", ["pi", "sqrt(2) - 1", "1/8"])
+@pytest.mark.parametrize("bool_small_dtype", [False, True])
+def test_fast_matches_loop(base, expr, bool_small_dtype):
+    dtype = get_digit_dtype(base) if bool_small_dtype else int
+    for nb_digits in get_lengths(base):
+        with mp.workdps(get_nb_digits_base_10(base, nb_digits) + 30):
+            x = {"pi": pi, "sqrt(2) - 1": sqrt(2) - 1, "1/8": mpf(1)/8}[expr]
+            x = +x
+            fast_digits = get_digits_in_base(x, base, nb_digits, method="fast", dtype=dtype)
+            loop_digits = get_digits_in_base(x, base, nb_digits, method="loop", dtype=dtype)
+
+        assert fast_digits.dtype == np.dtype(dtype)
+        assert len(fast_digits) == nb_digits
+        np.testing.assert_array_equal(fast_digits, loop_digits, err_msg=f"{expr} in base {base}, {nb_digits} digits")
+
+
+def test_invalid_method():
+    with pytest.raises(ValueError, match="Invalid conversion method"):
+        get_digits_in_base(mpf(1)/3, 10, 10, method="table")
+
+
+def test_families_match_single_bases():
+    bases = [2, 3, 4, 9, 10, 16, 27]
+    with mp.workdps(1000):
+        x = +pi
+        digit_sequences = get_digits_in_bases(x, bases, 500)
+        for base in bases:
+            assert digit_sequences[base].dtype == get_digit_dtype(base)
+            np.testing.assert_array_equal(digit_sequences[base], get_digits_in_base(x, base, 500, method="loop"))
+
+
+@pytest.mark.parametrize("base", [3, 10, 60])
+@pytest.mark.parametrize("nb_digits", [1, 999, 1000, 1001, 5000])
+def test_iter_int_digits(base, nb_digits):
+    n = int.from_bytes(np.random.default_rng(nb_digits).bytes(nb_digits), "big") % base**nb_digits
+    expected_digits, remainder = [], n
+    for _ in range(nb_digits):
+        remainder, digit = divmod(remainder, base)
+        expected_digits.append(digit)
+    chunks = list(iter_int_digits(n, base, nb_digits, chunk_size=1000))
+
+    assert all(len(chunk) == 1000 for chunk in chunks[1:])
+    np.testing.assert_array_equal(np.concatenate(chunks), expected_digits[::-1])
+    np.testing.assert_array_equal(int_to_digits(n, base, nb_digits), expected_digits[::-1])
+
+
+def test_iter_chunks():
+    digit_sequence = np.arange(2500)
+    chunks = list(iter_chunks(digit_sequence, 1000))
+
+    assert [len(chunk) for chunk in chunks] == [1000, 1000, 500]
+    np.testing.assert_array_equal(np.concatenate(chunks), digit_sequence)
+
+
+def test_base_families():
+    assert [get_base_root(base) for base in [2, 8, 10, 27, 60, 64, 100]] \
+        == [(2, 1), (2, 3), (10, 1), (3, 3), (60, 1), (2, 6), (10, 2)]
+    assert group_base_families([16, 3, 10, 2, 9, 100, 8]) == [[16, 2, 8], [3, 9], [10, 100]]
+
+
+@pytest.mark.parametrize("root, power", [(2, 8), (3, 3), (10, 2)])
+def test_regroup_digits(root, power):
+    root_digits = np.random.default_rng(power).integers(0, root, 300 * power)
+    digits = regroup_digits(root_digits, root, power)
+
+    assert digits.tolist() == [int("".join(map(str, group)), root) for group in root_digits.reshape(-1, power)]
+
+
+def format_reference(digit_sequence, base, nb_digits_per_row):
+    nb_chars = int(np.ceil(np.log10(base)))
+    cells = [str(d) if base <= 10 else f"{d:>{nb_chars}d}" for d in digit_sequence]
+    sep = "" if base <= 10 else " "
+
+    return "\n".join(sep.join(cells[i:(i+nb_digits_per_row)]) for i in range(0, len(cells), nb_digits_per_row))
+
+
+@pytest.mark.parametrize("base", [2, 10, 16, 256, 1000])
+@pytest.mark.parametrize("nb_digits", [0, 1, 99, 100, 101, 1234])
+def test_format_digit_sequence(monkeypatch, base, nb_digits):
+    digit_sequence = np.random.default_rng(nb_digits).integers(0, base, nb_digits).astype(get_digit_dtype(base))
+    block = format_digit_sequence(digit_sequence, base)
+
+    assert block == format_reference(digit_sequence.tolist(), base, 100)
+    np.testing.assert_array_equal(parse_digit_sequence(block, base), digit_sequence)
+
+    # the streamed text is the same whatever the chunks, even when rows are written by blocks
+    for chunk_size in [7, 100, 1000]:
+        f = io.StringIO()
+        write_digit_sequence(f, iter_chunks(digit_sequence, chunk_size), base)
+        assert f.getvalue() == block
+    monkeypatch.setattr("utils.digits.TEXT_CHUNK_ROWS", 2)
+    f = io.StringIO()
+    write_digit_sequence(f, [digit_sequence], base)
+    assert f.getvalue() == block
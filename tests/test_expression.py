@@ -0,0 +1,42 @@
+"""Tests of the compilation, validation and evaluation of expressions."""
+
+import pytest
+from mpmath import mp, mpf, sqrt
+
+from utils.expression import compile_expr, normalize_expr, parse_expr
+
+
+@pytest.mark.parametrize("expr", ["__import__('os')", "pi.real", "(lambda: 1)()", "[1, 2]", "True + 1",
+                                  "'a' * 3", "print(1)", "sqrt(x=2)", "unknown", "pi +"])
+def test_forbidden_expressions(expr):
+    with pytest.raises(ValueError, match="Invald expression"):
+        parse_expr(expr)
+
+
+def test_repeated_subexpressions():
+    subexprs, _ = compile_expr("sqrt(5) + 1/sqrt(5) + (1 + sqrt(5))**2")
+    assert len(subexprs) == 1
+
+    with mp.workdps(50):
+        assert parse_expr("sqrt(5) + 1/sqrt(5) + (1 + sqrt(5))**2") == sqrt(5) + 1/sqrt(5) + (1 + sqrt(5))**2
+
+
+def test_evaluation_at_current_precision():
+    # the compiled expression is cached, but evaluated again at each precision
+    with mp.workdps(15):
+        low = parse_expr("exp(1) / 3")
+    with mp.workdps(100):
+        high = parse_expr("exp(1) / 3")
+        assert abs(high - mp.e / 3) < mpf(10)**-98
+    assert abs(high - low) > 0
+
+
+def test_complex_result():
+    with pytest.warns(UserWarning, match="Complex result"):
+        assert parse_expr("sqrt(-4) + 1") == 1
+
+
+def test_normalize_expr():
+    assert normalize_expr(" ( pi ) ") == normalize_expr("pi") == "pi"
+    assert normalize_expr("sqrt( 2 )*e") == "sqrt(2)*e"
+    assert normalize_expr("pi +") == "pi+"
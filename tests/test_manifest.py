@@ -0,0 +1,67 @@
+"""Tests of the manifest loading, job planning and completion log."""
+
+from argparse import Namespace
+import json
+
+import pytest
+
+from core.manifest import ManifestJob, get_job_key, get_job_outputs, is_job_done, load_manifest, plan_jobs
+
+
+def get_options(bool_save: bool = True) -> Namespace:
+    return Namespace(method="fast", offset=0, save=bool_save, stream=False)
+
+
+def test_load_manifest_formats(tmp_path):
+    json_path = tmp_path / "jobs.json"
+    json_path.write_text(json.dumps({"jobs": [{"expr": "pi", "base": 10, "digits": 100},
+                                              {"expr": "e", "base": "16", "digits": 50, "text": "yes"},
+                                              {"expr": "pi", "base": 10, "digits": 100}]}))
+    csv_path = tmp_path / "jobs.csv"
+    csv_path.write_text("expr,base,digits,renderer,text\npi,10,100,,\ne,16,50,,true\n")
+
+    expected = [ManifestJob("pi", 10, 100, "matplotlib", False), ManifestJob("e", 16, 50, "matplotlib", True)]
+    assert load_manifest(str(json_path)) == expected
+    assert load_manifest(str(csv_path)) == expected
+
+
+@pytest.mark.parametrize("job", [{"expr": "pi", "base": 10},
+                                 {"expr": "pi", "base": 10, "digits": 100, "color": "red"},
+                                 {"expr": "pi", "base": 1, "digits": 100},
+                                 {"expr": "pi", "base": 10, "digits": "many"},
+                                 {"expr": "pi", "base": 10, "digits": 100, "renderer": "svg"}])
+def test_load_manifest_invalid(tmp_path, job):
+    path = tmp_path / "jobs.json"
+    path.write_text(json.dumps([job]))
+    with pytest.raises(ValueError, match="Job 1"):
+        load_manifest(str(path))
+
+
+def test_plan_jobs_base_10_order():
+    # 1,000 digits in base 256 need more precision than 3,000 digits in base 2
+    jobs = [ManifestJob("e", 2, 3000, "matplotlib", False), ManifestJob("pi", 256, 1000, "matplotlib", False),
+            ManifestJob("e", 4, 1000, "matplotlib", False)]
+    graph = plan_jobs(jobs)
+
+    assert [node.expr for node in graph] == ["pi", "e"]
+    assert graph[1].targets == {2: 3000, 4: 1000}
+    assert graph[0].nb_digits_10 > graph[1].nb_digits_10 > 0
+
+
+def test_is_job_done(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "out").mkdir()
+    job = ManifestJob("pi", 10, 100, "matplotlib", False)
+
+    options = get_options()
+    outputs = get_job_outputs(job, options)
+    entries = {get_job_key(job, options): {"status": "ok", "outputs": outputs}}
+    assert not is_job_done(job, options, entries)
+    for output in outputs:
+        (tmp_path / output).touch()
+    assert is_job_done(job, options, entries)
+
+    # nothing is saved, so nothing proves that the job was done
+    options = get_options(bool_save=False)
+    entries = {get_job_key(job, options): {"status": "ok", "outputs": get_job_outputs(job, options)}}
+    assert not is_job_done(job, options, entries)
@@ -0,0 +1,34 @@
+"""Tests of the packed binary format of digit sequences."""
+
+import numpy as np
+import pytest
+
+from utils.packed import (PACKED_ALIGNMENT, get_bits_per_digit, iter_packed_sequence, load_packed_sequence,
+                          read_packed_header, write_packed_sequence)
+
+
+@pytest.mark.parametrize("base", [2, 3, 10, 16, 60, 256, 1000])
+@pytest.mark.parametrize("nb_digits", [0, 1, 7, 8, 9, 1001])
+def test_round_trip(tmp_path, base, nb_digits):
+    path = str(tmp_path / "seq.digits")
+    digits = np.random.default_rng(nb_digits).integers(0, base, nb_digits)
+    # uneven chunks, not aligned on bytes
+    write_packed_sequence(path, np.array_split(digits, 3), "pi", base, nb_digits, {"start": 5, "nb_certified": 1})
+
+    header, offset = read_packed_header(path)
+    assert (header["expr"], header["base"], header["nb_digits"], header["start"], header["nb_certified"]) \
+        == ("pi", base, nb_digits, 5, 1)
+    assert offset % PACKED_ALIGNMENT == 0
+    assert (tmp_path / "seq.digits").stat().st_size - offset == -(-nb_digits * get_bits_per_digit(base) // 8)
+    np.testing.assert_array_equal(load_packed_sequence(path), digits)
+    np.testing.assert_array_equal(load_packed_sequence(path, nb_digits // 3, nb_digits // 2 + 1),
+                                  digits[(nb_digits // 3):(nb_digits // 2 + 1)])
+    chunks = list(iter_packed_sequence(path, chunk_size=100))
+    np.testing.assert_array_equal(np.concatenate(chunks) if chunks else np.empty(0), digits)
+
+
+def test_not_packed(tmp_path):
+    path = tmp_path / "seq.txt"
+    path.write_text("3.14159")
+    with pytest.raises(ValueError, match="Not a packed"):
+        read_packed_header(str(path))
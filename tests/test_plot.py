@@ -0,0 +1,64 @@
+"""Tests of the vectorized trajectory builders against a step-by-step walk."""
+
+import numpy as np
+import pytest
+
+from core.compute_digits import get_points_from_digits
+from utils.plot import LATTICE_STEPS, compute_lattice_points, compute_points, compute_steps, iter_points
+
+
+def walk(digits, base):
+    angles = np.pi/2 - 2*np.pi*np.arange(base)/base
+    xs, ys = [0.], [0.]
+    for digit in digits:
+        xs.append(xs[-1] + np.cos(angles[digit]))
+        ys.append(ys[-1] + np.sin(angles[digit]))
+
+    return (np.array(xs), np.array(ys))
+
+
+@pytest.mark.parametrize("base", [2, 3, 8, 10, 60])
+def test_compute_points(base):
+    digits = np.random.default_rng(base).integers(0, base, 1000)
+    xs, ys = compute_points(digits, *compute_steps(base))
+    expected_xs, expected_ys = walk(digits, base)
+
+    np.testing.assert_allclose(xs, expected_xs, atol=1e-9)
+    np.testing.assert_allclose(ys, expected_ys, atol=1e-9)
+
+
+def test_compute_points_out_and_dtype():
+    digits = np.array([0, 1, 2, 3, 3])
+    out = (np.empty(6, dtype=np.float32), np.empty(6, dtype=np.float32))
+    xs, ys = compute_points(digits, *compute_steps(4), out=out)
+
+    assert xs is out[0] and ys is out[1]
+    np.testing.assert_allclose(xs, [0, 0, 1, 1, 0, -1], atol=1e-6)
+    np.testing.assert_allclose(ys, [0, 1, 1, 0, 0, 0], atol=1e-6)
+
+
+@pytest.mark.parametrize("base", list(LATTICE_STEPS))
+def test_compute_lattice_points(base):
+    digits = np.random.default_rng(base).integers(0, base, 1000)
+    xs, ys = compute_lattice_points(digits, base)
+    expected_xs, expected_ys = walk(digits, base)
+
+    np.testing.assert_allclose(xs, expected_xs, atol=1e-9)
+    np.testing.assert_allclose(ys, expected_ys, atol=1e-9)
+    # opposite steps cancel exactly
+    xs, ys = compute_lattice_points(np.array([1, 5] * 1000 if base == 8 else [0, base // 2] * 1000), base)
+    assert not xs[::2].any() and not ys[::2].any()
+
+
+def test_compute_lattice_points_invalid_base():
+    with pytest.raises(ValueError, match="No exact lattice"):
+        compute_lattice_points(np.array([0, 1]), 10)
+
+
+def test_iter_points():
+    digits = np.random.default_rng(0).integers(0, 10, 1000)
+    xs, ys = get_points_from_digits(digits, 10)
+    chunks = list(iter_points(np.array_split(digits, 7), 10))
+
+    np.testing.assert_allclose(np.concatenate([chunk_xs for chunk_xs, _ in chunks]), xs, atol=1e-12)
+    np.testing.assert_allclose(np.concatenate([chunk_ys for _, chunk_ys in chunks]), ys, atol=1e-12)
@@ -0,0 +1,57 @@
+"""Tests of the reuse of the figure templates and of the compass bitmap."""
+
+import numpy as np
+
+from core.compute_digits import get_points_from_digits
+from utils.pyramid import build_pyramid
+from visu.plot_sequence import MAX_EXACT_POINTS, get_figure_template, plot_sequence
+from visu.raster import render_compass
+
+
+def get_points(nb_digits, base, seed=0, nb_directions=None):
+    digits = np.random.default_rng(seed).integers(0, nb_directions or base, nb_digits)
+    return get_points_from_digits(digits, base)
+
+
+def test_template_is_shared_per_base():
+    assert get_figure_template(10) is get_figure_template(10)
+    assert get_figure_template(10) is not get_figure_template(12)
+    assert get_figure_template(10) is not get_figure_template(10, "lower left")
+    assert render_compass(10, 64) is render_compass(10, 64)
+    assert render_compass(10, 64).shape == (64, 64, 4)
+
+
+def test_template_data_is_swapped(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    template = get_figure_template(7, "upper right")
+    nb_artists = (len(template.ax.collections), len(template.ax.lines), len(template.fig.axes))
+    for nb_digits, seed in ((500, 1), (200, 2)):
+        xs, ys = get_points(nb_digits, 7, seed)
+        plot_sequence((xs, ys), ("test", 7, nb_digits), bool_save=False)
+
+    # the second plot replaces the first one, without adding artists
+    assert (len(template.ax.collections), len(template.ax.lines), len(template.fig.axes)) == nb_artists
+    np.testing.assert_array_equal(template.path.get_offsets(), np.column_stack((xs, ys)))
+    assert template.ax.get_title().startswith("200 digits")
+    x_min, x_max = template.ax.get_xlim()
+    y_min, y_max = template.ax.get_ylim()
+    assert x_min <= min(xs.min(), 0.) and x_max >= max(xs.max(), 0.)
+    assert y_min <= min(ys.min(), 0.) and y_max >= max(ys.max(), 0.)
+    assert not list(tmp_path.iterdir())
+
+
+def test_plot_from_pyramid(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "out").mkdir()
+    nb_digits = 4 * MAX_EXACT_POINTS
+    # a walk drifting up and right, much longer than the figure is wide
+    xs, ys = get_points(nb_digits, 4, nb_directions=2)
+    plot_sequence((xs, ys), ("test", 4, nb_digits), pyramid=build_pyramid([(xs, ys)]))
+
+    # about one point per pixel is drawn, and the gray line joins the endpoints
+    template = get_figure_template(4, "upper right")
+    assert len(template.path.get_offsets()) < len(xs)
+    line_xs, line_ys = template.line.get_data()
+    assert (line_xs[0], line_ys[0]) == (xs[0], ys[0])
+    assert (line_xs[-1], line_ys[-1]) == (xs[-1], ys[-1])
+    assert [path.name for path in (tmp_path / "out").iterdir()] == [f"test_004_{nb_digits:06d}.png"]
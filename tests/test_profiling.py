@@ -0,0 +1,58 @@
+"""Tests of the per-stage profiling records."""
+
+import tracemalloc
+
+import pytest
+
+from utils import profiling
+from utils.profiling import enable_profiling, merge_records, pop_records, profile_job, profile_stage
+
+
+@pytest.fixture
+def enabled():
+    bool_tracing = tracemalloc.is_tracing()
+    enable_profiling()
+    pop_records()
+    yield
+    pop_records()
+    profiling._STATE["enabled"] = False  # pylint: disable=protected-access
+    if not bool_tracing:
+        tracemalloc.stop()
+
+
+def test_disabled_is_free():
+    assert profile_stage("convert", 10) is profile_stage("format")
+    with profile_job("pi"), profile_stage("convert", 10):
+        pass
+    assert not pop_records()
+
+
+@pytest.mark.usefixtures("enabled")
+def test_records():
+    with profile_job("pi, base 10"):
+        with profile_stage("convert", 100):
+            with profile_stage("points", 10):
+                data = bytearray(1 << 20)
+            del data
+        with profile_stage("convert", 50):
+            pass
+    with profile_stage("render"):
+        pass
+
+    records = {(record["job"], record["stage"]): record for record in pop_records()}
+    assert list(records) == [("pi, base 10", "points"), ("pi, base 10", "convert"), ("", "render")]
+    convert = records[("pi, base 10", "convert")]
+    assert (convert["nb_items"], convert["nb_calls"]) == (150, 2)
+    # the allocation peak of a stage includes those of its inner stages
+    assert convert["peak_bytes"] >= 1 << 20
+    assert records[("pi, base 10", "points")]["peak_bytes"] >= 1 << 20
+    assert not pop_records()
+
+
+@pytest.mark.usefixtures("enabled")
+def test_merge_records():
+    record = {"job": "e", "stage": "convert", "duration_s": 1., "peak_bytes": 10, "nb_items": 5, "nb_calls": 1}
+    merge_records([record])
+    merge_records([{**record, "peak_bytes": 20}])
+
+    assert pop_records() == [{**record, "duration_s": 2., "peak_bytes": 20, "nb_items": 10, "nb_calls": 2}]
@@ -0,0 +1,77 @@
+"""Tests of the level-of-detail pyramid of trajectories."""
+
+import numpy as np
+import pytest
+
+from core.compute_digits import get_points_from_digits
+from utils.pyramid import (LOD_BLOCK_SIZE, LOD_FACTOR, build_pyramid, get_pyramid_bounds, load_pyramid, save_pyramid,
+                           select_blocks)
+
+
+def get_points(nb_digits, base=10):
+    digits = np.random.default_rng(nb_digits).integers(0, base, nb_digits)
+    return get_points_from_digits(digits, base)
+
+
+def split_points(xs, ys, nb_chunks):
+    return list(zip(np.array_split(xs, nb_chunks), np.array_split(ys, nb_chunks)))
+
+
+@pytest.mark.parametrize("nb_digits", [0, 31, 32, 1000, 10_000])
+def test_build_pyramid(nb_digits):
+    xs, ys = get_points(nb_digits)
+    pyramid = build_pyramid([(xs, ys)])
+
+    assert pyramid.nb_points == nb_digits + 1
+    assert len(pyramid.levels[-1]) == 1
+    assert get_pyramid_bounds(pyramid) == pytest.approx((xs.min(), xs.max(), ys.min(), ys.max()), abs=1e-5)
+    np.testing.assert_array_equal(pyramid.anchors, np.stack((xs, ys), axis=1)[::LOD_BLOCK_SIZE])
+    for level, stats in enumerate(pyramid.levels):
+        block_size = LOD_BLOCK_SIZE * LOD_FACTOR**level
+        assert len(stats) == -(-len(xs) // block_size)
+        np.testing.assert_allclose(stats[:, 4], [xs[i:(i+block_size)].mean() for i in range(0, len(xs), block_size)],
+                                   rtol=1e-5, atol=1e-4)
+
+    # the same pyramid whatever the chunks of points
+    chunked_pyramid = build_pyramid(split_points(xs, ys, 7))
+    for stats, chunked_stats in zip(pyramid.levels, chunked_pyramid.levels):
+        np.testing.assert_allclose(stats, chunked_stats, rtol=1e-6, atol=1e-5)
+
+
+def test_empty_pyramid():
+    with pytest.raises(ValueError, match="empty"):
+        build_pyramid([(np.empty(0), np.empty(0))])
+
+
+def test_select_blocks():
+    xs, ys = get_points(100_000)
+    pyramid = build_pyramid([(xs, ys)])
+
+    # a block of the whole path fits in a pixel
+    selected_xs, _, indices = select_blocks(pyramid, scale=1e-6)
+    assert len(selected_xs) == 1 and indices.tolist() == [len(xs) - 1]
+
+    # no block fits: all the points are drawn (the last block, of a single point, being stored in float32)
+    selected_xs, selected_ys, indices = select_blocks(pyramid, scale=1e6, point_chunks=split_points(xs, ys, 3))
+    np.testing.assert_array_equal(indices, np.arange(len(xs)))
+    np.testing.assert_allclose(selected_xs, xs, rtol=1e-6)
+    np.testing.assert_allclose(selected_ys, ys, rtol=1e-6)
+
+    # in between, much fewer points along the path
+    selected_xs, _, indices = select_blocks(pyramid, scale=1.)
+    assert len(selected_xs) < len(xs) // 10
+    assert (np.diff(indices) > 0).all()
+
+
+def test_save_and_load(tmp_path):
+    pyramid = build_pyramid([get_points(5000)])
+    path = str(tmp_path / "seq.lod.npz")
+    save_pyramid(path, pyramid)
+    loaded_pyramid = load_pyramid(path)
+
+    assert loaded_pyramid.nb_points == pyramid.nb_points
+    np.testing.assert_array_equal(loaded_pyramid.endpoints, pyramid.endpoints)
+    np.testing.assert_array_equal(loaded_pyramid.anchors, pyramid.anchors)
+    assert len(loaded_pyramid.levels) == len(pyramid.levels)
+    for stats, loaded_stats in zip(pyramid.levels, loaded_pyramid.levels):
+        np.testing.assert_array_equal(stats, loaded_stats)
@@ -0,0 +1,72 @@
+"""Tests of the direct NumPy rasterizer."""
+
+from functools import partial
+
+import numpy as np
+import pytest
+
+from core.compute_digits import get_points_from_digits
+from utils.pyramid import build_pyramid
+from visu.raster import (RASTER_MARGIN, compute_bounds, get_raster_transform, plot_sequence_raster,
+                         rasterize_points, rasterize_sequence, to_pixels)
+
+
+def get_point_chunks(nb_digits, nb_chunks, base=10):
+    digits = np.random.default_rng(0).integers(0, base, nb_digits)
+    xs, ys = get_points_from_digits(digits, base)
+    return list(zip(np.array_split(xs, nb_chunks), np.array_split(ys, nb_chunks)))
+
+
+def test_transform():
+    bounds = (-10., 30., 0., 20.)
+    size = 200
+    rows, cols = to_pixels(np.array([-10., 30., 10.]), np.array([0., 20., 10.]), get_raster_transform(bounds, size),
+                           size)
+
+    # the widest axis spans the image within the margins, the other one is centered
+    assert cols[:2].tolist() == [RASTER_MARGIN, size - 1 - RASTER_MARGIN]
+    assert abs(cols[2] - (size - 1)/2) <= .5 and abs(rows[2] - (size - 1)/2) <= .5
+    assert rows[0] > rows[2] > rows[1]
+    assert compute_bounds([(np.array([1., -2.]), np.array([0., 5.])), (np.array([]), np.array([]))]) \
+        == (-2., 1., 0., 5.)
+
+
+def test_rasterize_points():
+    index_grid = np.full((50, 50), -1, dtype=np.int64)
+    transform = get_raster_transform((0., 10., 0., 10.), 50, margin=0)
+    # the same point twice: the last index is kept
+    rasterize_points(index_grid, np.array([0., 5., 0.]), np.array([0., 5., 0.]), 10, transform, point_size=1)
+
+    assert sorted(index_grid[index_grid >= 0].tolist()) == [11, 12]
+    assert index_grid[49, 0] == 12
+
+
+@pytest.mark.parametrize("bool_lines", [False, True])
+def test_chunks_give_the_same_image(bool_lines):
+    number_params = ("test", 10, 10_000)
+    rgba = rasterize_sequence(partial(get_point_chunks, 10_000, 1), number_params, size=256, bool_lines=bool_lines)
+    chunked_rgba = rasterize_sequence(partial(get_point_chunks, 10_000, 9), number_params, size=256,
+                                      bool_lines=bool_lines)
+
+    assert rgba.shape == (256, 256, 4) and rgba.dtype == np.uint8
+    np.testing.assert_array_equal(rgba, chunked_rgba)
+
+
+def test_pyramid_image():
+    number_params = ("test", 10, 100_000)
+    point_chunks_factory = partial(get_point_chunks, 100_000, 4)
+    rgba = rasterize_sequence(point_chunks_factory, number_params, size=256, bool_lines=False, legend_position=None)
+    pyramid_rgba = rasterize_sequence(point_chunks_factory, number_params, size=256, bool_lines=False,
+                                      legend_position=None, pyramid=build_pyramid(point_chunks_factory()))
+
+    # the blocks of about a pixel cover nearly the same pixels as the points
+    is_drawn, is_pyramid_drawn = rgba[..., :3].any(axis=-1), pyramid_rgba[..., :3].any(axis=-1)
+    assert (is_drawn != is_pyramid_drawn).mean() < 0.02
+
+
+def test_plot_without_saving(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    rgba = plot_sequence_raster(partial(get_point_chunks, 1000, 2), ("test", 10, 1000), size=128, bool_save=False)
+
+    assert rgba.shape == (128, 128, 4)
+    assert not list(tmp_path.iterdir())
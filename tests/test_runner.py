@@ -0,0 +1,68 @@
+"""Tests of the planning and execution of the expression × base × digits job grid."""
+
+from argparse import Namespace
+
+import pytest
+from mpmath import mp
+
+from core import planner
+from core.analytics import compute_trajectory_stats
+from core.compute_digits import evaluate_certified
+from core.runner import run_grid
+from utils.digits import get_digits_in_base, get_nb_digits_base_10
+
+
+@pytest.fixture(autouse=True)
+def restore_precision():
+    with mp.workprec(mp.prec):
+        yield
+
+
+def get_options(cache_dir=None):
+    return Namespace(method="fast", offset=0, cache_dir=cache_dir, cache_size=1 << 30, extend=False, stats="stats.csv",
+                     show=False, save=False, stream=False, text=False, renderer="matplotlib", profile=False)
+
+
+def get_reference_stats(expr, base, digits):
+    with mp.workdps(get_nb_digits_base_10(base, max(digits)) + 20):
+        number = evaluate_certified(expr, [base], max(digits))[0]
+        digit_sequence = get_digits_in_base(number, base, max(digits))
+    return compute_trajectory_stats([digit_sequence], expr, base, digits)
+
+
+def test_evaluate_once(monkeypatch):
+    calls = []
+
+    def count_evaluations(expr, bases, nb_digits, *args, **kwargs):
+        calls.append((expr, sorted(bases)))
+        return evaluate_certified(expr, bases, nb_digits, *args, **kwargs)
+
+    monkeypatch.setattr(planner, "evaluate_certified", count_evaluations)
+    results = run_grid(["pi", "sqrt(2)"], [2, 10, 16], [100, 1000], get_options())
+
+    assert calls == [("pi", [2, 10, 16]), ("sqrt(2)", [2, 10, 16])]
+    assert [(result.expr, result.base, result.nb_digits) for result in results] == [
+        (expr, base, nb_digits) for expr in ["pi", "sqrt(2)"] for base in [2, 16, 10] for nb_digits in [100, 1000]]
+    assert all(result.error is None for result in results)
+    assert [result.stats for result in results] == [row for expr in ["pi", "sqrt(2)"] for base in [2, 16, 10]
+                                                    for row in get_reference_stats(expr, base, [100, 1000])]
+
+
+def test_cached_sequences_skip_evaluation(monkeypatch, tmp_path):
+    run_grid(["e"], [3, 10], [500], get_options(str(tmp_path)))
+    monkeypatch.setattr(planner, "evaluate_certified", None)
+    results = run_grid(["e"], [3, 10], [200, 500], get_options(str(tmp_path)))
+
+    assert all(result.error is None for result in results)
+    assert [result.stats for result in results] == [*get_reference_stats("e", 3, [200, 500]),
+                                                    *get_reference_stats("e", 10, [200, 500])]
+
+
+def test_process_pool():
+    options = get_options()
+    results = run_grid(["pi", "e", "1/0"], [4, 10], [300], options, nb_jobs=2)
+
+    assert [result.stats for result in results[:4]] == [result.stats for result in
+                                                        run_grid(["pi", "e"], [4, 10], [300], options)]
+    assert [(result.expr, result.error is not None) for result in results[4:]] == [("1/0", True)] * 2
+
@@ -0,0 +1,99 @@
+"""Tests of the local render server, on an ephemeral port of localhost."""
+
+from typing import Any, Dict, Tuple
+import asyncio
+import json
+
+import pytest
+from mpmath import mp, nstr, pi
+
+from core.server import build_memory_cache, cache_get, cache_put, serve
+
+
+async def fetch(host: str, port: int, target: str) -> Tuple[int, bytes]:
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(f"GET {target} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode("latin-1"))
+    await writer.drain()
+    head = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1").split("\r\n")
+    headers = dict(line.split(": ", 1) for line in head[1:] if line)
+    body = await reader.readexactly(int(headers["Content-Length"]))
+    writer.close()
+
+    return (int(head[0].split()[1]), body)
+
+
+async def run_requests(targets_batches: Any) -> Tuple[list, Dict[str, Any]]:
+    """Start a server, send each batch of targets concurrently, then return the responses and the status."""
+    address: asyncio.Future = asyncio.get_running_loop().create_future()
+    server = asyncio.ensure_future(serve("127.0.0.1", 0, nb_jobs=1, memory_size=1 << 20,
+                                         on_ready=lambda host, port: address.set_result((host, port))))
+    host, port = await asyncio.wait_for(address, timeout=60)
+    try:
+        responses = []
+        for targets in targets_batches:
+            responses.append(await asyncio.gather(*(fetch(host, port, target) for target in targets)))
+        _, status = await fetch(host, port, "/status")
+    finally:
+        server.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await server
+
+    return (responses, json.loads(status))
+
+
+def get_pi_digits(nb_digits: int) -> str:
+    with mp.workdps(nb_digits + 20):
+        return nstr(pi, nb_digits + 10, strip_zeros=False)[2:(2 + nb_digits)]
+
+
+def test_concurrent_requests_are_coalesced():
+    targets = ["/digits?expr=pi&base=10&digits=2000"] * 4 + ["/digits?expr=pi&base=10&digits=1000"]
+    (responses,), status = asyncio.run(run_requests([targets]))
+
+    assert [code for code, _ in responses] == [200] * 5
+    assert responses[0][1].split() == responses[3][1].split()
+    assert "".join(responses[0][1].decode().split()) == get_pi_digits(2000)
+    assert "".join(responses[4][1].decode().split()) == get_pi_digits(1000)
+    # the identical requests share a task, the shorter one waits for the longer computation
+    assert status["misses"] == 1
+    assert status["coalesced"] == 4
+
+
+def test_cached_digits_are_reused():
+    batches = [["/digits?expr=pi&base=16&digits=3000"], ["/digits?expr=pi&base=16&digits=500"],
+               ["/digits?expr=pi&base=8&digits=100"]]
+    responses, status = asyncio.run(run_requests(batches))
+
+    assert all(code == 200 for batch in responses for code, _ in batch)
+    assert responses[1][0][1].split() == responses[0][0][1].decode()[:len(responses[1][0][1])].encode().split()
+    # the prefix is cut from the cached sequence, the new base reuses the cached number
+    assert status["hits"] == 1
+    assert status["misses"] == 2
+    assert status["number_hits"] == 1
+    assert ["digits", "pi", 16, 3000] in status["entries"]
+
+
+def test_plain_python_results_are_served():
+    (responses,), _ = asyncio.run(run_requests([["/digits?expr=1/4&base=10&digits=5"]]))
+
+    assert responses == [(200, b"25000")]
+
+
+def test_invalid_requests_are_rejected():
+    batches = [["/digits?expr=pi&base=1&digits=10", "/digits?expr=pi&base=10", "/unknown"]]
+    (responses,), _ = asyncio.run(run_requests(batches))
+
+    assert [code for code, _ in responses] == [400, 400, 404]
+
+
+def test_memory_cache_evicts_least_recently_used():
+    cache = build_memory_cache(100)
+    cache_put(cache, "a", 1, 40)
+    cache_put(cache, "b", 2, 40)
+    assert cache_get(cache, "a") == 1
+    cache_put(cache, "c", 3, 40)
+
+    assert cache_get(cache, "b") is None
+    assert (cache_get(cache, "a"), cache_get(cache, "c")) == (1, 3)
+    assert cache.counters["size"] == 80
+    assert cache.counters["evictions"] == 1
@@ -0,0 +1,61 @@
+"""Tests of the BBP digit extraction of pi against mpmath."""
+
+from fractions import Fraction
+
+import numpy as np
+import pytest
+from mpmath import mp
+
+from utils.digits import get_digits_in_base, get_nb_digits_base_10
+from utils.spigot import (BBP_BASES, get_pi_digits_bbp, has_spigot, iter_spigot_digits, mulmod,
+                          powmod_16, sum_fractions)
+
+
+def get_reference_digits(base, nb_digits):
+    with mp.workdps(get_nb_digits_base_10(base, nb_digits) + 20):
+        return get_digits_in_base(+mp.pi, base, nb_digits)
+
+
+@pytest.mark.parametrize("base", BBP_BASES)
+@pytest.mark.parametrize("start, stop", [(0, 1), (0, 100), (1, 2), (777, 2000), (3001, 3003)])
+def test_get_pi_digits_bbp(base, start, stop):
+    np.testing.assert_array_equal(get_pi_digits_bbp(base, start, stop), get_reference_digits(base, stop)[start:])
+
+
+@pytest.mark.parametrize("chunk_size", [7, 1000])
+def test_iter_spigot_digits(chunk_size):
+    chunks = list(iter_spigot_digits("pi", 16, 100, 2100, chunk_size=chunk_size, dtype=np.uint8))
+
+    assert all(chunk.dtype == np.uint8 for chunk in chunks)
+    assert all(len(chunk) <= chunk_size for chunk in chunks)
+    np.testing.assert_array_equal(np.concatenate(chunks), get_reference_digits(16, 2100)[100:])
+
+
+def test_no_spigot():
+    assert has_spigot(" pi", 8) and not has_spigot("pi", 10) and not has_spigot("e", 16)
+    with pytest.raises(ValueError):
+        next(iter_spigot_digits("e", 16, 0, 10))
+
+
+def test_modular_arithmetic():
+    rng = np.random.default_rng(0)
+    moduli = rng.integers(2**40, 2**47, 1000, dtype=np.uint64)
+    a, b = rng.integers(0, 2**40, (2, 1000), dtype=np.uint64)
+    exponents = rng.integers(0, 10**9, 1000, dtype=np.uint64)
+
+    assert mulmod(a, b, moduli).tolist() == [x*y % m for x, y, m in zip(a.tolist(), b.tolist(), moduli.tolist())]
+    assert powmod_16(exponents, moduli).tolist() == [pow(16, e, m) for e, m in zip(exponents.tolist(),
+                                                                                   moduli.tolist())]
+    with pytest.raises(ValueError):
+        mulmod(a, b, moduli << np.uint64(4))
+
+
+def test_sum_fractions():
+    numerators, denominators = np.array([1, 2, 3], dtype=np.uint64), np.array([3, 5, 7], dtype=np.uint64)
+    N, D = sum_fractions(numerators, denominators)
+
+    assert (N, D) == (1*5*7 + 2*3*7 + 3*3*5, 3*5*7)
+    # denominators too large for the first level with NumPy
+    denominators = np.array([2**40 + 1, 2**41 + 3, 2**39 + 5], dtype=np.uint64)
+    N, D = sum_fractions(numerators, denominators)
+    assert Fraction(int(N), int(D)) == sum(Fraction(n, d) for n, d in zip(numerators.tolist(), denominators.tolist()))
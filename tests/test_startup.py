@@ -0,0 +1,29 @@
+"""Tests that the quick commands do not load the plotting stack."""
+
+import os
+
+import pytest
+
+from bench.startup import SCENARIOS, get_imported_modules, run_scenario
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.mark.parametrize("name", list(SCENARIOS))
+def test_no_forbidden_imports(monkeypatch, tmp_path, name):
+    monkeypatch.chdir(REPO_DIR)
+    (tmp_path / "out").mkdir()
+    result = run_scenario(name, str(tmp_path), nb_repeats=1, max_time=60.)
+
+    assert "error" not in result
+    assert result["unexpected"] == []
+    assert "matplotlib" not in result["modules"]
+
+
+def test_get_imported_modules():
+    log = ("import time: self [us] | cumulative | imported package\n"
+           "import time:       120 |        120 |   numpy._core\n"
+           "import time:        80 |        900 | numpy\n"
+           "import time:        10 |         10 |     matplotlib_inline\n")
+
+    assert get_imported_modules(log) == {"numpy"}
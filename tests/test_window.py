@@ -0,0 +1,65 @@
+"""Tests of the regions of interest rendered from a saved trajectory and its pyramid."""
+
+import numpy as np
+import pytest
+
+from core.compute_digits import get_points_from_digits
+from core.window import get_block_loader, get_point, get_window_suffix
+from utils.packed import write_packed_sequence
+from utils.pyramid import build_pyramid, get_block_point_indices, get_window_bounds, select_window
+
+
+@pytest.fixture(name="trajectory")
+def fixture_trajectory(tmp_path):
+    base, nb_digits = 10, 20_000
+    digits = np.random.default_rng(0).integers(0, base, nb_digits)
+    xs, ys = get_points_from_digits(digits, base)
+    path = str(tmp_path / "seq.digits")
+    write_packed_sequence(path, [digits], "test", base, nb_digits)
+    pyramid = build_pyramid([(xs, ys)])
+
+    return (xs, ys, pyramid, get_block_loader(path, pyramid, base))
+
+
+def test_block_loader(trajectory):
+    xs, ys, pyramid, load_points = trajectory
+    blocks = np.array([0, 1, 5, 100, len(pyramid.levels[0]) - 1])
+    point_indices = get_block_point_indices(pyramid, blocks)
+    loaded_xs, loaded_ys = load_points(blocks)
+
+    np.testing.assert_allclose(loaded_xs, xs[point_indices], atol=1e-9)
+    np.testing.assert_allclose(loaded_ys, ys[point_indices], atol=1e-9)
+    assert get_point(load_points, 12_345) == pytest.approx((xs[12_345], ys[12_345]))
+
+
+def test_index_range(trajectory):
+    xs, ys, pyramid, load_points = trajectory
+    index_range = (5_000, 5_101)
+
+    # no block fits: the points of the range exactly, all joined
+    window_xs, window_ys, indices, is_joined = select_window(pyramid, 1e6, load_points, index_range=index_range)
+    np.testing.assert_array_equal(indices, np.arange(*index_range))
+    np.testing.assert_allclose(window_xs, xs[slice(*index_range)], atol=1e-9)
+    np.testing.assert_allclose(window_ys, ys[slice(*index_range)], atol=1e-9)
+    assert is_joined.all()
+
+    bounds = get_window_bounds(pyramid, load_points, index_range)
+    assert bounds == pytest.approx((xs[slice(*index_range)].min(), xs[slice(*index_range)].max(),
+                                    ys[slice(*index_range)].min(), ys[slice(*index_range)].max()))
+
+
+def test_box(trajectory):
+    xs, ys, pyramid, load_points = trajectory
+    box = (float(np.median(xs)), float(xs.max()), float(np.median(ys)), float(ys.max()))
+    window_xs, window_ys, indices, is_joined = select_window(pyramid, 1e6, load_points, box=box)
+
+    # every point of the box is drawn, and a few of the blocks crossing its border
+    is_in_box = (xs >= box[0]) & (xs <= box[1]) & (ys >= box[2]) & (ys <= box[3])
+    assert set(np.flatnonzero(is_in_box)) <= set(indices.tolist())
+    assert len(indices) < len(xs)
+    assert not is_joined.all()
+
+
+def test_get_window_suffix():
+    assert get_window_suffix(None, (40_000, 60_000)) == "digits_40000_60000"
+    assert get_window_suffix((-10., 10., 0., 20.5), None) == "box__mn_10_10_0_20.5"
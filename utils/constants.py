@@ -0,0 +1,124 @@
+"""
+Dedicated fixed-point generators for the most common constants.
+
+Each generator returns the big integer ``floor(x * 2**prec)``, computed with a binary-splitting
+series or an integer square root, without going through the generic evaluation of ``mpmath``.
+The result is wrapped as an exact ``mpf`` (no rounding at ``mp.dps``), so that its mantissa is
+directly scaled for base conversion.
+
+Constants
+---------
+GUARD_BITS : int
+    Number of extra bits computed, to absorb the truncation errors of the generators.
+FAST_CONSTANTS : dict
+    Names of the constants (as in ``utils.expression.STANDARD_CSTS``) mapped to their generator.
+"""
+
+from typing import Callable, Dict, Tuple
+import math
+
+from mpmath import mp
+from mpmath.libmp import MPZ, isqrt, from_man_exp
+
+GUARD_BITS = 32
+
+
+def bsplit(p: Callable[[int], int], q: Callable[[int], int], a: Callable[[int], int],
+           start: int, stop: int) -> Tuple[int, int, int]:
+    """
+    Sum the terms ``start`` to ``stop - 1`` of a hypergeometric series by binary splitting.
+
+    The series is ``sum_k a(k) * prod_{j=1..k} p(j) / q(j)``.
+
+    Parameters
+    ----------
+    p, q : callable
+        Numerator and denominator of the ratio between consecutive terms.
+    a : callable
+        Polynomial factor of each term.
+    start : int
+        First term.
+    stop : int
+        Last term (excluded).
+
+    Returns
+    -------
+    P, Q, T : int
+        Products of ``p`` and ``q`` over the range, and numerator of the partial sum,
+        such that the partial sum of the terms ``0`` to ``stop - 1`` is ``T / Q`` when ``start`` is 0.
+    """
+    if stop - start == 1:
+        P = MPZ(p(start)) if start else MPZ(1)
+        Q = MPZ(q(start)) if start else MPZ(1)
+        return (P, Q, a(start) * P)
+
+    middle = (start + stop) // 2
+    P_left, Q_left, T_left = bsplit(p, q, a, start, middle)
+    P_right, Q_right, T_right = bsplit(p, q, a, middle, stop)
+
+    return (P_left * P_right, Q_left * Q_right, T_left * Q_right + P_left * T_right)
+
+
+def pi_fixed(prec: int) -> int:
+    """Compute ``floor(pi * 2**prec)`` with the Chudnovsky series (about 47 bits per term)."""
+    nb_terms = prec // 47 + 2
+    c3_24 = MPZ(640320)**3 // 24
+    _, Q, T = bsplit(lambda k: -(6*k - 5) * (2*k - 1) * (6*k - 1), lambda k: k**3 * c3_24,
+                     lambda k: 13591409 + 545140134*k, 0, nb_terms)
+    sqrt_10005 = isqrt(MPZ(10005) << (2*prec))
+
+    return (426880 * sqrt_10005 * Q) // T
+
+
+def e_fixed(prec: int) -> int:
+    """Compute ``floor(e * 2**prec)`` with the series of ``1/k!``."""
+    nb_terms = 2
+    while math.lgamma(nb_terms + 1) / math.log(2) < prec + 2:
+        nb_terms *= 2
+    _, Q, T = bsplit(lambda k: 1, lambda k: k, lambda k: 1, 0, nb_terms)
+
+    return (T << prec) // Q
+
+
+def phi_fixed(prec: int) -> int:
+    """Compute ``floor(phi * 2**prec)`` as ``(1 + sqrt(5)) / 2``, with an integer square root."""
+    return ((MPZ(1) << prec) + isqrt(MPZ(5) << (2*prec))) >> 1
+
+
+def apery_fixed(prec: int) -> int:
+    """Compute ``floor(zeta(3) * 2**prec)`` with the Amdeberhan-Zeilberger series (10 bits per term)."""
+    nb_terms = prec // 10 + 2
+    _, Q, T = bsplit(lambda k: -k**5, lambda k: 32 * (2*k + 1)**5,
+                     lambda k: 205*k*k + 250*k + 77, 0, nb_terms)
+
+    return (T << prec) // (64 * Q)
+
+
+FAST_CONSTANTS: Dict[str, Callable[[int], int]] = {
+    "pi":    pi_fixed,
+    "e":     e_fixed,
+    "phi":   phi_fixed,
+    "apery": apery_fixed,
+}
+
+
+def get_fast_constant(name: str, nb_digits_10: int) -> mp.mpf:
+    """
+    Compute a constant of ``FAST_CONSTANTS`` with enough precision to get ``nb_digits_10`` decimal places.
+
+    Parameters
+    ----------
+    name : str
+        Name of the constant, e.g. ``"pi"``.
+    nb_digits_10 : int
+        Number of base-10 decimal places needed.
+
+    Returns
+    -------
+    number : mpmath.mpf
+        Value of the constant, exact wrap of the fixed-point integer (not rounded to ``mp.dps``).
+    """
+    prec = math.ceil(nb_digits_10 * math.log2(10)) + GUARD_BITS
+    man = FAST_CONSTANTS[name](prec)
+
+    return mp.make_mpf(from_man_exp(man, -prec))
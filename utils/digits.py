@@ -1,9 +1,23 @@
-# pylint: disable=unnecessary-lambda-assignment
-
 """Utility functions for extracting and converting digit sequences between bases."""
 
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
 import numpy as np
 from mpmath import mpf
+from mpmath.libmp import MPZ
+
+from utils.profiling import profile_stage
+
+# largest power of 2 that a leaf of the divide-and-conquer conversion may reach,
+# so that leaves fit in a NumPy uint64 array
+LEAF_BITS = 63
+
+# number of digits converted at once when digits are produced chunk by chunk
+DIGIT_CHUNK_SIZE = 1 << 20
+
+# maximal number of rows formatted at once when a digit sequence is written as text
+TEXT_CHUNK_ROWS = 1 << 13
 
 def get_nb_digits_base_10(base: int, nb_digits: int) -> int:
     """
@@ -24,9 +38,493 @@ def get_nb_digits_base_10(base: int, nb_digits: int) -> int:
     return int(np.ceil(nb_digits * np.log10(base)))
 
 
-def get_digits_in_base(x: mpf, base: int, nb_digits: int) -> np.ndarray:  # type: ignore
+def get_digit_dtype(base: int) -> np.dtype:
     """
-    Extract the first ``nb_digits`` digits of ``x`` in base ``base``, after conversion if needed.
+    Get the smallest unsigned integer type able to hold the digits of a given base.
+
+    Parameters
+    ----------
+    base : int
+        Radix base of the digits.
+
+    Returns
+    -------
+    dtype : numpy.dtype
+        ``uint8``, ``uint16``, ``uint32`` or ``uint64``.
+    """
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if base - 1 <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+
+    return np.dtype(np.uint64)
+
+
+def get_scaled_fraction(x: mpf, base: int, nb_digits: int) -> int:
+    """
+    Scale the fractional part of ``x`` to the big integer ``floor(frac(|x|) * base**nb_digits)``.
+
+    The scaling is exact: it works on the binary mantissa and exponent of ``x``,
+    without any intermediate rounding at the current ``mp.dps``.
+
+    Parameters
+    ----------
+    x : mpmath.mpf
+        Number to scale.
+    base : int
+        Radix base to convert to.
+    nb_digits : int
+        Number of base-``base`` digits to keep.
+
+    Returns
+    -------
+    scaled : int
+        Integer whose ``nb_digits`` base-``base`` digits are the first digits of ``x``.
+    """
+    # mpf(x) would round x to the current precision, so an mpf is used as is
+    _, man, exp, _ = (x if isinstance(x, mpf) else mpf(x))._mpf_
+    base_power = MPZ(base)**nb_digits
+    scaled = MPZ(man) * base_power
+    scaled = (scaled << exp) if exp >= 0 else (scaled >> -exp)
+
+    return scaled % base_power
+
+
+def get_nb_certified_digits(x: mpf, error: mpf, base: int, nb_digits: int) -> int:
+    """
+    Count the first base-``base`` digits of ``x`` that are the same for any value within ``error`` of it.
+
+    Both bounds of the interval are scaled beyond ``nb_digits`` digits, down to the magnitude of
+    the error, so that only a carry reaching the ``nb_digits`` first digits makes them ambiguous.
+
+    Parameters
+    ----------
+    x : mpmath.mpf
+        Approximate value.
+    error : mpmath.mpf
+        Bound of the absolute error of ``x``. If 0, ``x`` is taken as exact.
+    base : int
+        Radix base.
+    nb_digits : int
+        Number of digits to check.
+
+    Returns
+    -------
+    nb_certified : int
+        Number of certified digits, between 0 and ``nb_digits``.
+    """
+    _, err_man, err_exp, err_bc = (error if isinstance(error, mpf) else mpf(error))._mpf_
+    if not err_man:
+        return nb_digits
+
+    # error < 2**(err_exp + err_bc): scale down to that magnitude
+    nb_scaled_digits = max(nb_digits, int(-(err_exp + err_bc) / np.log2(base)))
+    base_power = MPZ(base)**nb_scaled_digits
+    _, man, exp, _ = (x if isinstance(x, mpf) else mpf(x))._mpf_
+    scaled = MPZ(man) * base_power
+    scaled = (scaled << exp) if exp >= 0 else (scaled >> -exp)
+    scaled_error = MPZ(err_man) * base_power
+    scaled_error = (scaled_error << err_exp) if err_exp >= 0 else (scaled_error >> -err_exp)
+    # both scaled values are truncated
+    low, high = scaled - scaled_error - 1, scaled + scaled_error + 1
+
+    # smallest number of trailing digits to drop so that both bounds agree (binary search)
+    lo_drop, hi_drop = 0, nb_scaled_digits + 1
+    while lo_drop < hi_drop:
+        mid_drop = (lo_drop + hi_drop) // 2
+        power = MPZ(base)**mid_drop
+        if low // power == high // power:
+            hi_drop = mid_drop
+        else:
+            lo_drop = mid_drop + 1
+
+    return max(0, min(nb_digits, nb_scaled_digits - lo_drop))
+
+
+def get_leaf_size(base: int) -> int:
+    """
+    Compute the number of base-``base`` digits that fit in one uint64 leaf.
+
+    Parameters
+    ----------
+    base : int
+        Radix base.
+
+    Returns
+    -------
+    leaf_size : int
+        Largest ``k`` such that ``base**k < 2**LEAF_BITS`` (at least 1).
+    """
+    leaf_size = 1
+    while base**(leaf_size+1) < 2**LEAF_BITS:
+        leaf_size += 1
+
+    return leaf_size
+
+
+def split_int(n: int, big_base: int, nb_blocks: int, out: np.ndarray,
+              powers: Optional[Dict[int, int]] = None, start: int = 0) -> None:
+    """
+    Split ``n`` into ``nb_blocks`` base-``big_base`` blocks, most significant first.
+
+    The integer is recursively cut in two halves with a single ``divmod`` by
+    ``big_base**half``; these powers are computed once and cached in ``powers``.
+
+    Parameters
+    ----------
+    n : int
+        Integer to split, must be lower than ``big_base**nb_blocks``.
+    big_base : int
+        Base of the blocks (typically ``base**leaf_size``).
+    nb_blocks : int
+        Number of blocks to write.
+    out : ndarray of uint64
+        Preallocated array where the blocks are written.
+    powers : dict, optional
+        Cache of the powers of ``big_base``, keyed by exponent.
+    start : int, optional
+        Index in ``out`` of the most significant block (default is 0).
+    """
+    if powers is None:
+        powers = {}
+    if nb_blocks == 1:
+        out[start] = n
+        return
+    nb_low = nb_blocks // 2
+    if nb_low not in powers:
+        powers[nb_low] = MPZ(big_base)**nb_low
+    high, low = divmod(n, powers[nb_low])
+    split_int(high, big_base, nb_blocks - nb_low, out, powers, start)
+    split_int(low, big_base, nb_low, out, powers, start + nb_blocks - nb_low)
+
+
+def int_to_digits(n: int, base: int, nb_digits: int,
+                  powers: Optional[Dict[int, int]] = None) -> np.ndarray:
+    """
+    Convert the integer ``n`` into exactly ``nb_digits`` base-``base`` digits.
+
+    ``n`` is first split into uint64 leaves of ``leaf_size`` digits each (see ``split_int``),
+    then all leaves are expanded at once with vectorized NumPy divisions.
+
+    Parameters
+    ----------
+    n : int
+        Integer to convert, must be lower than ``base**nb_digits``.
+    base : int
+        Radix base to convert to.
+    nb_digits : int
+        Number of digits to produce (leading 0s included).
+    powers : dict, optional
+        Cache of the powers of ``base**leaf_size``, keyed by exponent.
+
+    Returns
+    -------
+    digits : ndarray of int
+        Array of digits, most significant first.
+    """
+    leaf_size = get_leaf_size(base)
+    nb_leaves = -(-nb_digits // leaf_size)
+    if nb_leaves == 0:
+        return np.empty(0, dtype=int)
+    leaves = np.empty(nb_leaves, dtype=np.uint64)
+    split_int(n, base**leaf_size, nb_leaves, leaves, powers)
+
+    digits = np.empty((nb_leaves, leaf_size), dtype=int)
+    for j in range(leaf_size-1, -1, -1):
+        leaves, digits[:, j] = np.divmod(leaves, np.uint64(base))
+
+    return digits.ravel()[(nb_leaves*leaf_size - nb_digits):]
+
+
+def iter_int_blocks(n: int, big_base: int, nb_blocks: int,
+                    powers: Optional[Dict[int, int]] = None) -> Iterator[int]:
+    """
+    Yield the ``nb_blocks`` base-``big_base`` blocks of ``n``, most significant first.
+
+    This is the lazy counterpart of ``split_int``: only one branch of the recursion
+    is expanded at a time.
+
+    Parameters
+    ----------
+    n : int
+        Integer to split, must be lower than ``big_base**nb_blocks``.
+    big_base : int
+        Base of the blocks.
+    nb_blocks : int
+        Number of blocks to yield.
+    powers : dict, optional
+        Cache of the powers of ``big_base``, keyed by exponent.
+
+    Yields
+    ------
+    block : int
+        Next block, lower than ``big_base``.
+    """
+    if powers is None:
+        powers = {}
+    if nb_blocks == 1:
+        yield n
+        return
+    nb_low = nb_blocks // 2
+    if nb_low not in powers:
+        powers[nb_low] = MPZ(big_base)**nb_low
+    high, low = divmod(n, powers[nb_low])
+    del n
+    yield from iter_int_blocks(high, big_base, nb_blocks - nb_low, powers)
+    del high
+    yield from iter_int_blocks(low, big_base, nb_low, powers)
+
+
+def iter_int_digits(n: int, base: int, nb_digits: int,
+                    chunk_size: int = DIGIT_CHUNK_SIZE) -> Iterator[np.ndarray]:
+    """
+    Yield the ``nb_digits`` base-``base`` digits of ``n`` by chunks, most significant first.
+
+    All chunks hold ``chunk_size`` digits, except the first one which may be shorter.
+
+    Parameters
+    ----------
+    n : int
+        Integer to convert, must be lower than ``base**nb_digits``.
+    base : int
+        Radix base to convert to.
+    nb_digits : int
+        Number of digits to produce (leading 0s included).
+    chunk_size : int, optional
+        Number of digits per chunk (default is ``DIGIT_CHUNK_SIZE``).
+
+    Yields
+    ------
+    digits : ndarray of int
+        Next chunk of digits.
+    """
+    nb_chunks = max(1, -(-nb_digits // chunk_size))
+    if nb_chunks == 1:
+        yield int_to_digits(n, base, nb_digits)
+        return
+
+    first_chunk_size = nb_digits - (nb_chunks-1)*chunk_size
+    powers: Dict[int, int] = {}
+    for i, block in enumerate(iter_int_blocks(n, base**chunk_size, nb_chunks)):
+        yield int_to_digits(block, base, first_chunk_size if i == 0 else chunk_size, powers)
+
+
+def iter_chunks(digit_sequence: Any, chunk_size: int = DIGIT_CHUNK_SIZE) -> Iterator[Any]:
+    """
+    Yield consecutive slices of a digit sequence.
+
+    Parameters
+    ----------
+    digit_sequence : array-like of int
+        Sequence of digits.
+    chunk_size : int, optional
+        Number of digits per chunk (default is ``DIGIT_CHUNK_SIZE``).
+
+    Yields
+    ------
+    chunk : array-like of int
+        Next slice of at most ``chunk_size`` digits (a view for NumPy arrays).
+    """
+    for start in range(0, len(digit_sequence), chunk_size):
+        yield digit_sequence[start:(start+chunk_size)]
+
+
+def get_digits_window(x: mpf, base: int, start: int, stop: int, dtype: Any = int) -> np.ndarray:
+    """
+    Extract the digits of ``x`` in base ``base`` from position ``start`` to position ``stop``.
+
+    Only the digits of the window are converted, the leading ones being dropped from the
+    scaled integer beforehand.
+
+    Parameters
+    ----------
+    x : mpmath.mpf
+        Number in base 10.
+    base : int
+        Radix base to convert to.
+    start : int
+        Index of the first digit to extract (0 being the first decimal place).
+    stop : int
+        Index after the last digit to extract.
+    dtype : data-type, optional
+        Type of the returned digits (default is ``int``).
+
+    Returns
+    -------
+    digits : ndarray of int
+        Array of the ``stop - start`` digits of the window.
+    """
+    scaled = get_scaled_fraction(x, base, stop) % (MPZ(base)**(stop - start))
+    digits = np.empty(stop - start, dtype=dtype)
+    position = 0
+    for chunk in iter_int_digits(scaled, base, stop - start):
+        digits[position:(position+len(chunk))] = chunk
+        position += len(chunk)
+
+    return digits
+
+
+def get_base_root(base: int) -> Tuple[int, int]:
+    """
+    Decompose a base as a power of the smallest possible root, e.g. 64 as 2**6 or 27 as 3**3.
+
+    Parameters
+    ----------
+    base : int
+        Radix base.
+
+    Returns
+    -------
+    root : int
+        Smallest integer whose power is ``base`` (``base`` itself if there is none).
+    power : int
+        Exponent such that ``root**power == base``.
+    """
+    root = 2
+    while root * root <= base:
+        power, value = 1, root
+        while value < base:
+            power, value = power + 1, value * root
+        if value == base:
+            return (root, power)
+        root += 1
+
+    return (base, 1)
+
+
+def group_base_families(bases: List[int]) -> List[List[int]]:
+    """
+    Group bases that are powers of a same root, e.g. 2, 8 and 16, in the order of their first occurrence.
+
+    Parameters
+    ----------
+    bases : list of int
+        Radix bases.
+
+    Returns
+    -------
+    families : list of list of int
+        Bases grouped by root.
+    """
+    families: Dict[int, List[int]] = {}
+    for base in bases:
+        families.setdefault(get_base_root(base)[0], []).append(base)
+
+    return list(families.values())
+
+
+def regroup_digits(root_digits: np.ndarray, root: int, power: int) -> np.ndarray:
+    """
+    Regroup digits in base ``root`` into digits in base ``root**power``, ``power`` by ``power``.
+
+    Parameters
+    ----------
+    root_digits : ndarray of int
+        Digits in base ``root``, a multiple of ``power`` of them.
+    root : int
+        Radix base of the digits.
+    power : int
+        Number of digits in base ``root`` per digit in base ``root**power``.
+
+    Returns
+    -------
+    digits : ndarray of uint64
+        Digits in base ``root**power``.
+    """
+    groups = root_digits.reshape(-1, power)
+    digits = groups[:, 0].astype(np.uint64)
+    for j in range(1, power):
+        digits *= np.uint64(root)
+        # signed digits would promote the sum to floats
+        digits += groups[:, j].astype(np.uint64)
+
+    return digits
+
+
+def get_binary_digits(x: mpf, base: int, nb_digits: int, dtype: Any = int) -> np.ndarray:
+    """
+    Extract the first ``nb_digits`` digits of ``x`` in a power-of-2 base, straight from the bits
+    of its scaled fractional part.
+
+    Parameters
+    ----------
+    x : mpmath.mpf
+        Number in base 10.
+    base : int
+        Radix base, a power of 2.
+    nb_digits : int
+        Number of digits to extract.
+    dtype : data-type, optional
+        Type of the returned digits (default is ``int``).
+
+    Returns
+    -------
+    digits : ndarray of int
+        Array of digits in the specified base.
+    """
+    power = base.bit_length() - 1
+    nb_bits = power * nb_digits
+    nb_bytes = -(-nb_bits // 8)
+    data = np.frombuffer(int(get_scaled_fraction(x, 2, nb_bits)).to_bytes(nb_bytes, "big"), dtype=np.uint8)
+    padding = 8*nb_bytes - nb_bits
+
+    digits = np.empty(nb_digits, dtype=dtype)
+    for start in range(0, nb_digits, DIGIT_CHUNK_SIZE):
+        stop = min(nb_digits, start + DIGIT_CHUNK_SIZE)
+        bit_start, bit_stop = padding + power*start, padding + power*stop
+        bits = np.unpackbits(data[(bit_start // 8):(-(-bit_stop // 8))])
+        bits = bits[(bit_start % 8):(bit_start % 8 + bit_stop - bit_start)]
+        digits[start:stop] = regroup_digits(bits, 2, power)
+
+    return digits
+
+
+def get_digits_in_bases(x: mpf, bases: List[int], nb_digits: int) -> Dict[int, np.ndarray]:
+    """
+    Extract the first ``nb_digits`` digits of ``x`` in several bases, with one conversion per family
+    of bases sharing a root (see ``group_base_families``).
+
+    The digits in the root base are extracted once, as many as needed by the largest power,
+    then regrouped for every base of the family.
+
+    Parameters
+    ----------
+    x : mpmath.mpf
+        Number in base 10.
+    bases : list of int
+        Radix bases to convert to.
+    nb_digits : int
+        Number of digits to extract in each base.
+
+    Returns
+    -------
+    digit_sequences : dict
+        Array of digits, stored on the smallest unsigned integer type, per base.
+    """
+    digit_sequences = {}
+    for family in group_base_families(bases):
+        if len(family) == 1:
+            base = family[0]
+            digit_sequences[base] = get_digits_in_base(x, base, nb_digits, dtype=get_digit_dtype(base))
+            continue
+
+        root = get_base_root(family[0])[0]
+        powers = {base: get_base_root(base)[1] for base in family}
+        root_digits = get_digits_in_base(x, root, max(powers.values()) * nb_digits, dtype=get_digit_dtype(root))
+        for base, power in powers.items():
+            digit_sequences[base] = np.empty(nb_digits, dtype=get_digit_dtype(base))
+            for start in range(0, nb_digits, DIGIT_CHUNK_SIZE):
+                stop = min(nb_digits, start + DIGIT_CHUNK_SIZE)
+                digit_sequences[base][start:stop] = regroup_digits(root_digits[(power*start):(power*stop)], root, power)
+
+    return digit_sequences
+
+
+def get_digits_in_base_loop(x: mpf, base: int, nb_digits: int) -> np.ndarray:  # type: ignore
+    """
+    Extract the first ``nb_digits`` digits of ``x`` in base ``base``, one digit at a time.
+
+    This is the reference implementation, quadratic in ``nb_digits``: it is kept to check
+    the faster conversion engine digit for digit.
 
     Parameters
     ----------
@@ -42,10 +540,11 @@ def get_digits_in_base(x: mpf, base: int, nb_digits: int) -> np.ndarray:  # type
     digits : ndarray of int
         Array of digits in the specified base.
     """
+    x = abs(mpf(x))
     if base == 10:
         # no conversion needed, just get the 10-digits, but restore the possible
         # trailing 0s that were dropped in 'x'
-        digits = np.array([int(d) for d in str(x).split('.')[1]])
+        digits = np.array([int(d) for d in str(x).split('.')[1]])[:nb_digits]
         digits = np.pad(digits, (0, nb_digits-len(digits)), mode="constant", constant_values=0)
     else:
         # convert x and store the b-digits
@@ -60,7 +559,123 @@ def get_digits_in_base(x: mpf, base: int, nb_digits: int) -> np.ndarray:  # type
     return digits
 
 
-def format_digit_sequence(digit_sequence: list[int], base: int, nb_digits_per_row: int = 100) -> str:
+def get_digits_in_base(x: mpf, base: int, nb_digits: int, method: str = "fast",
+                       dtype: Any = int) -> np.ndarray:  # type: ignore
+    """
+    Extract the first ``nb_digits`` digits of ``x`` in base ``base``, after conversion if needed.
+
+    Parameters
+    ----------
+    x : mpmath.mpf
+        Number in base 10.
+    base : int
+        Radix base to convert to.
+    nb_digits : int
+        Number of digits to extract.
+    method : str, optional
+        ``"fast"`` (default) scales the fractional part once to a big integer and splits it
+        with a divide-and-conquer scheme (or reads its bits in a power-of-2 base), ``"loop"`` extracts the digits one by one
+        (reference implementation).
+    dtype : data-type, optional
+        Type of the returned digits, e.g. ``get_digit_dtype(base)`` to store one byte per digit
+        in base 10 (default is ``int``). The fast conversion writes them chunk by chunk,
+        so that no full-length temporary array of another type is created.
+
+    Returns
+    -------
+    digits : ndarray of int
+        Array of digits in the specified base.
+
+    Raises
+    ------
+    ValueError
+        If ``method`` is unknown.
+    """
+    if method == "loop":
+        return get_digits_in_base_loop(x, base, nb_digits).astype(dtype)
+    if method != "fast":
+        raise ValueError(f"Invalid conversion method: {method}")
+    if get_base_root(base)[0] == 2:
+        return get_binary_digits(x, base, nb_digits, dtype=dtype)
+
+    scaled = get_scaled_fraction(x, base, nb_digits)
+    digits = np.empty(nb_digits, dtype=dtype)
+    start = 0
+    for chunk in iter_int_digits(scaled, base, nb_digits):
+        digits[start:(start+len(chunk))] = chunk
+        start += len(chunk)
+
+    return digits
+
+
+@lru_cache(maxsize=64)
+def get_digit_table(base: int) -> np.ndarray:
+    """
+    Build the table of the ASCII characters of each digit, as written by ``format_digit_sequence``.
+
+    Parameters
+    ----------
+    base : int
+        Numeric base used to interpret the digits. Must be greater than 1.
+
+    Returns
+    -------
+    digit_table : ndarray of uint8
+        Array of shape (base, nb_chars), whose row ``d`` holds the characters of digit ``d``:
+        the digit itself for bases ≤ 10, the right-aligned digit followed by a space otherwise.
+        Shared between calls, must not be modified.
+    """
+    if base <= 10:
+        return (np.arange(base, dtype=np.uint8) + ord("0"))[:, None]
+    nb_chars_per_digits = int(np.ceil(np.log10(base)))
+    cells = "".join(f"{d:>{nb_chars_per_digits}d} " for d in range(base))
+
+    return np.frombuffer(cells.encode("ascii"), dtype=np.uint8).reshape(base, nb_chars_per_digits + 1)
+
+
+def format_digit_rows(digit_sequence: Any, base: int, nb_digits_per_row: int = 100) -> bytes:
+    """
+    Format a sequence of digits into an ASCII block with aligned rows, see ``format_digit_sequence``.
+
+    The characters of all the digits are looked up at once in ``get_digit_table``, and laid out
+    in a preallocated buffer whose last column holds the newlines.
+
+    Parameters
+    ----------
+    digit_sequence : array-like of int
+        Digits to format. Each digit must be in the range [0, base).
+    base : int
+        Numeric base used to interpret the digits. Must be greater than 1.
+    nb_digits_per_row : int, optional
+        Number of digits per row in the output block (default is 100).
+
+    Returns
+    -------
+    sequence_block : bytes
+        ASCII block of the formatted digit sequence, without trailing newline.
+    """
+    digit_table = get_digit_table(base)
+    nb_chars = digit_table.shape[1]
+    row_length = get_row_length(base, nb_digits_per_row)
+    cells = digit_table[np.asarray(digit_sequence)]
+    nb_digits = len(cells)
+    nb_full_rows = nb_digits // nb_digits_per_row
+    nb_full_rows_digits = nb_full_rows * nb_digits_per_row
+
+    block = np.empty(nb_full_rows*row_length + (nb_digits - nb_full_rows_digits)*nb_chars, dtype=np.uint8)
+    rows = block[:(nb_full_rows*row_length)].reshape(nb_full_rows, row_length)
+    rows[:, :(nb_digits_per_row*nb_chars)] = cells[:nb_full_rows_digits].reshape(nb_full_rows, nb_digits_per_row*nb_chars)
+    # for bases > 10, the newline replaces the separator after the last digit of the row
+    rows[:, -1] = ord("\n")
+    block[(nb_full_rows*row_length):] = cells[nb_full_rows_digits:].ravel()
+
+    # no trailing newline, nor trailing separator
+    bool_trim = block.size and (nb_chars > 1 or nb_digits == nb_full_rows_digits)
+
+    return block[:(block.size - 1 if bool_trim else block.size)].tobytes()
+
+
+def format_digit_sequence(digit_sequence: Any, base: int, nb_digits_per_row: int = 100) -> str:
     """
     Format a sequence of digits into a string block with aligned rows.
 
@@ -70,8 +685,8 @@ def format_digit_sequence(digit_sequence: list[int], base: int, nb_digits_per_ro
 
     Parameters
     ----------
-    digit_sequence : list of int
-        List of digits to format. Each digit must be in the range [0, base).
+    digit_sequence : array-like of int
+        Digits to format. Each digit must be in the range [0, base).
     base : int
         Numeric base used to interpret the digits. Must be greater than 1.
     nb_digits_per_row : int, optional
@@ -82,21 +697,105 @@ def format_digit_sequence(digit_sequence: list[int], base: int, nb_digits_per_ro
     sequence_block : str
         A string containing the formatted digit sequence, split into rows.
     """
+    return format_digit_rows(digit_sequence, base, nb_digits_per_row).decode("ascii")
+
+
+def write_digit_sequence(f: TextIO, digit_chunks: Iterable[Any], base: int,
+                         nb_digits_per_row: int = 100) -> None:
+    """
+    Write a digit sequence given by chunks as a text block, without building it in memory.
+
+    The output is identical to ``format_digit_sequence`` applied to the whole sequence.
+    Whatever the size of the given chunks, rows are formatted and written by blocks
+    of at most ``TEXT_CHUNK_ROWS`` rows, so that memory stays bounded.
+
+    Parameters
+    ----------
+    f : file object
+        Text stream to write to.
+    digit_chunks : iterable of array-like of int
+        Consecutive chunks of the digit sequence, of any lengths.
+    base : int
+        Numeric base used to interpret the digits. Must be greater than 1.
+    nb_digits_per_row : int, optional
+        Number of digits per row in the output block (default is 100).
+    """
+    block_size = TEXT_CHUNK_ROWS * nb_digits_per_row
+    is_first_block = True
+
+    def write_rows(digits: np.ndarray) -> None:
+        nonlocal is_first_block
+        with profile_stage("format", len(digits)):
+            rows = format_digit_rows(digits, base, nb_digits_per_row).decode("ascii")
+        with profile_stage("write", len(rows)):
+            if not is_first_block:
+                f.write("\n")
+            f.write(rows)
+        is_first_block = False
+
+    carry = np.empty(0, dtype=np.uint8)
+    for chunk in digit_chunks:
+        chunk = np.asarray(chunk)
+        if carry.size:
+            # complete the pending row only, instead of copying the whole chunk after it
+            nb_missing_digits = nb_digits_per_row - len(carry)
+            carry = np.concatenate((carry, chunk[:nb_missing_digits]))
+            chunk = chunk[nb_missing_digits:]
+            if len(carry) < nb_digits_per_row:
+                continue
+            write_rows(carry)
+        nb_full_rows_digits = len(chunk) - len(chunk) % nb_digits_per_row
+        for start in range(0, nb_full_rows_digits, block_size):
+            write_rows(chunk[start:min(nb_full_rows_digits, start + block_size)])
+        carry = chunk[nb_full_rows_digits:]
+
+    if len(carry):
+        write_rows(carry)
+
+
+def get_row_length(base: int, nb_digits_per_row: int = 100) -> int:
+    """
+    Compute the number of characters of a full row written by ``format_digit_sequence``.
+
+    Parameters
+    ----------
+    base : int
+        Numeric base used to interpret the digits. Must be greater than 1.
+    nb_digits_per_row : int, optional
+        Number of digits per row (default is 100).
+
+    Returns
+    -------
+    row_length : int
+        Number of characters of a full row, including its trailing newline.
+    """
     if base <= 10:
-        # print digits contiguously
-        formatter = str
-        sep = ""
-    else:
-        # separate and align digits
-        nb_chars_per_digits = int(np.ceil(np.log10(base)))
-        formatter = lambda d: f"{d:>{nb_chars_per_digits}d}"
-        sep = " "
+        return nb_digits_per_row + 1
+    nb_chars_per_digits = int(np.ceil(np.log10(base)))
 
-    formatted_sequence = list(map(formatter, digit_sequence))
+    return nb_digits_per_row * (nb_chars_per_digits + 1)
 
-    rows = [sep.join(formatted_sequence[i:(i+nb_digits_per_row)])
-            for i in range(0, len(formatted_sequence), nb_digits_per_row)]
 
-    sequence_block = "\n".join(rows)
+def parse_digit_sequence(sequence_block: str, base: int, dtype: Any = int) -> np.ndarray:
+    """
+    Parse a text block written by ``format_digit_sequence`` back into digits.
+
+    Parameters
+    ----------
+    sequence_block : str
+        Formatted digit sequence.
+    base : int
+        Numeric base used to interpret the digits. Must be greater than 1.
+    dtype : data-type, optional
+        Type of the returned digits (default is ``int``).
+
+    Returns
+    -------
+    digit_sequence : ndarray of int
+        Array of digits.
+    """
+    if base <= 10:
+        chars = np.frombuffer(sequence_block.encode("ascii"), dtype=np.uint8)
+        return (chars[chars != ord("\n")] - ord("0")).astype(dtype)
 
-    return sequence_block
+    return np.array(sequence_block.split(), dtype=dtype)
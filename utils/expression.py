@@ -6,7 +6,8 @@ Utility functions and constants for building the restricted mathematical environ
 and path-compliant filenames.
 
 This module exposes standard functions and constants from mpmath, in order to allow the evaluation
-of safe expressions only.
+of safe expressions only. Expressions are parsed once into a validated AST, whose repeated
+subexpressions are hoisted, then compiled and memoized.
 
 Constants
 ---------
@@ -16,9 +17,15 @@ STANDARD_CSTS : list of str
     Names of the standard mathematical constants provided by ``mpmath`` (e.g., "pi", "e").
 STANDARD_ATTRS : list of str
     Combined list of these standard functions and constants exposed in the environment.
+MP_ENV : dict
+    Restricted environment, built once.
+ALLOWED_NODES : tuple of type
+    AST node types allowed in an expression.
 """
 
-from typing import Any
+from functools import lru_cache
+from typing import Any, List, Tuple
+import ast
 import warnings
 
 from mpmath import mp, mpc
@@ -71,12 +78,112 @@ def build_env() -> dict:
     return env
 
 
+MP_ENV = build_env()
+
+ALLOWED_NODES = (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Call, ast.Name, ast.Constant, ast.Load,
+                 ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow, ast.UAdd, ast.USub)
+
+CompiledExpr = Tuple[List[Tuple[str, Any]], Any]
+
+
+def validate_ast(tree: ast.AST) -> None:
+    """
+    Check that a parsed expression only holds numbers, arithmetic operators, and the standard
+    constants and functions.
+
+    Parameters
+    ----------
+    tree : ast.AST
+        Parsed expression.
+
+    Raises
+    ------
+    ValueError
+        If a node is not allowed.
+    """
+    for node in ast.walk(tree):
+        if not isinstance(node, ALLOWED_NODES):
+            raise ValueError(f"forbidden syntax: {type(node).__name__}")
+        if isinstance(node, ast.Name) and node.id not in MP_ENV:
+            raise ValueError(f"unknown name: {node.id}")
+        if isinstance(node, ast.Constant) and (isinstance(node.value, bool)
+                                               or not isinstance(node.value, (int, float, complex))):
+            raise ValueError(f"forbidden constant: {node.value!r}")
+        if isinstance(node, ast.Call) and (not isinstance(node.func, ast.Name) or node.func.id not in STANDARD_FCTS
+                                           or node.keywords):
+            raise ValueError(f"forbidden call: {ast.unparse(node)}")
+
+
+class _SubexprHoister(ast.NodeTransformer):
+    """Replace the subexpressions occurring several times by names, innermost first."""
+
+    def __init__(self, repeated_keys: set) -> None:
+        self.repeated_keys = repeated_keys
+        self.names: dict = {}
+        self.subexprs: List[Tuple[str, ast.expr]] = []
+
+    def visit(self, node: ast.AST) -> Any:
+        key = ast.dump(node)
+        node = self.generic_visit(node)
+        if key not in self.repeated_keys:
+            return node
+        if key not in self.names:
+            self.names[key] = f"_subexpr_{len(self.subexprs)}"
+            self.subexprs.append((self.names[key], node))
+
+        return ast.Name(id=self.names[key], ctx=ast.Load())
+
+
+@lru_cache(maxsize=4096)
+def compile_expr(expr: str) -> CompiledExpr:
+    """
+    Parse, validate and compile an expression, once per distinct string.
+
+    Parameters
+    ----------
+    expr : str
+        User-provided mathematical expression.
+
+    Returns
+    -------
+    subexprs : list of tuple
+        (name, code object) of the repeated subexpressions (e.g. ``sqrt(5)``), in evaluation order.
+    code : code object
+        Compiled expression, referring to the subexpressions by name.
+
+    Raises
+    ------
+    ValueError
+        If the expression cannot be parsed or holds forbidden syntax.
+    """
+    try:
+        tree = ast.parse(expr.strip(), mode="eval")
+        validate_ast(tree)
+    except (SyntaxError, ValueError) as e:
+        raise ValueError(f"Invald expression: {expr}\n{e}") from e
+
+    # function calls and operations occurring more than once are evaluated only once
+    keys = [ast.dump(node) for node in ast.walk(tree.body) if isinstance(node, (ast.Call, ast.BinOp, ast.UnaryOp))]
+    repeated_keys = {key for key in keys if keys.count(key) > 1}
+    hoister = _SubexprHoister(repeated_keys)
+    body = hoister.visit(tree.body)
+
+    subexprs = []
+    for name, node in hoister.subexprs:
+        subexpr = ast.fix_missing_locations(ast.Expression(body=node))
+        subexprs.append((name, compile(subexpr, "<expr>", "eval")))
+    code = compile(ast.fix_missing_locations(ast.Expression(body=body)), "<expr>", "eval")
+
+    return (subexprs, code)
+
+
 def parse_expr(expr: str) -> Any:
     """
     Evaluate a mathematical expression within the restricted environment.
 
-    The expression is evaluated with ``eval`` using only the functions and
-    constants from ``mpmath`` defined in the restricted environment.
+    The expression is compiled once (see ``compile_expr``), then evaluated with ``eval``
+    at the current precision, using only the functions and constants from ``mpmath``
+    defined in the restricted environment.
     If the result is a complex number, the imaginary part is discarded and
     a warning is issued.
 
@@ -95,9 +202,12 @@ def parse_expr(expr: str) -> Any:
     ValueError
         If the expression is invalid or the evaluation fails.
     """
-    mp_env = build_env()
+    subexprs, code = compile_expr(expr)
+    mp_env = dict(MP_ENV)
     try:
-        x = eval(expr, {"__builtins__": None}, mp_env)
+        for name, subexpr in subexprs:
+            mp_env[name] = eval(subexpr, {"__builtins__": {}}, mp_env)
+        x = eval(code, {"__builtins__": {}}, mp_env)
         if isinstance(x, mpc):
             warnings.warn("Complex result. Imaginary part was discarded")
             x = x.real
@@ -126,3 +236,51 @@ def build_basename(expr: str) -> str:
     expr = "".join(expr.split())
 
     return expr
+
+
+def get_window_label(expr: str, start: int) -> str:
+    """
+    Build the label of a digit sequence starting at a given position, for titles and filenames.
+
+    Parameters
+    ----------
+    expr : str
+        The initial expression.
+    start : int
+        Index of the first digit of the sequence (0 being the first decimal place).
+
+    Returns
+    -------
+    label : str
+        ``expr`` itself if ``start`` is 0, ``"<expr> from <start>"`` otherwise.
+    """
+    if start == 0:
+        return expr
+
+    return f"{expr} from {start}"
+
+
+def normalize_expr(expr: str) -> str:
+    """
+    Normalize an expression, so that equivalent spellings share the same cache key.
+
+    Whitespace and redundant parentheses are removed by a round trip through the ``ast``
+    module. If the expression cannot be parsed, only its whitespace is removed.
+
+    Parameters
+    ----------
+    expr : str
+        The initial expression.
+
+    Returns
+    -------
+    normalized_expr : str
+        Canonical form of the expression.
+    """
+    try:
+        normalized_expr = ast.unparse(ast.parse(expr.strip(), mode="eval"))
+    except SyntaxError:
+        normalized_expr = expr
+    normalized_expr = "".join(normalized_expr.split())
+
+    return normalized_expr
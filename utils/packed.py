@@ -0,0 +1,263 @@
+"""
+Packed binary format of digit sequences.
+
+Each digit takes ``ceil(log2(base))`` bits (e.g. 4 bits in bases 10 and 16, 1 bit in base 2),
+most significant first, in a continuous bit stream. The file starts with a header:
+
+- the magic bytes ``PACKED_MAGIC``;
+- the length of the JSON metadata, as a little-endian uint32;
+- the JSON metadata (expression, base, number of digits, bits per digit, index of the first
+  digit, precision and number of certified digits when known), padded with spaces so that
+  the bit stream starts on a multiple of ``PACKED_ALIGNMENT`` bytes.
+
+Readers memory-map the bit stream, so that any slice is decoded without reading the rest.
+
+Constants
+---------
+PACKED_EXTENSION : str
+    Extension of the packed files.
+PACKED_MAGIC : bytes
+    First bytes of the packed files.
+PACKED_ALIGNMENT : int
+    Alignment of the bit stream in the file, in bytes.
+"""
+
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+import json
+import struct
+
+import numpy as np
+
+from utils.digits import DIGIT_CHUNK_SIZE, get_digit_dtype, regroup_digits
+
+PACKED_EXTENSION = ".digits"
+PACKED_MAGIC     = b"DIGSEQ01"
+PACKED_ALIGNMENT = 16
+
+
+def get_bits_per_digit(base: int) -> int:
+    """
+    Get the number of bits needed by one digit in a given base.
+
+    Parameters
+    ----------
+    base : int
+        Radix base.
+
+    Returns
+    -------
+    nb_bits : int
+        ``ceil(log2(base))``.
+    """
+    return (base - 1).bit_length()
+
+
+def pack_digits(digits: np.ndarray, nb_bits: int) -> np.ndarray:
+    """
+    Pack digits into a bit stream of ``nb_bits`` bits per digit, most significant first.
+
+    Parameters
+    ----------
+    digits : ndarray of int
+        Digits, lower than ``2**nb_bits``.
+    nb_bits : int
+        Number of bits per digit.
+
+    Returns
+    -------
+    data : ndarray of uint8
+        Packed bytes, the last one being padded with 0s.
+    """
+    if nb_bits == 8:
+        return digits.astype(np.uint8)
+    if nb_bits == 4:
+        nibbles = np.zeros(2 * (-(-len(digits) // 2)), dtype=np.uint8)
+        nibbles[:len(digits)] = digits
+        return (nibbles[0::2] << 4) | nibbles[1::2]
+
+    shifts = np.arange(nb_bits - 1, -1, -1, dtype=np.uint64)
+    bits = (digits.astype(np.uint64)[:, None] >> shifts) & np.uint64(1)
+
+    return np.packbits(bits.astype(np.uint8).ravel())
+
+
+def unpack_digits(data: np.ndarray, nb_bits: int, start: int, stop: int) -> np.ndarray:
+    """
+    Decode the digits ``start`` to ``stop - 1`` of a bit stream.
+
+    Only the bytes holding these digits are read.
+
+    Parameters
+    ----------
+    data : ndarray of uint8
+        Packed bytes, e.g. a memory map.
+    nb_bits : int
+        Number of bits per digit.
+    start : int
+        Index of the first digit to decode.
+    stop : int
+        Index after the last digit to decode.
+
+    Returns
+    -------
+    digits : ndarray of uint
+        Decoded digits.
+    """
+    if nb_bits == 8:
+        return np.array(data[start:stop])
+    if nb_bits == 4:
+        nibbles = data[(start // 2):(-(-stop // 2))]
+        digits = np.empty(2 * len(nibbles), dtype=np.uint8)
+        digits[0::2], digits[1::2] = nibbles >> 4, nibbles & 15
+        return digits[(start % 2):(start % 2 + stop - start)]
+
+    bit_start, bit_stop = nb_bits * start, nb_bits * stop
+    bits = np.unpackbits(data[(bit_start // 8):(-(-bit_stop // 8))])
+    bits = bits[(bit_start % 8):(bit_start % 8 + bit_stop - bit_start)]
+
+    return regroup_digits(bits, 2, nb_bits)
+
+
+def write_packed_sequence(path: str, digit_chunks: Iterable[np.ndarray], expr: str, base: int, nb_digits: int,
+                          metadata: Optional[Dict[str, Any]] = None) -> None:
+    """
+    Write a digit sequence, given by chunks, as a packed file.
+
+    Parameters
+    ----------
+    path : str
+        Path of the packed file.
+    digit_chunks : iterable of ndarray
+        Consecutive chunks of digits, ``nb_digits`` digits in total.
+    expr : str
+        String expression representing a number.
+    base : int
+        Radix base of the digits.
+    nb_digits : int
+        Number of digits of the sequence.
+    metadata : dict, optional
+        Additional header fields, e.g. ``start``, ``precision`` or ``nb_certified``.
+    """
+    nb_bits = get_bits_per_digit(base)
+    header = {"expr": expr, "base": base, "nb_digits": nb_digits, "bits_per_digit": nb_bits,
+              "start": 0, "precision": None, "nb_certified": None}
+    header.update(metadata or {})
+    header_bytes = json.dumps(header).encode("utf-8")
+    header_size = len(PACKED_MAGIC) + 4 + len(header_bytes)
+    header_bytes += b" " * (-header_size % PACKED_ALIGNMENT)
+
+    # chunks are packed by multiples of 8 digits, so that each one ends on a byte boundary
+    carry = np.empty(0, dtype=np.uint64)
+    with open(path, mode="wb") as f:
+        f.write(PACKED_MAGIC + struct.pack("<I", len(header_bytes)) + header_bytes)
+        for chunk in digit_chunks:
+            if carry.size:
+                chunk = np.concatenate((carry, chunk))
+            nb_packed = len(chunk) - len(chunk) % 8
+            f.write(pack_digits(chunk[:nb_packed], nb_bits).tobytes())
+            carry = chunk[nb_packed:]
+        if carry.size:
+            f.write(pack_digits(carry, nb_bits).tobytes())
+
+
+def read_packed_header(path: str) -> Tuple[Dict[str, Any], int]:
+    """
+    Read the header of a packed file.
+
+    Parameters
+    ----------
+    path : str
+        Path of the packed file.
+
+    Returns
+    -------
+    header : dict
+        Metadata of the sequence.
+    offset : int
+        Position of the bit stream in the file, in bytes.
+
+    Raises
+    ------
+    ValueError
+        If the file is not a packed digit sequence.
+    """
+    with open(path, mode="rb") as f:
+        magic = f.read(len(PACKED_MAGIC))
+        if magic != PACKED_MAGIC:
+            raise ValueError(f"Not a packed digit sequence: {path}")
+        header_length, = struct.unpack("<I", f.read(4))
+        header = json.loads(f.read(header_length).decode("utf-8"))
+
+    return (header, len(PACKED_MAGIC) + 4 + header_length)
+
+
+def open_packed_sequence(path: str) -> Tuple[Dict[str, Any], np.ndarray]:
+    """
+    Memory-map the bit stream of a packed file.
+
+    Parameters
+    ----------
+    path : str
+        Path of the packed file.
+
+    Returns
+    -------
+    header : dict
+        Metadata of the sequence.
+    data : ndarray of uint8
+        Read-only memory map of the packed bytes.
+    """
+    header, offset = read_packed_header(path)
+    if header["nb_digits"] == 0:
+        return (header, np.empty(0, dtype=np.uint8))
+
+    return (header, np.memmap(path, dtype=np.uint8, mode="r", offset=offset))
+
+
+def load_packed_sequence(path: str, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+    """
+    Load a slice of a packed digit sequence.
+
+    Parameters
+    ----------
+    path : str
+        Path of the packed file.
+    start : int, optional
+        Index of the first digit to load (default is 0).
+    stop : int, optional
+        Index after the last digit to load. If ``None`` (default), load up to the end.
+
+    Returns
+    -------
+    digit_sequence : ndarray of uint
+        Array of digits, stored on the smallest unsigned integer type.
+    """
+    header, data = open_packed_sequence(path)
+    nb_digits = header["nb_digits"]
+    stop = nb_digits if stop is None else min(stop, nb_digits)
+    start = min(start, stop)
+
+    return unpack_digits(data, header["bits_per_digit"], start, stop).astype(get_digit_dtype(header["base"]))
+
+
+def iter_packed_sequence(path: str, chunk_size: int = DIGIT_CHUNK_SIZE) -> Iterator[np.ndarray]:
+    """
+    Yield the digits of a packed file chunk by chunk.
+
+    Parameters
+    ----------
+    path : str
+        Path of the packed file.
+    chunk_size : int, optional
+        Number of digits per chunk (default is ``DIGIT_CHUNK_SIZE``).
+
+    Yields
+    ------
+    digits : ndarray of uint
+        Next chunk of digits.
+    """
+    header, data = open_packed_sequence(path)
+    dtype = get_digit_dtype(header["base"])
+    for start in range(0, header["nb_digits"], chunk_size):
+        stop = min(header["nb_digits"], start + chunk_size)
+        yield unpack_digits(data, header["bits_per_digit"], start, stop).astype(dtype)
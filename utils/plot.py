@@ -4,15 +4,25 @@
 Utility functions for plotting digit trajectories.
 
 This module provides functions to compute step directions, generate trajectory points,
-set plotting parameters, and build LaTeX names for numbers.
+set plotting parameters, draw the compass of a base, and build LaTeX names for numbers.
+It does not import matplotlib itself, so that computing trajectories does not load the plotting stack.
 """
 
-from typing import List, Tuple, Any
+from typing import Iterable, Iterator, List, Optional, Tuple, Any
 
 import numpy as np
-import matplotlib.pyplot as plt
 
-def compute_steps(base: int) -> Tuple[List[float], List[float]]:
+# exact integer steps for the bases whose directions lie on a lattice:
+# each step is (ax, ay, bx, by), such that dx = ax + bx*sqrt(2)/2 and dy = ay + by*sqrt(2)/2
+LATTICE_STEPS = {
+    2: [(0, 1, 0, 0), (0, -1, 0, 0)],
+    4: [(0, 1, 0, 0), (1, 0, 0, 0), (0, -1, 0, 0), (-1, 0, 0, 0)],
+    8: [(0, 1, 0, 0), (0, 0, 1, 1), (1, 0, 0, 0), (0, 0, 1, -1),
+        (0, -1, 0, 0), (0, 0, -1, -1), (-1, 0, 0, 0), (0, 0, -1, 1)],
+}
+
+
+def compute_steps(base: int) -> Tuple[np.ndarray, np.ndarray]:
     """
     Compute the directions of unit displacements in the given base.
 
@@ -23,30 +33,42 @@ def compute_steps(base: int) -> Tuple[List[float], List[float]]:
 
     Returns
     -------
-    dxs : list of float
-        List of x-components for each direction.
-    dys : list of float
-        List of y-components for each direction.
+    dxs : ndarray of float
+        Array of x-components for each direction.
+    dys : ndarray of float
+        Array of y-components for each direction.
     """
-    dzs = [np.exp(1j*(np.pi/2 - 2*i*np.pi/base)) for i in range(base)]
-    dxs = [dz.real for dz in dzs]
-    dys = [dz.imag for dz in dzs]
+    angles = np.pi/2 - 2*np.pi*np.arange(base)/base
+    dxs = np.cos(angles)
+    dys = np.sin(angles)
 
     return (dxs, dys)
 
 
-def compute_points(digit_sequence: Any, dxs: List[float], dys: List[float]) -> Tuple[np.ndarray, np.ndarray]:
+def compute_points(digit_sequence: Any, dxs: Any, dys: Any, dtype: Any = np.float64,
+                   out: Optional[Tuple[np.ndarray, np.ndarray]] = None,
+                   start: Tuple[float, float] = (0., 0.)) -> Tuple[np.ndarray, np.ndarray]:
     """
     Compute the trajectory points from a digit sequence and step directions.
 
+    The steps are gathered with fancy indexing and accumulated with a cumulative sum.
+
     Parameters
     ----------
     digit_sequence : array-like of int
         Sequence of digits representing the path.
-    dxs : list of float
-        List of x-components for each direction.
-    dys : list of float
-        List of y-components for each direction.
+    dxs : array-like of float
+        x-components for each direction.
+    dys : array-like of float
+        y-components for each direction.
+    dtype : data-type, optional
+        Type of the coordinates, e.g. ``np.float32`` to halve memory (default is ``np.float64``).
+        Ignored if ``out`` is given.
+    out : tuple of ndarray, optional
+        Preallocated (xs, ys) arrays of length ``len(digit_sequence)+1`` to write into.
+    start : tuple of float, optional
+        Starting point of the trajectory, e.g. the end point of a previous part of it
+        (default is (0,0)).
 
     Returns
     -------
@@ -55,36 +77,158 @@ def compute_points(digit_sequence: Any, dxs: List[float], dys: List[float]) -> T
     ys : ndarray of float
         Array of y-coordinates of the trajectory.
     """
-    xs = np.zeros(len(digit_sequence)+1)
-    ys = np.zeros(len(digit_sequence)+1)
-    for i, c in enumerate(digit_sequence, start=1):
-        c = int(c)
-        xs[i] = xs[i-1] + dxs[c]
-        ys[i] = ys[i-1] + dys[c]
+    digit_sequence = np.asarray(digit_sequence)
+    if out is None:
+        xs = np.empty(len(digit_sequence)+1, dtype=dtype)
+        ys = np.empty(len(digit_sequence)+1, dtype=dtype)
+    else:
+        xs, ys = out
+    xs[0], ys[0] = 0, 0
+    np.cumsum(np.asarray(dxs, dtype=xs.dtype)[digit_sequence], out=xs[1:])
+    np.cumsum(np.asarray(dys, dtype=ys.dtype)[digit_sequence], out=ys[1:])
+    if start != (0., 0.):
+        xs += start[0]
+        ys += start[1]
+
+    return (xs, ys)
+
+
+def compute_lattice_points(digit_sequence: Any, base: int, dtype: Any = np.float64,
+                           out: Optional[Tuple[np.ndarray, np.ndarray]] = None
+                           ) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Compute the trajectory points of a digit sequence exactly, for bases 2, 4 and 8.
+
+    The positions are accumulated on integer coordinates (the diagonal steps of base 8 being
+    counted separately), so that there is no floating-point drift along the path.
+    Each point is converted to floats only once, at the end.
+
+    Parameters
+    ----------
+    digit_sequence : array-like of int
+        Sequence of digits representing the path.
+    base : int
+        Radix base, must be a key of ``LATTICE_STEPS``.
+    dtype : data-type, optional
+        Type of the coordinates (default is ``np.float64``). Ignored if ``out`` is given.
+    out : tuple of ndarray, optional
+        Preallocated (xs, ys) arrays of length ``len(digit_sequence)+1`` to write into.
+
+    Returns
+    -------
+    xs : ndarray of float
+        Array of x-coordinates of the trajectory.
+    ys : ndarray of float
+        Array of y-coordinates of the trajectory.
+
+    Raises
+    ------
+    ValueError
+        If the base has no lattice steps.
+    """
+    if base not in LATTICE_STEPS:
+        raise ValueError(f"No exact lattice for base {base}, must be in {list(LATTICE_STEPS)}")
+
+    digit_sequence = np.asarray(digit_sequence)
+    if out is None:
+        xs = np.empty(len(digit_sequence)+1, dtype=dtype)
+        ys = np.empty(len(digit_sequence)+1, dtype=dtype)
+    else:
+        xs, ys = out
+    steps = np.array(LATTICE_STEPS[base], dtype=np.int64)[digit_sequence]
+    positions = np.cumsum(steps, axis=0)
+    half_sqrt2 = np.sqrt(2)/2
+    xs[0], ys[0] = 0, 0
+    xs[1:] = positions[:, 0] + half_sqrt2*positions[:, 2]
+    ys[1:] = positions[:, 1] + half_sqrt2*positions[:, 3]
 
     return (xs, ys)
 
 
-def generate_path_params(nb_digits: int) -> Tuple[List[Any], int]:
+def iter_points(digit_chunks: Iterable[Any], base: int, dtype: Any = np.float64
+                ) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
     """
-    Generate plotting parameters for a digit trajectory.
+    Compute the trajectory points of a digit sequence given by chunks, one chunk at a time.
+
+    Each chunk of points continues from the last point of the previous one. The first chunk
+    also holds the starting point (0,0), so that the concatenation of all chunks is equal to
+    the output of ``compute_points`` on the whole sequence.
+
+    Parameters
+    ----------
+    digit_chunks : iterable of array-like of int
+        Consecutive chunks of the digit sequence.
+    base : int
+        Radix base (number of possible directions).
+    dtype : data-type, optional
+        Type of the coordinates (default is ``np.float64``).
+
+    Yields
+    ------
+    xs : ndarray of float
+        x-coordinates of the next points.
+    ys : ndarray of float
+        y-coordinates of the next points.
+    """
+    dxs, dys = compute_steps(base)
+    x_end, y_end = 0., 0.
+    is_first_chunk = True
+    for chunk in digit_chunks:
+        xs, ys = compute_points(chunk, dxs, dys, dtype=dtype, start=(x_end, y_end))
+        x_end, y_end = xs[-1], ys[-1]
+        if is_first_chunk:
+            yield (xs, ys)
+            is_first_chunk = False
+        else:
+            yield (xs[1:], ys[1:])
+
+
+def generate_path_colors(nb_digits: int, indices: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Generate the colors of the points of a digit trajectory, with a vectorized colormap lookup.
 
     Parameters
     ----------
     nb_digits : int
         Number of digits in the sequence.
+    indices : ndarray of int, optional
+        Indices of the points to color. If ``None`` (default), all the points of the trajectory.
 
     Returns
     -------
-    cols : list
-        List of colors for trajectory points.
-    avg_step : int
-        Distance between 2 plotted points.
+    cols : ndarray of float
+        RGBA colors of the points, of shape (nb_points, 4).
+    """
+    from matplotlib import colormaps  # pylint: disable=import-outside-toplevel
+
+    if indices is None:
+        indices = np.arange(nb_digits+1)
+
+    return colormaps["RdYlBu"]((indices - 1) / nb_digits)
+
+
+def draw_compass(ax: Any, base: int) -> None:
     """
-    cols = [plt.cm.RdYlBu((i-1) / nb_digits) for i in range(nb_digits+1)]
-    avg_step = max(1, nb_digits // 1000)
+    Draw the compass showing the direction of each digit on the given axis.
 
-    return (cols, avg_step)
+    Parameters
+    ----------
+    ax : matplotlib.axes.Axes
+        Axis on which the compass is drawn.
+    base : int
+        Radix base (number of possible directions).
+    """
+    ax.set_aspect('equal')
+    ax.axis('off')
+    nb_spokes = base
+    angles = np.pi/2 - np.linspace(0, 2*np.pi, nb_spokes, endpoint=False)
+    x_spokes, y_spokes = np.cos(angles), np.sin(angles)
+    x_labels, y_labels = np.cos(angles-1./nb_spokes), np.sin(angles-1./nb_spokes)
+    for i in range(nb_spokes):
+        ax.plot([0, x_spokes[i]], [0, y_spokes[i]], color='white', lw=1)
+        ax.annotate("", xy=(x_spokes[i], y_spokes[i]), xytext=(0,0),
+                    arrowprops={"arrowstyle":"->", "lw":1, "mutation_scale":15})
+        ax.text(x_labels[i], y_labels[i], str(i), ha='center', va='center', fontsize=10)
 
 
 def build_latex_name(number_name: str) -> str:
@@ -0,0 +1,200 @@
+"""
+Lightweight per-stage instrumentation of the digit trajectory workflow.
+
+Stages are delimited with the ``profile_stage`` context manager, and attributed to the current
+job set with ``profile_job``. For each (job, stage) pair, the total duration, the allocation peak
+(traced with ``tracemalloc``), the number of processed items and the number of calls are recorded.
+When profiling is disabled (the default), ``profile_stage`` returns a shared no-op context,
+so that instrumented code pays nothing but a function call.
+"""
+
+from contextlib import contextmanager, nullcontext
+from typing import Any, ContextManager, Dict, Iterator, List, Optional
+import json
+import time
+import tracemalloc
+
+_NULL_CONTEXT = nullcontext()
+
+# state of the current process
+_STATE: Dict[str, Any] = {
+    "enabled": False,
+    "job": "",
+    "frames": [],   # [start memory, peak memory] of the stages being measured, outermost first
+    "records": {},  # (job, stage) -> record
+}
+
+
+def enable_profiling() -> None:
+    """Enable profiling in the current process, and start tracing memory allocations."""
+    _STATE["enabled"] = True
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def is_profiling() -> bool:
+    """
+    Check whether profiling is enabled in the current process.
+
+    Returns
+    -------
+    bool
+        ``True`` if profiling is enabled.
+    """
+    return _STATE["enabled"]
+
+
+def pop_records() -> List[Dict[str, Any]]:
+    """
+    Get the records of the current process, and clear them.
+
+    Returns
+    -------
+    records : list of dict
+        One record per (job, stage) pair, in the order of their first occurrence.
+    """
+    records = list(_STATE["records"].values())
+    _STATE["records"] = {}
+
+    return records
+
+
+@contextmanager
+def _job(job: str) -> Iterator[None]:
+    previous_job = _STATE["job"]
+    _STATE["job"] = job
+    try:
+        yield
+    finally:
+        _STATE["job"] = previous_job
+
+
+def profile_job(job: str) -> ContextManager[None]:
+    """
+    Attribute the stages run within the context to a given job.
+
+    Parameters
+    ----------
+    job : str
+        Label of the job, e.g. ``"pi, base 10, 1000 digits"``.
+
+    Returns
+    -------
+    context : context manager
+        No-op if profiling is disabled.
+    """
+    if not _STATE["enabled"]:
+        return _NULL_CONTEXT
+
+    return _job(job)
+
+
+@contextmanager
+def _stage(stage: str, nb_items: int) -> Iterator[None]:
+    frames = _STATE["frames"]
+    current, peak = tracemalloc.get_traced_memory()
+    if frames:
+        # the peak of the enclosing stage would be lost by reset_peak()
+        frames[-1][1] = max(frames[-1][1], peak)
+    tracemalloc.reset_peak()
+    frames.append([current, current])
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        frame_start, frame_peak = frames.pop()
+        frame_peak = max(frame_peak, tracemalloc.get_traced_memory()[1])
+        if frames:
+            frames[-1][1] = max(frames[-1][1], frame_peak)
+
+        key = (_STATE["job"], stage)
+        record = _STATE["records"].setdefault(key, {"job": key[0], "stage": stage, "duration_s": 0.,
+                                                    "peak_bytes": 0, "nb_items": 0, "nb_calls": 0})
+        record["duration_s"] += duration
+        record["peak_bytes"] = max(record["peak_bytes"], frame_peak - frame_start)
+        record["nb_items"] += nb_items
+        record["nb_calls"] += 1
+
+
+def profile_stage(stage: str, nb_items: int = 0) -> ContextManager[None]:
+    """
+    Measure the duration and allocation peak of the code run within the context.
+
+    Parameters
+    ----------
+    stage : str
+        Name of the stage, e.g. ``"convert"``.
+    nb_items : int, optional
+        Number of items processed by the stage, e.g. digits (default is 0).
+
+    Returns
+    -------
+    context : context manager
+        No-op if profiling is disabled.
+    """
+    if not _STATE["enabled"]:
+        return _NULL_CONTEXT
+
+    return _stage(stage, nb_items)
+
+
+def print_profile_table(records: List[Dict[str, Any]]) -> None:
+    """
+    Print the records as one table per job.
+
+    Parameters
+    ----------
+    records : list of dict
+        Records, see ``pop_records``.
+    """
+    jobs: Dict[str, List[Dict[str, Any]]] = {}
+    for record in records:
+        jobs.setdefault(record["job"], []).append(record)
+
+    for job, job_records in jobs.items():
+        print(f"# Profile of {job or 'main'}")
+        print(f"  {'stage':<12} {'time (s)':>10} {'peak (MB)':>10} {'items':>12} {'calls':>6}")
+        for record in job_records:
+            print(f"  {record['stage']:<12} {record['duration_s']:>10.4f} {record['peak_bytes'] / 2**20:>10.1f}"
+                  + f" {record['nb_items']:>12,} {record['nb_calls']:>6}")
+
+
+def dump_profile_json(records: List[Dict[str, Any]], path: str,
+                      metadata: Optional[Dict[str, Any]] = None) -> None:
+    """
+    Save the records as a JSON trace.
+
+    Parameters
+    ----------
+    records : list of dict
+        Records, see ``pop_records``.
+    path : str
+        Path of the JSON file.
+    metadata : dict, optional
+        Additional information saved along the records (e.g. the command line).
+    """
+    with open(path, mode="w", encoding="utf-8") as f:
+        json.dump({"metadata": metadata or {}, "records": records}, f, indent=2)
+
+
+def merge_records(new_records: List[Dict[str, Any]]) -> None:
+    """
+    Merge records, e.g. coming from worker processes, into the records of the current process.
+
+    Parameters
+    ----------
+    new_records : list of dict
+        Records to merge, see ``pop_records``.
+    """
+    records = _STATE["records"]
+    for new_record in new_records:
+        key = (new_record["job"], new_record["stage"])
+        record = records.get(key)
+        if record is None:
+            records[key] = dict(new_record)
+            continue
+        record["duration_s"] += new_record["duration_s"]
+        record["peak_bytes"] = max(record["peak_bytes"], new_record["peak_bytes"])
+        record["nb_items"] += new_record["nb_items"]
+        record["nb_calls"] += new_record["nb_calls"]
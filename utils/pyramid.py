@@ -0,0 +1,509 @@
+"""
+Multi-resolution (level-of-detail) representation of a digit trajectory.
+
+Level 0 groups the points of the trajectory by blocks of ``LOD_BLOCK_SIZE`` consecutive points,
+and each next level merges ``LOD_FACTOR`` consecutive blocks of the previous one, down to a single
+block. Each block holds the envelope (bounding box) and the mean of its points. A level whose blocks
+all fit in a pixel renders like the whole trajectory, with one point per block, so that the rendering
+time depends on the output resolution rather than on the number of digits. The envelopes also make
+the pyramid a spatial index: a region of interest, given as a bounding box or as a range of digits,
+only visits the blocks that intersect it. The first point of each block of level 0 is kept too,
+so that the points of a block can be rebuilt from a slice of the saved digits.
+
+The pyramid is built in a single pass over the points, which can be given chunk by chunk,
+and saved next to the digit sequence as ``<expr>_<base>_<digits>.lod.npz``.
+
+Constants
+---------
+LOD_BLOCK_SIZE : int
+    Number of points per block at level 0.
+LOD_FACTOR : int
+    Number of blocks of a level merged into one block of the next level.
+LOD_PIXEL_TOLERANCE : float
+    Largest size of a block, in pixels, for its mean to replace its points
+    (points being drawn a few pixels wide).
+LOD_EXTENSION : str
+    Extension of the saved pyramids.
+"""
+
+from typing import Callable, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+LOD_BLOCK_SIZE      = 32
+LOD_FACTOR          = 4
+LOD_PIXEL_TOLERANCE = 2.
+LOD_EXTENSION       = ".lod.npz"
+
+# columns of the block statistics
+X_MIN, X_MAX, Y_MIN, Y_MAX, X_MEAN, Y_MEAN = range(6)
+
+PointChunks = Iterable[Tuple[np.ndarray, np.ndarray]]
+BlockLoader = Callable[[np.ndarray], Tuple[np.ndarray, np.ndarray]]
+
+
+class TrajectoryPyramid(NamedTuple):
+    """
+    Level-of-detail pyramid of a trajectory.
+
+    Attributes
+    ----------
+    nb_points : int
+        Number of points of the trajectory (number of digits + 1).
+    endpoints : ndarray of float
+        First and last points of the trajectory, of shape (2, 2).
+    anchors : ndarray of float
+        First point of each block of level 0, of shape (nb_blocks, 2), from which the points
+        of the block can be rebuilt with its digits only.
+    levels : list of ndarray of float32
+        Statistics of the blocks of each level, of shape (nb_blocks, 6): x_min, x_max, y_min,
+        y_max, x_mean, y_mean. Level ``l`` has blocks of ``LOD_BLOCK_SIZE * LOD_FACTOR**l`` points.
+    """
+    nb_points: int
+    endpoints: np.ndarray
+    anchors: np.ndarray
+    levels: List[np.ndarray]
+
+
+def get_block_size(level: int) -> int:
+    """
+    Get the number of points per block of a given level.
+
+    Parameters
+    ----------
+    level : int
+        Level of the pyramid, 0 being the finest.
+
+    Returns
+    -------
+    block_size : int
+        ``LOD_BLOCK_SIZE * LOD_FACTOR**level``.
+    """
+    return LOD_BLOCK_SIZE * LOD_FACTOR**level
+
+
+def compute_block_stats(xs: np.ndarray, ys: np.ndarray, block_size: int) -> np.ndarray:
+    """
+    Compute the envelope and the sums of the coordinates of consecutive blocks of points.
+
+    Parameters
+    ----------
+    xs : ndarray of float
+        x-coordinates of the points.
+    ys : ndarray of float
+        y-coordinates of the points.
+    block_size : int
+        Number of points per block, the last block holding the remaining points.
+
+    Returns
+    -------
+    stats : ndarray of float
+        Array of shape (nb_blocks, 6): x_min, x_max, y_min, y_max, x_sum, y_sum.
+    """
+    nb_blocks = -(-len(xs) // block_size)
+    starts = np.arange(nb_blocks) * block_size
+    stats = np.empty((nb_blocks, 6))
+    for coords, column in ((xs, X_MIN), (ys, Y_MIN)):
+        stats[:, column] = np.minimum.reduceat(coords, starts)
+        stats[:, column+1] = np.maximum.reduceat(coords, starts)
+        stats[:, column//2 + X_MEAN] = np.add.reduceat(coords, starts, dtype=np.float64)
+
+    return stats
+
+
+def merge_block_stats(stats: np.ndarray, factor: int = LOD_FACTOR) -> np.ndarray:
+    """
+    Merge the statistics of groups of ``factor`` consecutive blocks.
+
+    Parameters
+    ----------
+    stats : ndarray of float
+        Array of shape (nb_blocks, 6), see ``compute_block_stats``.
+    factor : int, optional
+        Number of blocks per group (default is ``LOD_FACTOR``).
+
+    Returns
+    -------
+    merged_stats : ndarray of float
+        Array of shape (ceil(nb_blocks/factor), 6).
+    """
+    starts = np.arange(0, len(stats), factor)
+    merged_stats = np.empty((len(starts), 6))
+    merged_stats[:, [X_MIN, Y_MIN]] = np.minimum.reduceat(stats[:, [X_MIN, Y_MIN]], starts, axis=0)
+    merged_stats[:, [X_MAX, Y_MAX]] = np.maximum.reduceat(stats[:, [X_MAX, Y_MAX]], starts, axis=0)
+    merged_stats[:, [X_MEAN, Y_MEAN]] = np.add.reduceat(stats[:, [X_MEAN, Y_MEAN]], starts, axis=0)
+
+    return merged_stats
+
+
+def build_pyramid(point_chunks: PointChunks) -> TrajectoryPyramid:
+    """
+    Build the level-of-detail pyramid of a trajectory given by chunks of points, in a single pass.
+
+    Only the statistics of level 0 are accumulated while reading the points; the next levels
+    are merged from them.
+
+    Parameters
+    ----------
+    point_chunks : iterable of tuple of ndarray
+        Consecutive (xs, ys) chunks of the trajectory, e.g. from ``utils.plot.iter_points``.
+
+    Returns
+    -------
+    pyramid : TrajectoryPyramid
+        Pyramid of the trajectory.
+
+    Raises
+    ------
+    ValueError
+        If the trajectory is empty.
+    """
+    level_0_stats, anchors = [], []
+
+    def add_blocks(xs: np.ndarray, ys: np.ndarray) -> None:
+        level_0_stats.append(compute_block_stats(xs, ys, LOD_BLOCK_SIZE))
+        anchors.append(np.stack((xs[::LOD_BLOCK_SIZE], ys[::LOD_BLOCK_SIZE]), axis=1))
+
+    carry_xs, carry_ys = np.empty(0), np.empty(0)
+    first_point, last_point = None, None
+    nb_points = 0
+    for xs, ys in point_chunks:
+        if not len(xs):
+            continue
+        nb_points += len(xs)
+        if first_point is None:
+            first_point = (xs[0], ys[0])
+        last_point = (xs[-1], ys[-1])
+        if carry_xs.size:
+            # complete the pending block only, instead of copying the whole chunk after it
+            nb_missing_points = LOD_BLOCK_SIZE - len(carry_xs)
+            carry_xs = np.concatenate((carry_xs, xs[:nb_missing_points]))
+            carry_ys = np.concatenate((carry_ys, ys[:nb_missing_points]))
+            xs, ys = xs[nb_missing_points:], ys[nb_missing_points:]
+            if len(carry_xs) < LOD_BLOCK_SIZE:
+                continue
+            add_blocks(carry_xs, carry_ys)
+        nb_full_blocks_points = len(xs) - len(xs) % LOD_BLOCK_SIZE
+        if nb_full_blocks_points:
+            add_blocks(xs[:nb_full_blocks_points], ys[:nb_full_blocks_points])
+        carry_xs, carry_ys = xs[nb_full_blocks_points:], ys[nb_full_blocks_points:]
+    if carry_xs.size:
+        add_blocks(carry_xs, carry_ys)
+    if first_point is None:
+        raise ValueError("Cannot build the pyramid of an empty trajectory")
+
+    stats = np.concatenate(level_0_stats)
+    levels = []
+    level = 0
+    while True:
+        # sums into means, the last block being possibly partial
+        counts = np.full(len(stats), get_block_size(level), dtype=np.float64)
+        counts[-1] = nb_points - (len(stats) - 1)*get_block_size(level)
+        block = stats.astype(np.float32)
+        block[:, X_MEAN] = stats[:, X_MEAN] / counts
+        block[:, Y_MEAN] = stats[:, Y_MEAN] / counts
+        levels.append(block)
+        if len(stats) == 1:
+            break
+        stats = merge_block_stats(stats)
+        level += 1
+
+    return TrajectoryPyramid(nb_points, np.array([first_point, last_point], dtype=np.float64),
+                             np.concatenate(anchors).astype(np.float64), levels)
+
+
+def get_pyramid_bounds(pyramid: TrajectoryPyramid) -> Tuple[float, float, float, float]:
+    """
+    Get the bounding box of the trajectory of a pyramid.
+
+    Parameters
+    ----------
+    pyramid : TrajectoryPyramid
+        Pyramid of the trajectory.
+
+    Returns
+    -------
+    bounds : tuple of float
+        (x_min, x_max, y_min, y_max) of the trajectory.
+    """
+    top = pyramid.levels[-1][0]
+
+    return (float(top[X_MIN]), float(top[X_MAX]), float(top[Y_MIN]), float(top[Y_MAX]))
+
+
+def get_block_point_indices(pyramid: TrajectoryPyramid, blocks: np.ndarray) -> np.ndarray:
+    """
+    Get the indices of the points of some blocks of level 0.
+
+    Parameters
+    ----------
+    pyramid : TrajectoryPyramid
+        Pyramid of the trajectory.
+    blocks : ndarray of int
+        Sorted indices of blocks of level 0.
+
+    Returns
+    -------
+    point_indices : ndarray of int
+        Sorted indices of all the points of the blocks.
+    """
+    point_indices = (blocks[:, None]*LOD_BLOCK_SIZE + np.arange(LOD_BLOCK_SIZE)).ravel()
+
+    return point_indices[point_indices < pyramid.nb_points]
+
+
+def cut_pyramid(pyramid: TrajectoryPyramid, scale: float, tolerance: float = LOD_PIXEL_TOLERANCE,
+                box: Optional[Tuple[float, float, float, float]] = None,
+                index_range: Optional[Tuple[int, int]] = None
+                ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Select the coarsest visible blocks that fit within a given number of pixels.
+
+    Starting from the top of the pyramid, the blocks larger than ``tolerance`` pixels are split
+    into their children, level by level, so that straight parts of the path are refined further
+    than tangled ones. The envelopes of the blocks make the pyramid a spatial index as well:
+    the blocks out of the region of interest are dropped with all their children, so that
+    the cost of the cut depends on the visible part of the path only.
+
+    Parameters
+    ----------
+    pyramid : TrajectoryPyramid
+        Pyramid of the trajectory.
+    scale : float
+        Number of pixels per unit step.
+    tolerance : float, optional
+        Largest size of a block, in pixels (default is ``LOD_PIXEL_TOLERANCE``).
+    box : tuple of float, optional
+        (x_min, x_max, y_min, y_max) of the region of interest. The blocks whose envelope
+        does not intersect it are dropped.
+    index_range : tuple of int, optional
+        (start, stop) indices of the points of interest. The blocks out of the range are dropped,
+        and the blocks partly in it are split.
+
+    Returns
+    -------
+    stats : ndarray of float32
+        Statistics of the selected blocks, of shape (nb_blocks, 6), sorted along the path.
+    firsts : ndarray of int
+        Index of the first point of each selected block.
+    lasts : ndarray of int
+        Index of the last point of each selected block.
+    blocks : ndarray of int
+        Sorted indices of the visible blocks of level 0 that are still too large, or partly
+        in the index range, and whose points must be drawn instead.
+    """
+    selected_stats, selected_firsts, selected_lasts = [], [], []
+    blocks = np.zeros(1, dtype=np.int64)
+    for level in range(len(pyramid.levels) - 1, -1, -1):
+        stats = pyramid.levels[level][blocks]
+        firsts = blocks * get_block_size(level)
+        lasts = np.minimum(firsts + get_block_size(level), pyramid.nb_points) - 1
+        is_visible = np.ones(len(blocks), dtype=bool)
+        if box is not None:
+            x_min, x_max, y_min, y_max = box
+            is_visible &= ((stats[:, X_MIN] <= x_max) & (stats[:, X_MAX] >= x_min)
+                           & (stats[:, Y_MIN] <= y_max) & (stats[:, Y_MAX] >= y_min))
+        is_fitting = np.maximum(stats[:, X_MAX] - stats[:, X_MIN], stats[:, Y_MAX] - stats[:, Y_MIN])*scale <= tolerance
+        if index_range is not None:
+            start, stop = index_range
+            is_visible &= (firsts < stop) & (lasts >= start)
+            # the mean of a block partly out of the range would be off the path of interest
+            is_fitting &= (firsts >= start) & (lasts < stop)
+        is_fitting &= is_visible
+        selected_stats.append(stats[is_fitting])
+        selected_firsts.append(firsts[is_fitting])
+        selected_lasts.append(lasts[is_fitting])
+        blocks = blocks[is_visible & ~is_fitting]
+        if level:
+            children = (blocks[:, None]*LOD_FACTOR + np.arange(LOD_FACTOR)).ravel()
+            blocks = children[children < len(pyramid.levels[level-1])]
+
+    firsts = np.concatenate(selected_firsts)
+    order = np.argsort(firsts, kind="stable")
+
+    return (np.concatenate(selected_stats)[order], firsts[order], np.concatenate(selected_lasts)[order], blocks)
+
+
+def select_blocks(pyramid: TrajectoryPyramid, scale: float, tolerance: float = LOD_PIXEL_TOLERANCE,
+                  point_chunks: Optional[PointChunks] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Select one point per block of the whole trajectory, see ``cut_pyramid``.
+
+    The blocks of level 0 that are still too large are replaced by their points if these are given,
+    and kept as single points otherwise. Since a random walk of ``n`` steps spans about ``sqrt(n)``
+    steps, the number of selected points depends on the image size, not on the length of the path.
+
+    Parameters
+    ----------
+    pyramid : TrajectoryPyramid
+        Pyramid of the trajectory.
+    scale : float
+        Number of pixels per unit step.
+    tolerance : float, optional
+        Largest size of a block, in pixels (default is ``LOD_PIXEL_TOLERANCE``).
+    point_chunks : iterable of tuple of ndarray, optional
+        Consecutive (xs, ys) chunks of the trajectory, only read if some blocks of level 0
+        are too large.
+
+    Returns
+    -------
+    xs : ndarray of float
+        x-coordinates of the means of the selected blocks (or of the points), in path order.
+    ys : ndarray of float
+        y-coordinates of the selected points.
+    indices : ndarray of int
+        Index of the last point of each selected block, that sets its color.
+    """
+    stats, _, lasts, blocks = cut_pyramid(pyramid, scale, tolerance)
+    selected_xs, selected_ys, selected_indices = [stats[:, X_MEAN]], [stats[:, Y_MEAN]], [lasts]
+    if blocks.size and point_chunks is None:
+        stats = pyramid.levels[0][blocks]
+        selected_xs.append(stats[:, X_MEAN])
+        selected_ys.append(stats[:, Y_MEAN])
+        selected_indices.append(np.minimum((blocks + 1)*LOD_BLOCK_SIZE, pyramid.nb_points) - 1)
+    elif blocks.size:
+        point_indices = get_block_point_indices(pyramid, blocks)
+        first_index = 0
+        for xs, ys in point_chunks:
+            # points of the chunk among the points to select
+            start, stop = np.searchsorted(point_indices, (first_index, first_index + len(xs)))
+            selected_xs.append(xs[point_indices[start:stop] - first_index])
+            selected_ys.append(ys[point_indices[start:stop] - first_index])
+            selected_indices.append(point_indices[start:stop])
+            first_index += len(xs)
+
+    indices = np.concatenate(selected_indices)
+    order = np.argsort(indices, kind="stable")
+
+    return (np.concatenate(selected_xs)[order], np.concatenate(selected_ys)[order], indices[order])
+
+
+def select_window(pyramid: TrajectoryPyramid, scale: float, load_points: BlockLoader,
+                  tolerance: float = LOD_PIXEL_TOLERANCE, box: Optional[Tuple[float, float, float, float]] = None,
+                  index_range: Optional[Tuple[int, int]] = None
+                  ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Select one point per visible block of a region of interest, see ``cut_pyramid``.
+
+    Only the points of the visible blocks of level 0 that are still too large are loaded.
+
+    Parameters
+    ----------
+    pyramid : TrajectoryPyramid
+        Pyramid of the trajectory.
+    scale : float
+        Number of pixels per unit step.
+    load_points : callable
+        Function returning the (xs, ys) coordinates of all the points of some blocks of level 0,
+        in the order of ``get_block_point_indices``.
+    tolerance : float, optional
+        Largest size of a block, in pixels (default is ``LOD_PIXEL_TOLERANCE``).
+    box : tuple of float, optional
+        (x_min, x_max, y_min, y_max) of the region of interest.
+    index_range : tuple of int, optional
+        (start, stop) indices of the points of interest.
+
+    Returns
+    -------
+    xs : ndarray of float
+        x-coordinates of the selected points, in path order.
+    ys : ndarray of float
+        y-coordinates of the selected points.
+    indices : ndarray of int
+        Index of the last point of each selected block, that sets its color.
+    is_joined : ndarray of bool
+        For each pair of consecutive selected points, ``True`` if no part of the path was dropped
+        between them, so that they can be joined by a line.
+    """
+    stats, firsts, lasts, blocks = cut_pyramid(pyramid, scale, tolerance, box, index_range)
+    selected_xs, selected_ys = [stats[:, X_MEAN]], [stats[:, Y_MEAN]]
+    selected_firsts, selected_lasts = [firsts], [lasts]
+    if blocks.size:
+        point_indices = get_block_point_indices(pyramid, blocks)
+        xs, ys = load_points(blocks)
+        if index_range is not None:
+            is_in_range = (point_indices >= index_range[0]) & (point_indices < index_range[1])
+            point_indices, xs, ys = point_indices[is_in_range], xs[is_in_range], ys[is_in_range]
+        selected_xs.append(xs)
+        selected_ys.append(ys)
+        selected_firsts.append(point_indices)
+        selected_lasts.append(point_indices)
+
+    firsts = np.concatenate(selected_firsts)
+    order = np.argsort(firsts, kind="stable")
+    firsts, lasts = firsts[order], np.concatenate(selected_lasts)[order]
+
+    return (np.concatenate(selected_xs)[order], np.concatenate(selected_ys)[order], lasts,
+            firsts[1:] == lasts[:-1] + 1)
+
+
+def get_window_bounds(pyramid: TrajectoryPyramid, load_points: BlockLoader,
+                      index_range: Optional[Tuple[int, int]] = None) -> Tuple[float, float, float, float]:
+    """
+    Compute the bounding box of the points of a given index range.
+
+    Parameters
+    ----------
+    pyramid : TrajectoryPyramid
+        Pyramid of the trajectory.
+    load_points : callable
+        Function returning the coordinates of the points of some blocks of level 0, see ``select_window``.
+    index_range : tuple of int, optional
+        (start, stop) indices of the points of interest. If ``None`` (default), the whole trajectory.
+
+    Returns
+    -------
+    bounds : tuple of float
+        (x_min, x_max, y_min, y_max) of the points.
+    """
+    if index_range is None:
+        return get_pyramid_bounds(pyramid)
+
+    # every block fits at scale 0: only the blocks at the ends of the range are split
+    stats, _, _, blocks = cut_pyramid(pyramid, 0., index_range=index_range)
+    xs_min, xs_max, ys_min, ys_max = [stats[:, X_MIN]], [stats[:, X_MAX]], [stats[:, Y_MIN]], [stats[:, Y_MAX]]
+    if blocks.size:
+        point_indices = get_block_point_indices(pyramid, blocks)
+        xs, ys = load_points(blocks)
+        is_in_range = (point_indices >= index_range[0]) & (point_indices < index_range[1])
+        for coords, coords_list in ((xs, xs_min), (xs, xs_max), (ys, ys_min), (ys, ys_max)):
+            coords_list.append(coords[is_in_range])
+
+    return (float(np.concatenate(xs_min).min()), float(np.concatenate(xs_max).max()),
+            float(np.concatenate(ys_min).min()), float(np.concatenate(ys_max).max()))
+
+
+def save_pyramid(path: str, pyramid: TrajectoryPyramid) -> None:
+    """
+    Save a pyramid as an uncompressed NumPy archive.
+
+    Parameters
+    ----------
+    path : str
+        Path of the archive, ending with ``LOD_EXTENSION``.
+    pyramid : TrajectoryPyramid
+        Pyramid of the trajectory.
+    """
+    levels = {f"level_{level:02d}": stats for level, stats in enumerate(pyramid.levels)}
+    with open(path, mode="wb") as f:
+        np.savez(f, nb_points=pyramid.nb_points, endpoints=pyramid.endpoints, anchors=pyramid.anchors, **levels)
+
+
+def load_pyramid(path: str) -> TrajectoryPyramid:
+    """
+    Load a pyramid saved by ``save_pyramid``.
+
+    Parameters
+    ----------
+    path : str
+        Path of the archive.
+
+    Returns
+    -------
+    pyramid : TrajectoryPyramid
+        Pyramid of the trajectory.
+    """
+    with np.load(path) as archive:
+        nb_levels = sum(name.startswith("level_") for name in archive.files)
+        levels = [archive[f"level_{level:02d}"] for level in range(nb_levels)]
+        return TrajectoryPyramid(int(archive["nb_points"]), archive["endpoints"], archive["anchors"], levels)
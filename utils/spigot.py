@@ -0,0 +1,329 @@
+"""
+Digit generators that emit a sequence chunk by chunk, from any starting position.
+
+For pi in bases 2, 4, 8 and 16, the digits of a window are extracted with the BBP formula:
+only the residues ``16**(d-k) mod (8k+j)`` are needed, so no full-precision value of pi is ever
+built, and a window deep into the expansion costs no more memory than the window itself.
+The residues are summed exactly by blocks, as fractions reduced pairwise with big integers,
+and the series beyond position ``d`` by binary splitting (see ``utils.constants.bsplit``).
+Other constants and bases have no such formula: their digits are computed at full precision
+by ``utils.digits.get_digits_in_base`` instead.
+
+Constants
+---------
+BBP_BASES : tuple of int
+    Bases whose digits of pi are extracted with the BBP formula.
+BBP_BLOCK_SIZE : int
+    Largest number of terms of the BBP series summed at once.
+FIRST_CHUNK_SIZE : int
+    Number of digits of the first chunk of a window starting near the beginning of the expansion.
+"""
+
+from typing import Any, Iterator, Tuple
+
+import numpy as np
+from mpmath.libmp import MPZ
+
+from utils.constants import bsplit
+from utils.digits import DIGIT_CHUNK_SIZE, int_to_digits
+from utils.expression import normalize_expr
+
+BBP_BASES        = (2, 4, 8, 16)
+BBP_BLOCK_SIZE   = 1 << 18
+FIRST_CHUNK_SIZE = 1 << 10
+
+
+def mulmod(a: np.ndarray, b: np.ndarray, moduli: np.ndarray) -> np.ndarray:
+    """
+    Compute ``a * b mod moduli`` element-wise, without overflowing 64 bits.
+
+    Parameters
+    ----------
+    a, b : ndarray of uint64
+        Factors, lower than ``moduli``.
+    moduli : ndarray of uint64
+        Moduli, lower than ``2**47``.
+
+    Returns
+    -------
+    products : ndarray of uint64
+        Products, lower than ``moduli``.
+
+    Raises
+    ------
+    ValueError
+        If a modulus is too large.
+    """
+    max_modulus = int(moduli.max(initial=1))
+    if max_modulus <= 2**32:
+        return a * b % moduli
+    if max_modulus > 2**47:
+        raise ValueError(f"Modulus too large for the BBP formula: {max_modulus}")
+
+    # Horner scheme on the 16-bit limbs of b: every intermediate value stays below 2**64
+    products = np.zeros_like(a)
+    for shift in range(32, -1, -16):
+        products = ((products << np.uint64(16)) + a * ((b >> np.uint64(shift)) & np.uint64(0xFFFF))) % moduli
+
+    return products
+
+
+def powmod_16(exponents: np.ndarray, moduli: np.ndarray) -> np.ndarray:
+    """
+    Compute ``16**exponents mod moduli`` element-wise, by square-and-multiply.
+
+    Parameters
+    ----------
+    exponents : ndarray of uint64
+        Exponents.
+    moduli : ndarray of uint64
+        Moduli, see ``mulmod``.
+
+    Returns
+    -------
+    residues : ndarray of uint64
+        Residues, lower than ``moduli``.
+    """
+    residues = np.ones_like(moduli) % moduli
+    powers = np.uint64(16) % moduli
+    exponents = exponents.copy()
+    while exponents.any():
+        odd = (exponents & np.uint64(1)).astype(bool)
+        residues[odd] = mulmod(residues[odd], powers[odd], moduli[odd])
+        powers = mulmod(powers, powers, moduli)
+        exponents >>= np.uint64(1)
+
+    return residues
+
+
+def sum_fractions(numerators: np.ndarray, denominators: np.ndarray) -> Tuple[int, int]:
+    """
+    Sum fractions exactly, by reducing them pairwise.
+
+    Parameters
+    ----------
+    numerators : ndarray of uint64
+        Numerators of the fractions.
+    denominators : ndarray of uint64
+        Positive denominators of the fractions, greater than the numerators.
+
+    Returns
+    -------
+    N, D : int
+        Numerator and denominator of the sum, ``D`` being the product of the denominators.
+    """
+    if len(numerators) % 2:
+        numerators, denominators = np.append(numerators, np.uint64(0)), np.append(denominators, np.uint64(1))
+    a, b, c, d = numerators[0::2], denominators[0::2], numerators[1::2], denominators[1::2]
+    if int(denominators.max(initial=1)) < 2**28:
+        # first level with NumPy, the products staying below 2**57
+        nums, dens = list(map(MPZ, (a*d + c*b).tolist())), list(map(MPZ, (b*d).tolist()))
+    else:
+        a, b, c, d = (list(map(MPZ, x.tolist())) for x in (a, b, c, d))
+        nums, dens = [x*w + z*y for x, y, z, w in zip(a, b, c, d)], [y*w for y, w in zip(b, d)]
+
+    while len(nums) > 1:
+        if len(nums) % 2:
+            nums.append(MPZ(0))
+            dens.append(MPZ(1))
+        nums = [nums[i]*dens[i + 1] + nums[i + 1]*dens[i] for i in range(0, len(nums), 2)]
+        dens = [dens[i]*dens[i + 1] for i in range(0, len(dens), 2)]
+
+    return (nums[0], dens[0])
+
+
+def get_block_size(bits: int) -> int:
+    """
+    Get the number of terms of the BBP series summed at once, their product of denominators being
+    about as large as the result, so that the final division of each block stays cheap.
+
+    Parameters
+    ----------
+    bits : int
+        Precision of the result, in bits.
+
+    Returns
+    -------
+    block_size : int
+        Number of terms, at most ``BBP_BLOCK_SIZE``.
+    """
+    return min(BBP_BLOCK_SIZE, max(FIRST_CHUNK_SIZE, bits // 16))
+
+
+def bbp_head(j: int, position: int, bits: int, block_size: int) -> int:
+    """
+    Compute ``sum_{k <= position} (16**(position-k) mod (8k+j)) / (8k+j)`` as a fixed-point integer.
+
+    The terms are summed exactly by blocks, each block being divided once at the end.
+
+    Parameters
+    ----------
+    j : int
+        Offset of the denominators (1, 4, 5 or 6 in the BBP formula).
+    position : int
+        Power of 16 by which the series is shifted.
+    bits : int
+        Precision of the result, in bits.
+    block_size : int
+        Number of terms summed at once, see ``get_block_size``.
+
+    Returns
+    -------
+    total : int
+        Sum, times ``2**bits``, its integer part not being removed. Each block is truncated
+        by less than one unit.
+    """
+    total = MPZ(0)
+    for block_start in range(0, position + 1, block_size):
+        ks = np.arange(block_start, min(position + 1, block_start + block_size), dtype=np.uint64)
+        moduli = np.uint64(8)*ks + np.uint64(j)
+        numerator, denominator = sum_fractions(powmod_16(np.uint64(position) - ks, moduli), moduli)
+        total += (numerator << bits) // denominator
+
+    return total
+
+
+def bbp_tail(j: int, position: int, bits: int) -> int:
+    """
+    Compute ``sum_{k > position} 16**(position-k) / (8k+j)`` as a fixed-point integer, by binary splitting.
+
+    Parameters
+    ----------
+    j : int
+        Offset of the denominators (1, 4, 5 or 6 in the BBP formula).
+    position : int
+        Power of 16 by which the series is shifted.
+    bits : int
+        Precision of the result, in bits.
+
+    Returns
+    -------
+    tail : int
+        Sum, times ``2**bits``, less than 2 units too small.
+    """
+    # the i-th term is 1 / (16**(i+1) * (8*(position+1+i) + j)): the ratio of two terms is rational
+    def modulus(i: int) -> int:
+        return 8*(position + 1 + i) + j
+
+    nb_terms = bits // 4 + 1
+    _, Q, T = bsplit(lambda i: modulus(i - 1), lambda i: 16*modulus(i), lambda i: 1, 0, nb_terms)
+
+    return (MPZ(T) << bits) // (16 * modulus(0) * Q)
+
+
+def bbp_pi_window(position: int, nb_hex: int) -> int:
+    """
+    Extract ``nb_hex`` hexadecimal digits of pi with the BBP formula.
+
+    Parameters
+    ----------
+    position : int
+        Index of the first digit to extract (0 being the first hexadecimal place).
+    nb_hex : int
+        Number of digits to extract.
+
+    Returns
+    -------
+    window : int
+        Integer whose ``nb_hex`` hexadecimal digits are the digits of the window.
+    """
+    # every block and tail is off by less than 2 units, and the 4 series are weighted by 4, 2, 1 and 1:
+    # guard bits absorb these errors, and make a carry through them unlikely
+    block_size = get_block_size(4*nb_hex)
+    bits = 4*nb_hex + (8*(position // block_size + 3)).bit_length() + 32
+    window = 0
+    for j, weight in ((1, 4), (4, -2), (5, -1), (6, -1)):
+        window += weight * (bbp_head(j, position, bits, block_size) + bbp_tail(j, position, bits))
+    window %= (1 << bits)
+
+    return int(window >> (bits - 4*nb_hex))
+
+
+def get_pi_digits_bbp(base: int, start: int, stop: int) -> np.ndarray:
+    """
+    Extract the digits of pi in a power-of-2 base, from position ``start`` to position ``stop``.
+
+    Parameters
+    ----------
+    base : int
+        Radix base, in ``BBP_BASES``.
+    start : int
+        Index of the first digit to extract (0 being the first decimal place).
+    stop : int
+        Index after the last digit to extract.
+
+    Returns
+    -------
+    digits : ndarray of int
+        Array of the ``stop - start`` digits of the window.
+    """
+    bits_per_digit = base.bit_length() - 1
+    bit_start, bit_stop = bits_per_digit*start, bits_per_digit*stop
+    hex_start, hex_stop = bit_start // 4, -(-bit_stop // 4)
+    window = bbp_pi_window(hex_start, hex_stop - hex_start)
+    window = (window >> (4*hex_stop - bit_stop)) & ((1 << (bit_stop - bit_start)) - 1)
+
+    return int_to_digits(window, base, stop - start)
+
+
+def has_spigot(expr: str, base: int) -> bool:
+    """
+    Check whether the digits of an expression in a given base can be generated by ``iter_spigot_digits``.
+
+    Parameters
+    ----------
+    expr : str
+        String expression representing a number.
+    base : int
+        Radix base.
+
+    Returns
+    -------
+    bool
+        ``True`` if the expression is pi and the base is in ``BBP_BASES``.
+    """
+    return normalize_expr(expr) == "pi" and base in BBP_BASES
+
+
+def iter_spigot_digits(expr: str, base: int, start: int, stop: int,
+                       chunk_size: int = DIGIT_CHUNK_SIZE, dtype: Any = int) -> Iterator[np.ndarray]:
+    """
+    Yield the digits of pi from position ``start`` to position ``stop``, chunk by chunk.
+
+    Every chunk sums the whole series up to its position again, which costs about as much as
+    extracting any window shorter than this position. So the first chunk only holds
+    ``FIRST_CHUNK_SIZE`` digits, to be produced right away, if the window is longer than its start.
+
+    Parameters
+    ----------
+    expr : str
+        String expression representing a number, see ``has_spigot``.
+    base : int
+        Radix base, see ``has_spigot``.
+    start : int
+        Index of the first digit to yield (0 being the first decimal place).
+    stop : int
+        Index after the last digit to yield.
+    chunk_size : int, optional
+        Number of digits of the chunks (default is ``DIGIT_CHUNK_SIZE``).
+    dtype : data-type, optional
+        Type of the yielded digits (default is ``int``).
+
+    Yields
+    ------
+    digits : ndarray of int
+        Next chunk of digits.
+
+    Raises
+    ------
+    ValueError
+        If no spigot is available for the expression in this base.
+    """
+    if not has_spigot(expr, base):
+        raise ValueError(f"No spigot for {expr} in base {base}, only for pi in bases {', '.join(map(str, BBP_BASES))}")
+
+    position, size = start, (min(FIRST_CHUNK_SIZE, chunk_size) if stop - start > start else chunk_size)
+    while position < stop:
+        chunk_stop = min(stop, position + size)
+        yield get_pi_digits_bbp(base, position, chunk_stop).astype(dtype)
+        position, size = chunk_stop, chunk_size
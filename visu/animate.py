@@ -0,0 +1,287 @@
+"""
+Incremental animation of the growth of a digit trajectory.
+
+The frames are rasterized like ``visu.raster`` images, but on persistent layers: each frame only
+bins its new points and draws its new segments, then recolors the region of the image they cover.
+Rendering all the frames thus costs about one rasterization of the whole trajectory, plus the
+copy of one image per frame. The frames are streamed one by one to ``ffmpeg`` (MP4 video) or to
+numbered PNG files, so that memory does not depend on the number of frames nor of digits.
+
+The viewport is either fixed, fitted to the whole trajectory, or growing: it starts around the
+origin, and zooms out by a factor ``VIEWPORT_GROWTH`` whenever the path leaves it. Each zoom redraws
+the path drawn so far; since the zooms are geometric, they cost about as much as the frames themselves.
+
+Constants
+---------
+ANIMATION_FPS : int
+    Default frame rate, in frames per second.
+ANIMATION_DURATION : float
+    Default duration of an animation, in seconds, from which the number of digits per frame is derived.
+VIEWPORT_MIN_EXTENT : float
+    Extent of the initial growing viewport, in steps.
+VIEWPORT_GROWTH : float
+    Zoom-out factor of the growing viewport.
+"""
+
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional, Tuple
+import os
+import shutil
+import subprocess
+
+import numpy as np
+import matplotlib.image
+
+from core.compute_digits import get_points_from_digits, iter_points_from_digits
+from utils.digits import DIGIT_CHUNK_SIZE
+from utils.expression import build_basename
+from utils.profiling import profile_stage
+from visu.raster import (RASTER_SIZE, POINT_SIZE, add_raster_inset, colorize_index_grid, colorize_layers, compute_bounds,
+                         draw_marker, get_raster_transform, rasterize_points, rasterize_segments, render_background,
+                         to_pixels)
+
+ANIMATION_FPS       = 30
+ANIMATION_DURATION  = 10.
+VIEWPORT_MIN_EXTENT = 16.
+VIEWPORT_GROWTH     = 2.
+
+Bounds = Tuple[float, float, float, float]
+
+
+def get_digits_per_frame(nb_digits: int, fps: int = ANIMATION_FPS, duration: float = ANIMATION_DURATION) -> int:
+    """
+    Compute the number of digits drawn per frame, for an animation of a given duration.
+
+    Parameters
+    ----------
+    nb_digits : int
+        Number of digits in the sequence.
+    fps : int, optional
+        Frame rate, in frames per second (default is ``ANIMATION_FPS``).
+    duration : float, optional
+        Duration of the animation, in seconds (default is ``ANIMATION_DURATION``).
+
+    Returns
+    -------
+    digits_per_frame : int
+        Number of digits per frame, at least 1.
+    """
+    return max(1, -(-nb_digits // max(1, int(fps * duration))))
+
+
+def grow_viewport(bounds: Bounds, xs: np.ndarray, ys: np.ndarray) -> Optional[Bounds]:
+    """
+    Zoom a viewport out, if some points leave it.
+
+    Parameters
+    ----------
+    bounds : tuple of float
+        (x_min, x_max, y_min, y_max) of the current viewport, a square.
+    xs : ndarray of float
+        x-coordinates of the new points.
+    ys : ndarray of float
+        y-coordinates of the new points.
+
+    Returns
+    -------
+    bounds : tuple of float or None
+        Square viewport containing the current one and the points, ``VIEWPORT_GROWTH`` times larger
+        at least, or ``None`` if all the points are in the current viewport.
+    """
+    x_min, x_max, y_min, y_max = bounds
+    new_x_min, new_x_max = min(x_min, xs.min()), max(x_max, xs.max())
+    new_y_min, new_y_max = min(y_min, ys.min()), max(y_max, ys.max())
+    if (new_x_min, new_x_max, new_y_min, new_y_max) == bounds:
+        return None
+
+    extent = max(new_x_max - new_x_min, new_y_max - new_y_min, VIEWPORT_GROWTH * (x_max - x_min))
+    x_center, y_center = (new_x_min + new_x_max)/2, (new_y_min + new_y_max)/2
+
+    return (x_center - extent/2, x_center + extent/2, y_center - extent/2, y_center + extent/2)
+
+
+def iter_animation_frames(digit_sequence: np.ndarray, base: int, digits_per_frame: int,
+                          size: int = RASTER_SIZE, bool_growing: bool = False,
+                          legend_position: Optional[str] = "upper right") -> Iterator[np.ndarray]:
+    """
+    Yield the frames of the growth of a trajectory, each one adding ``digits_per_frame`` digits.
+
+    Parameters
+    ----------
+    digit_sequence : ndarray of int
+        Array of digits in the given base.
+    base : int
+        Radix base (number of possible directions).
+    digits_per_frame : int
+        Number of digits added by each frame.
+    size : int, optional
+        Width and height of the frames, in pixels (default is ``RASTER_SIZE``).
+    bool_growing : bool, optional
+        If ``True``, the viewport grows with the path. Otherwise (default), it is fitted to the whole trajectory.
+    legend_position : str, optional
+        Position of the compass inset (default is ``upper right``), ``None`` to omit it.
+
+    Yields
+    ------
+    rgba : ndarray of uint8
+        Next frame, of shape (size, size, 4). It is overwritten by the next one, copy it to keep it.
+    """
+    nb_digits = len(digit_sequence)
+    if bool_growing:
+        bounds = (-VIEWPORT_MIN_EXTENT/2, VIEWPORT_MIN_EXTENT/2, -VIEWPORT_MIN_EXTENT/2, VIEWPORT_MIN_EXTENT/2)
+    else:
+        bounds = compute_bounds(iter_points_from_digits(digit_sequence, base))
+    # persistent layers, and the frame they compose without markers nor compass
+    transform = get_raster_transform(bounds, size)
+    index_grid = np.full((size, size), -1, dtype=np.int64)
+    line_grid = np.zeros((size, size), dtype=bool)
+    background = render_background(transform, size)
+    canvas = background.copy()
+    frame = np.empty_like(canvas)
+    start_color = colorize_index_grid(np.zeros((1, 1), dtype=np.int64), nb_digits)[0, 0]
+
+    def add_points(xs: np.ndarray, ys: np.ndarray, first_index: int) -> None:
+        # xs[0], ys[0] is the last point already drawn, or the origin
+        rasterize_points(index_grid, xs, ys, first_index, transform)
+        rasterize_segments(line_grid, xs, ys, transform)
+        rows, cols = to_pixels(xs, ys, transform, size)
+        row_min, row_max = max(0, rows.min() - POINT_SIZE), min(size, rows.max() + POINT_SIZE + 1)
+        col_min, col_max = max(0, cols.min() - POINT_SIZE), min(size, cols.max() + POINT_SIZE + 1)
+        region = (slice(row_min, row_max), slice(col_min, col_max))
+        canvas[region] = colorize_layers(index_grid[region], line_grid[region], background[region], nb_digits)
+
+    last_point = (0., 0.)
+    for frame_start in range(0, nb_digits, digits_per_frame):
+        frame_stop = min(nb_digits, frame_start + digits_per_frame)
+        xs, ys = get_points_from_digits(digit_sequence[frame_start:frame_stop], base, start=last_point)
+        new_bounds = grow_viewport(bounds, xs, ys) if bool_growing else None
+        if new_bounds is not None:
+            # zoom out, and redraw the path so far on new layers
+            bounds = new_bounds
+            transform = get_raster_transform(bounds, size)
+            index_grid.fill(-1)
+            line_grid.fill(False)
+            background = render_background(transform, size)
+            canvas[...] = background
+            chunk_last_point = (0., 0.)
+            for chunk_start in range(0, frame_start, DIGIT_CHUNK_SIZE):
+                chunk_stop = min(frame_start, chunk_start + DIGIT_CHUNK_SIZE)
+                chunk_xs, chunk_ys = get_points_from_digits(digit_sequence[chunk_start:chunk_stop], base,
+                                                            start=chunk_last_point)
+                add_points(chunk_xs, chunk_ys, chunk_start)
+                chunk_last_point = (chunk_xs[-1], chunk_ys[-1])
+        add_points(xs, ys, frame_start)
+        last_point = (xs[-1], ys[-1])
+
+        frame[...] = canvas
+        rows, cols = to_pixels(np.array([0., last_point[0]]), np.array([0., last_point[1]]), transform, size,
+                               bool_clip=False)
+        end_color = colorize_index_grid(np.array([[frame_stop]]), nb_digits)[0, 0]
+        draw_marker(frame, rows[0], cols[0], start_color)
+        draw_marker(frame, rows[1], cols[1], end_color)
+        if legend_position:
+            add_raster_inset(frame, base, legend_position)
+        yield frame
+
+
+@contextmanager
+def open_frame_writer(savepath: str, size: int, fps: int = ANIMATION_FPS) -> Iterator[Callable[[np.ndarray], None]]:
+    """
+    Open a stream of frames to a video file or to numbered PNG files.
+
+    Parameters
+    ----------
+    savepath : str
+        Path of the MP4 video, encoded by ``ffmpeg``, or of the folder of numbered PNG files
+        ``frame_000000.png``, ``frame_000001.png``... if it has no ``.mp4`` extension.
+    size : int
+        Width and height of the frames, in pixels.
+    fps : int, optional
+        Frame rate of the video, in frames per second (default is ``ANIMATION_FPS``).
+
+    Yields
+    ------
+    write_frame : callable
+        Function writing the next frame, of shape (size, size, 4).
+
+    Raises
+    ------
+    RuntimeError
+        If ``ffmpeg`` fails.
+    """
+    if not savepath.endswith(".mp4"):
+        os.makedirs(savepath, exist_ok=True)
+        # frames of a previous, longer animation would follow the new ones
+        for filename in os.listdir(savepath):
+            if filename.startswith("frame_") and filename.endswith(".png"):
+                os.remove(os.path.join(savepath, filename))
+        frame_index = 0
+
+        def write_png(rgba: np.ndarray) -> None:
+            nonlocal frame_index
+            matplotlib.image.imsave(os.path.join(savepath, f"frame_{frame_index:06d}.png"), rgba)
+            frame_index += 1
+
+        yield write_png
+        return
+
+    command = ["ffmpeg", "-y", "-loglevel", "error", "-f", "rawvideo", "-pix_fmt", "rgba", "-s", f"{size}x{size}",
+               "-r", str(fps), "-i", "-", "-c:v", "libx264", "-pix_fmt", "yuv420p", savepath]
+    with subprocess.Popen(command, stdin=subprocess.PIPE) as process:
+        try:
+            yield lambda rgba: process.stdin.write(rgba.tobytes())
+        finally:
+            process.stdin.close()
+    if process.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed with exit code {process.returncode}")
+
+
+def animate_sequence(digit_sequence: np.ndarray, number_params: Tuple[str, int, int], video_format: str = "png",
+                     fps: int = ANIMATION_FPS, digits_per_frame: Optional[int] = None, bool_growing: bool = False,
+                     size: int = RASTER_SIZE, legend_position: str = "upper right") -> str:
+    """
+    Animate the growth of the trajectory of a digit sequence, and save it.
+
+    Parameters
+    ----------
+    digit_sequence : ndarray of int
+        Array of digits in the given base.
+    number_params : tuple
+        (expr, base, nb_digits) for the sequence.
+    video_format : str, optional
+        ``"png"`` (default) for numbered PNG files in the folder ``out/<expr>_<base>_<digits>_frames``,
+        or ``"mp4"`` for the video ``out/<expr>_<base>_<digits>.mp4``, if ``ffmpeg`` is installed.
+    fps : int, optional
+        Frame rate of the video, in frames per second (default is ``ANIMATION_FPS``).
+    digits_per_frame : int, optional
+        Number of digits added by each frame. If ``None`` (default), the animation lasts
+        ``ANIMATION_DURATION`` seconds.
+    bool_growing : bool, optional
+        If ``True``, the viewport grows with the path (default is ``False``).
+    size : int, optional
+        Width and height of the frames, in pixels (default is ``RASTER_SIZE``).
+    legend_position : str, optional
+        Position of the compass inset (default is ``upper right``).
+
+    Returns
+    -------
+    savepath : str
+        Path of the video or of the folder of frames.
+    """
+    expr, base, nb_digits = number_params
+    digits_per_frame = digits_per_frame or get_digits_per_frame(nb_digits, fps)
+    if video_format == "mp4" and shutil.which("ffmpeg") is None:
+        print("/!\\ ffmpeg not found, required to encode videos. Frames saved as PNG files instead")
+        video_format = "png"
+    savepath = f"out/{build_basename(expr)}_{base:03d}_{nb_digits:06d}"
+    savepath += ".mp4" if video_format == "mp4" else "_frames"
+
+    nb_frames = 0
+    with profile_stage("animate", nb_digits), open_frame_writer(savepath, size, fps) as write_frame:
+        for frame in iter_animation_frames(digit_sequence, base, digits_per_frame, size, bool_growing,
+                                           legend_position):
+            write_frame(frame)
+            nb_frames += 1
+    print(f"  Animation saved: {savepath} ({nb_frames} frames of {digits_per_frame:,} digits)")
+
+    return savepath
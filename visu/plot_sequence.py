@@ -1,21 +1,57 @@
 # pylint: disable=too-many-locals
 
-"""Methods for plotting a digit trajectory."""
+"""
+Methods for plotting a digit trajectory.
 
-from typing import Tuple
+The static parts of a figure (axes lines, compass inset, marker and path artists) only depend on the
+base: they are built once per base and legend position, and reused by every image of this base,
+only the data of the artists and the title being swapped. The compass inset is a bitmap rendered once
+per base (see ``visu.raster.render_compass``), instead of three artists per spoke. Figures to show
+are built afresh, since their windows stay open.
+"""
+
+from functools import lru_cache
+from typing import List, NamedTuple, Optional, Tuple
 
 import numpy as np
-import matplotlib.pyplot as plt
-from mpl_toolkits.axes_grid1.inset_locator import inset_axes
 from matplotlib.axes import Axes
+from matplotlib.collections import PathCollection
+from matplotlib.figure import Figure
+from matplotlib.lines import Line2D
+from mpl_toolkits.axes_grid1.inset_locator import inset_axes
 
-from utils.plot import generate_path_params, build_latex_name
+from utils.plot import generate_path_colors, build_latex_name
 from utils.expression import build_basename
+from utils.profiling import profile_stage
+from utils.pyramid import TrajectoryPyramid, get_pyramid_bounds, select_blocks
+from visu.raster import render_compass
+
+# width and height of the axes of the figure, in pixels
+PLOT_SIZE = 480
+
+# largest size of the blocks of the pyramid joined by the gray line, in pixels
+LINE_TOLERANCE = 8.
+
+# largest number of points of a path drawn exactly, longer paths being drawn from their pyramid
+MAX_EXACT_POINTS = 10_000
+
+
+class FigureTemplate(NamedTuple):
+    """Figure of a base, with the artists whose data are swapped for each image."""
+    fig: Figure
+    ax: Axes
+    path: PathCollection
+    line: Line2D
+    markers: PathCollection
+
 
 def add_inset(ax: Axes, base: int, legend_position: str = "upper right") -> None:
     """
     Add a custom inset legend to the given axis, showing direction for each digit.
 
+    The compass is drawn as a single image, rendered at the size of the inset. The compass filling
+    80% of its bitmap, the inset is enlarged so that the compass covers 20% of the axis.
+
     Parameters
     ----------
     ax : matplotlib.axes.Axes
@@ -25,27 +61,168 @@ def add_inset(ax: Axes, base: int, legend_position: str = "upper right") -> None
     legend_position : str, optional
         Position of inset legend (default is ``upper right``).
     """
+    fig = ax.get_figure()
+    inset_ax = inset_axes(ax, width="25%", height="25%", loc=legend_position, borderpad=0)
+    inset_size = int(.25 * ax.get_position().width * fig.get_figwidth() * fig.dpi)
+    inset_ax.imshow(render_compass(base, inset_size), interpolation="none")
+    inset_ax.axis("off")
+
+
+def build_figure_template(base: int, legend_position: str = "upper right", bool_pyplot: bool = False) -> FigureTemplate:
+    """
+    Build a figure with the static parts of the plot of a base, and empty path and marker artists.
+
+    Parameters
+    ----------
+    base : int
+        Radix base (number of possible directions).
+    legend_position : str, optional
+        Position of inset legend (default is ``upper right``).
+    bool_pyplot : bool, optional
+        If ``True``, create the figure with pyplot, so that it can be shown (default is ``False``).
+
+    Returns
+    -------
+    template : FigureTemplate
+        Figure, axis and artists.
+    """
+    if bool_pyplot:
+        import matplotlib.pyplot as plt  # pylint: disable=import-outside-toplevel
+        fig, ax = plt.subplots(1, 1, figsize=(6, 6))
+    else:
+        fig = Figure(figsize=(6, 6))
+        ax = fig.add_subplot(1, 1, 1)
+
+    # path, start and stop markers, axes and inset
+    path = ax.scatter([], [], marker="o", s=1)
+    line, = ax.plot([], [], color="gray", linestyle="-", linewidth=1, alpha=.9)
+    markers = ax.scatter([], [], marker="o", s=15**2, facecolors="none", linewidths=1, zorder=3)
+    ax.axhline(y=0, c="k", ls="--", lw=1)
+    ax.axvline(x=0, c="k", ls="--", lw=1)
+    add_inset(ax, base, legend_position)
+
+    return FigureTemplate(fig, ax, path, line, markers)
+
+
+@lru_cache(maxsize=16)
+def get_figure_template(base: int, legend_position: str = "upper right") -> FigureTemplate:
+    """
+    Get the figure template of a base, built once per process (see ``build_figure_template``).
+
+    Parameters
+    ----------
+    base : int
+        Radix base (number of possible directions).
+    legend_position : str, optional
+        Position of inset legend (default is ``upper right``).
+
+    Returns
+    -------
+    template : FigureTemplate
+        Shared figure, axis and artists.
+    """
+    return build_figure_template(base, legend_position)
 
-    inset_ax = inset_axes(ax, width="20%", height="20%", loc=legend_position)
-    inset_ax.set_aspect('equal')
-    inset_ax.axis('off')
-    nb_spokes = base
-    angles = np.pi/2 - np.linspace(0, 2*np.pi, nb_spokes, endpoint=False)
-    x_spokes, y_spokes = np.cos(angles), np.sin(angles)
-    x_labels, y_labels = np.cos(angles-1./nb_spokes), np.sin(angles-1./nb_spokes)
-    for i in range(nb_spokes):
-        inset_ax.plot([0, x_spokes[i]], [0, y_spokes[i]], color='white', lw=1)
-        inset_ax.annotate("", xy=(x_spokes[i], y_spokes[i]), xytext=(0,0),
-                          arrowprops={"arrowstyle":"->", "lw":1, "mutation_scale":15})
-        inset_ax.text(x_labels[i], y_labels[i], str(i), ha='center', va='center', fontsize=10)
+
+def fill_figure_template(template: FigureTemplate, path_points: Tuple[np.ndarray, np.ndarray, np.ndarray],
+                         line_points: Tuple[np.ndarray, np.ndarray], markers: Tuple[np.ndarray, np.ndarray],
+                         title: str, bounds: Optional[Tuple[float, float, float, float]] = None) -> None:
+    """
+    Swap the data of the artists of a figure template.
+
+    Parameters
+    ----------
+    template : FigureTemplate
+        Figure to fill.
+    path_points : tuple of ndarray
+        (xs, ys, colors) of the points of the path.
+    line_points : tuple of ndarray
+        (xs, ys) of the gray line, NaNs breaking it.
+    markers : tuple of ndarray
+        (points, colors) of the markers, of shapes (nb_markers, 2) and (nb_markers, 4).
+    title : str
+        Title of the plot.
+    bounds : tuple of float, optional
+        (x_min, x_max, y_min, y_max) of the axes. If ``None`` (default), fit the path and the origin.
+    """
+    xs, ys, cols = path_points
+    template.path.set_offsets(np.column_stack((xs, ys)))
+    template.path.set_color(cols)
+    template.line.set_data(*line_points)
+    template.markers.set_offsets(markers[0])
+    template.markers.set_edgecolor(markers[1])
+    template.ax.set_title(title)
+
+    ax = template.ax
+    if bounds is None:
+        # same limits as autoscaling the path and the axes lines
+        ax.ignore_existing_data_limits = True
+        ax.update_datalim(np.column_stack((xs, ys)))
+        ax.update_datalim([(0., 0.)])
+        ax.set_autoscale_on(True)
+        ax.autoscale_view()
+    else:
+        x_min, x_max, y_min, y_max = bounds
+        ax.set_xlim(x_min, x_max)
+        ax.set_ylim(y_min, y_max)
+
+
+def output_figure(template: FigureTemplate, savepath: Optional[str], bool_show: bool) -> None:
+    """
+    Save and/or show a filled figure.
+
+    Parameters
+    ----------
+    template : FigureTemplate
+        Filled figure.
+    savepath : str or None
+        Path of the PNG image, ``None`` to not save it.
+    bool_show : bool
+        If ``True``, show the figure (built with pyplot).
+    """
+    if savepath is not None:
+        with profile_stage("savefig"):
+            template.fig.savefig(savepath, bbox_inches="tight")
+        print(f"  Plot saved:     {savepath}")
+    if bool_show:
+        template.fig.show()
+
+
+def get_template(base: int, legend_position: str, bool_show: bool) -> FigureTemplate:
+    """
+    Get the shared template of a base, or a new one to show.
+
+    Parameters
+    ----------
+    base : int
+        Radix base (number of possible directions).
+    legend_position : str
+        Position of inset legend.
+    bool_show : bool
+        If ``True``, build a new pyplot figure, its window staying open.
+
+    Returns
+    -------
+    template : FigureTemplate
+        Figure, axis and artists.
+    """
+    if bool_show:
+        return build_figure_template(base, legend_position, bool_pyplot=True)
+
+    return get_figure_template(base, legend_position)
 
 
 def plot_sequence(pt_coords: Tuple[np.ndarray, np.ndarray],
                   number_params: Tuple[str, int, int], legend_position: str = "upper right",
-                  bool_show: bool = False, bool_save: bool = True) -> None:
+                  bool_show: bool = False, bool_save: bool = True,
+                  pyramid: Optional[TrajectoryPyramid] = None) -> None:
     """
     Plot the colored path of the digit sequence.
 
+    Paths of up to ``MAX_EXACT_POINTS`` points are drawn exactly. Above, with a pyramid, only one
+    point per block of about a pixel is drawn (see ``utils.pyramid.select_blocks``), so that the
+    plotting time depends on the figure size rather than on the number of digits.
+
     Parameters
     ----------
     pt_coords : tuple of ndarray
@@ -58,36 +235,73 @@ def plot_sequence(pt_coords: Tuple[np.ndarray, np.ndarray],
         If ``True``, display the plot (default is ``False``).
     bool_save : bool, optional
         If ``True``, save the plot (default is ``True``).
+    pyramid : TrajectoryPyramid, optional
+        Level-of-detail pyramid of the trajectory.
     """
-    xs, ys = pt_coords
     expr, base, nb_digits = number_params
-    cols, avg_step = generate_path_params(nb_digits)
+    with profile_stage("plot", nb_digits):
+        if pyramid is None or len(pt_coords[0]) <= MAX_EXACT_POINTS:
+            xs, ys = pt_coords
+            cols = generate_path_colors(nb_digits)
+            avg_step = 1 if len(xs) <= MAX_EXACT_POINTS else max(1, nb_digits // 1000)
+            line_xs, line_ys = xs[::avg_step], ys[::avg_step]
+        else:
+            x_min, x_max, y_min, y_max = get_pyramid_bounds(pyramid)
+            scale = PLOT_SIZE / max(x_max - x_min, y_max - y_min, 1.)
+            xs, ys, indices = select_blocks(pyramid, scale, point_chunks=[pt_coords])
+            cols = generate_path_colors(nb_digits, indices)
+            # the line is a skeleton of the path, refined where the path is sparse
+            line_xs, line_ys, _ = select_blocks(pyramid, scale, LINE_TOLERANCE)
+            (x_first, y_first), (x_last, y_last) = pyramid.endpoints
+            line_xs = np.concatenate(([x_first], line_xs, [x_last]))
+            line_ys = np.concatenate(([y_first], line_ys, [y_last]))
 
-    fig, ax = plt.subplots(1, 1, figsize=(6, 6))
+        marker_cols = generate_path_colors(nb_digits, np.array([0, nb_digits]))
+        marker_points = np.array([[line_xs[0], line_ys[0]], [line_xs[-1], line_ys[-1]]])
+        template = get_template(base, legend_position, bool_show)
+        title = f"{nb_digits:,} digits of {build_latex_name(expr)} (base {base})"
+        fill_figure_template(template, (xs, ys, cols), (line_xs, line_ys), (marker_points, marker_cols), title)
 
-    # path
-    ax.scatter(xs, ys, color=cols, marker="o", s=1)
-    ax.plot(xs[::avg_step], ys[::avg_step], color="gray", linestyle="-", linewidth=1, alpha=.9)
+    savepath = f"out/{build_basename(expr)}_{base:03d}_{nb_digits:06d}.png" if bool_save else None
+    output_figure(template, savepath, bool_show)
 
-    # axes, start, stop and inset
-    mk, ms, mfc = "o", 15, "none"
-    ax.axhline(y=0, c="k", ls="--", lw=1)
-    ax.axvline(x=0, c="k", ls="--", lw=1)
-    ax.plot(xs[0],  ys[0],  color=cols[0],  marker=mk, ms=ms, markerfacecolor=mfc)
-    ax.plot(xs[-1], ys[-1], color=cols[-1], marker=mk, ms=ms, markerfacecolor=mfc)
-    add_inset(ax, base, legend_position)
 
-    # title
-    latex_name = build_latex_name(expr)
-    ax.set_title(f"{nb_digits:,} digits of {latex_name} (base {base})")
+def plot_window(window_points: Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray],
+                bounds: Tuple[float, float, float, float], number_params: Tuple[str, int, int], title: str,
+                markers: List[Tuple[Tuple[float, float], int]], savepath: Optional[str] = None,
+                legend_position: str = "upper right", bool_show: bool = False) -> None:
+    """
+    Plot the selected points of a region of interest of a digit trajectory.
 
-    # show or save figure?
-    if bool_save:
-        basename = build_basename(expr)
-        savepath = f"out/{basename}_{base:03d}_{nb_digits:06d}.png"
-        fig.savefig(savepath, bbox_inches="tight")
-        print(f"  Plot saved:     {savepath}")
-    if bool_show:
-        fig.show()
-    else:
-        plt.close(fig)
+    Parameters
+    ----------
+    window_points : tuple of ndarray
+        (xs, ys, indices, is_joined) of the selected points, see ``utils.pyramid.select_window``.
+        The gray line is broken where parts of the path were dropped.
+    bounds : tuple of float
+        (x_min, x_max, y_min, y_max) of the region of interest.
+    number_params : tuple
+        (expr, base, nb_digits) for the sequence.
+    title : str
+        Title of the plot.
+    markers : list of tuple
+        ((x, y), index) of each marker, colored like the digit of the same index.
+    savepath : str, optional
+        Path of the PNG image, ``None`` (default) to not save it.
+    legend_position : str, optional
+        Position of inset legend (default is ``upper right``).
+    bool_show : bool, optional
+        If ``True``, display the plot (default is ``False``).
+    """
+    xs, ys, indices, is_joined = window_points
+    _, base, nb_digits = number_params
+    with profile_stage("plot", len(xs)):
+        cols = generate_path_colors(nb_digits, indices)
+        breaks = np.flatnonzero(~is_joined) + 1
+        line_xs, line_ys = np.insert(xs, breaks, np.nan), np.insert(ys, breaks, np.nan)
+        marker_cols = generate_path_colors(nb_digits, np.array([index for _, index in markers], dtype=int))
+        marker_points = np.array([point for point, _ in markers], dtype=np.float64).reshape(-1, 2)
+        template = get_template(base, legend_position, bool_show)
+        fill_figure_template(template, (xs, ys, cols), (line_xs, line_ys), (marker_points, marker_cols), title, bounds)
+
+    output_figure(template, savepath, bool_show)
@@ -0,0 +1,732 @@
+"""
+Direct NumPy rasterization of a digit trajectory.
+
+Instead of drawing one matplotlib artist per point, the points are binned into a fixed-size
+pixel grid holding, for each pixel, the index of the last digit that reached it.
+The grid is then colored with a vectorized colormap lookup and saved as a PNG.
+The points can be fed chunk by chunk, so that memory only depends on the image size.
+Lines between consecutive points, the axes, the start/end markers and the compass inset
+are drawn on separate layers and composited at the end. The compass of each base is rendered
+once per process, and reused by every image.
+
+Constants
+---------
+RASTER_SIZE : int
+    Default width and height of the image, in pixels.
+RASTER_MARGIN : int
+    Default width of the blank margin around the path, in pixels.
+POINT_SIZE : int
+    Width of the square drawn for each point, in pixels.
+MARKER_RADIUS : int
+    Radius of the start and end markers, in pixels.
+MAX_LINE_SAMPLES : int
+    Maximal number of samples drawn at once along the lines, to bound memory.
+"""
+
+from functools import lru_cache
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+import matplotlib
+import matplotlib.image
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from utils.expression import build_basename
+from utils.plot import draw_compass
+from utils.profiling import profile_stage
+from utils.pyramid import PointChunks, TrajectoryPyramid, get_pyramid_bounds, select_blocks
+
+RASTER_SIZE      = 1024
+RASTER_MARGIN    = 16
+POINT_SIZE       = 3
+MARKER_RADIUS    = 8
+MAX_LINE_SAMPLES = 1 << 22
+
+WindowPoints = Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+
+
+def compute_bounds(point_chunks: PointChunks) -> Tuple[float, float, float, float]:
+    """
+    Compute the bounding box of a trajectory given by chunks of points.
+
+    Parameters
+    ----------
+    point_chunks : iterable of tuple of ndarray
+        Consecutive (xs, ys) chunks of the trajectory.
+
+    Returns
+    -------
+    bounds : tuple of float
+        (x_min, x_max, y_min, y_max) of the trajectory.
+    """
+    x_min, x_max, y_min, y_max = np.inf, -np.inf, np.inf, -np.inf
+    for xs, ys in point_chunks:
+        if len(xs):
+            x_min, x_max = min(x_min, xs.min()), max(x_max, xs.max())
+            y_min, y_max = min(y_min, ys.min()), max(y_max, ys.max())
+
+    return (float(x_min), float(x_max), float(y_min), float(y_max))
+
+
+def get_raster_transform(bounds: Tuple[float, float, float, float], size: int = RASTER_SIZE,
+                         margin: int = RASTER_MARGIN) -> Tuple[float, float, float]:
+    """
+    Compute the affine transform from trajectory coordinates to pixel coordinates.
+
+    Both axes share the same scale, and the trajectory is centered in the image.
+
+    Parameters
+    ----------
+    bounds : tuple of float
+        (x_min, x_max, y_min, y_max) of the trajectory.
+    size : int, optional
+        Width and height of the image, in pixels (default is ``RASTER_SIZE``).
+    margin : int, optional
+        Width of the blank margin around the path, in pixels (default is ``RASTER_MARGIN``).
+
+    Returns
+    -------
+    transform : tuple of float
+        (scale, x_offset, y_offset) such that ``col = x*scale + x_offset`` and
+        ``row = size - 1 - (y*scale + y_offset)``.
+    """
+    x_min, x_max, y_min, y_max = bounds
+    extent = max(x_max - x_min, y_max - y_min, 1.)
+    scale = (size - 1 - 2*margin) / extent
+    x_offset = (size - 1)/2 - scale*(x_min + x_max)/2
+    y_offset = (size - 1)/2 - scale*(y_min + y_max)/2
+
+    return (scale, x_offset, y_offset)
+
+
+def to_pixels(xs: np.ndarray, ys: np.ndarray, transform: Tuple[float, float, float],
+              size: int = RASTER_SIZE, bool_clip: bool = True) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Convert trajectory coordinates into (row, column) pixel indices.
+
+    Parameters
+    ----------
+    xs : ndarray of float
+        x-coordinates of the points.
+    ys : ndarray of float
+        y-coordinates of the points.
+    transform : tuple of float
+        (scale, x_offset, y_offset), see ``get_raster_transform``.
+    size : int, optional
+        Width and height of the image, in pixels (default is ``RASTER_SIZE``).
+    bool_clip : bool, optional
+        If ``True`` (default), clip the indices to the image. Otherwise, the points out of the image
+        get indices out of [0, size).
+
+    Returns
+    -------
+    rows : ndarray of int
+        Row indices, 0 being the top of the image.
+    cols : ndarray of int
+        Column indices.
+    """
+    scale, x_offset, y_offset = transform
+    cols = np.rint(xs*scale + x_offset)
+    rows = size - 1 - np.rint(ys*scale + y_offset)
+    if bool_clip:
+        return (np.clip(rows, 0, size-1).astype(np.intp), np.clip(cols, 0, size-1).astype(np.intp))
+
+    # out of the image, but within the range of the indices
+    bound = 2*size
+
+    return (np.clip(rows, -bound, bound).astype(np.intp), np.clip(cols, -bound, bound).astype(np.intp))
+
+
+def crop_pixels(rows: np.ndarray, cols: np.ndarray, size: int) -> np.ndarray:
+    """
+    Find the pixels that lie in the image.
+
+    Parameters
+    ----------
+    rows : ndarray of int
+        Row indices, see ``to_pixels``.
+    cols : ndarray of int
+        Column indices.
+    size : int
+        Width and height of the image, in pixels.
+
+    Returns
+    -------
+    is_visible : ndarray of bool
+        ``True`` for the pixels in the image.
+    """
+    return (rows >= 0) & (rows < size) & (cols >= 0) & (cols < size)
+
+
+def rasterize_points(index_grid: np.ndarray, xs: np.ndarray, ys: np.ndarray, first_index: int,
+                     transform: Tuple[float, float, float], point_size: int = POINT_SIZE,
+                     indices: Optional[np.ndarray] = None, bool_crop: bool = False) -> None:
+    """
+    Bin a chunk of points into an index grid, in place.
+
+    Each pixel keeps the largest digit index that reached it, like the last point drawn on top
+    of the previous ones in a scatter plot.
+
+    Parameters
+    ----------
+    index_grid : ndarray of int
+        Square grid of digit indices, -1 for empty pixels.
+    xs : ndarray of float
+        x-coordinates of the points.
+    ys : ndarray of float
+        y-coordinates of the points.
+    first_index : int
+        Index of the first point of the chunk in the whole trajectory.
+    transform : tuple of float
+        (scale, x_offset, y_offset), see ``get_raster_transform``.
+    point_size : int, optional
+        Width of the square drawn for each point, in pixels (default is ``POINT_SIZE``).
+    indices : ndarray of int, optional
+        Digit index of each point, e.g. of the blocks of a pyramid. If ``None`` (default),
+        the points are consecutive from ``first_index``.
+    bool_crop : bool, optional
+        If ``True``, drop the points out of the image, e.g. for a zoom. Otherwise (default),
+        they are clipped to its border.
+    """
+    size = index_grid.shape[0]
+    rows, cols = to_pixels(xs, ys, transform, size, bool_clip=not bool_crop)
+    if indices is None:
+        indices = np.arange(first_index, first_index + len(xs), dtype=index_grid.dtype)
+    if bool_crop:
+        is_visible = crop_pixels(rows, cols, size)
+        rows, cols, indices = rows[is_visible], cols[is_visible], indices[is_visible]
+    offsets = np.arange(point_size) - point_size//2
+    for row_offset in offsets:
+        for col_offset in offsets:
+            flat_indices = (np.clip(rows + row_offset, 0, size-1)*size
+                            + np.clip(cols + col_offset, 0, size-1))
+            np.maximum.at(index_grid.ravel(), flat_indices, indices)
+
+
+def colorize_index_grid(index_grid: np.ndarray, nb_digits: int, cmap_name: str = "RdYlBu"
+                        ) -> np.ndarray:
+    """
+    Color an index grid with a vectorized colormap lookup over digit indices.
+
+    Point ``i`` gets the same color as in ``utils.plot.generate_path_colors``,
+    empty pixels are white.
+
+    Parameters
+    ----------
+    index_grid : ndarray of int
+        Grid of digit indices, -1 for empty pixels.
+    nb_digits : int
+        Number of digits in the sequence.
+    cmap_name : str, optional
+        Name of the matplotlib colormap (default is ``RdYlBu``).
+
+    Returns
+    -------
+    rgba : ndarray of uint8
+        Image of shape (size, size, 4).
+    """
+    cmap = matplotlib.colormaps[cmap_name]
+    rgba = cmap((index_grid - 1) / nb_digits, bytes=True)
+    rgba[index_grid < 0] = 255
+
+    return rgba
+
+
+def rasterize_segments(line_grid: np.ndarray, xs: np.ndarray, ys: np.ndarray,
+                       transform: Tuple[float, float, float], is_joined: Optional[np.ndarray] = None,
+                       bool_crop: bool = False) -> None:
+    """
+    Draw the segments between consecutive points into a boolean grid, in place.
+
+    Each segment is sampled about once per pixel along its length, all segments at once.
+
+    Parameters
+    ----------
+    line_grid : ndarray of bool
+        Square grid, ``True`` where a line goes through the pixel.
+    xs : ndarray of float
+        x-coordinates of the points.
+    ys : ndarray of float
+        y-coordinates of the points.
+    transform : tuple of float
+        (scale, x_offset, y_offset), see ``get_raster_transform``.
+    is_joined : ndarray of bool, optional
+        For each pair of consecutive points, ``True`` if they are joined by a segment.
+        If ``None`` (default), all of them are.
+    bool_crop : bool, optional
+        If ``True``, drop the samples out of the image, e.g. for a zoom. Otherwise (default),
+        they are clipped to its border.
+    """
+    size = line_grid.shape[0]
+    scale = transform[0]
+    nb_samples = max(1, int(np.ceil(scale)))
+    ts = np.arange(nb_samples) / nb_samples
+    nb_segments_per_batch = max(1, MAX_LINE_SAMPLES // nb_samples)
+    for start in range(0, len(xs) - 1, nb_segments_per_batch):
+        x0s = xs[start:(start+nb_segments_per_batch+1)]
+        y0s = ys[start:(start+nb_segments_per_batch+1)]
+        x_samples = x0s[:-1, None] + ts[None, :]*np.diff(x0s)[:, None]
+        y_samples = y0s[:-1, None] + ts[None, :]*np.diff(y0s)[:, None]
+        if is_joined is not None:
+            batch_is_joined = is_joined[start:(start+nb_segments_per_batch)]
+            x_samples, y_samples = x_samples[batch_is_joined], y_samples[batch_is_joined]
+        rows, cols = to_pixels(x_samples.ravel(), y_samples.ravel(), transform, size, bool_clip=not bool_crop)
+        if bool_crop:
+            is_visible = crop_pixels(rows, cols, size)
+            rows, cols = rows[is_visible], cols[is_visible]
+        line_grid[rows, cols] = True
+
+
+def draw_marker(rgba: np.ndarray, row: int, col: int, color: np.ndarray,
+                radius: int = MARKER_RADIUS) -> None:
+    """
+    Draw a hollow circle marker on an image, in place.
+
+    Parameters
+    ----------
+    rgba : ndarray of uint8
+        Image of shape (size, size, 4).
+    row : int
+        Row of the center of the marker.
+    col : int
+        Column of the center of the marker.
+    color : ndarray of uint8
+        RGBA color of the marker.
+    radius : int, optional
+        Radius of the marker, in pixels (default is ``MARKER_RADIUS``).
+    """
+    # only the square around the circle is visited
+    size = rgba.shape[0]
+    row_min, row_max = max(0, row - radius - 1), min(size, row + radius + 2)
+    col_min, col_max = max(0, col - radius - 1), min(size, col + radius + 2)
+    if row_min >= row_max or col_min >= col_max:
+        return
+    rows, cols = np.ogrid[row_min:row_max, col_min:col_max]
+    distances = np.hypot(rows - row, cols - col)
+    rgba[row_min:row_max, col_min:col_max][np.abs(distances - radius) < 1] = color
+
+
+def draw_axes(rgba: np.ndarray, transform: Tuple[float, float, float], dash_length: int = 6) -> None:
+    """
+    Draw the dashed x=0 and y=0 axes on an image, in place.
+
+    Parameters
+    ----------
+    rgba : ndarray of uint8
+        Image of shape (size, size, 4).
+    transform : tuple of float
+        (scale, x_offset, y_offset), see ``get_raster_transform``.
+    dash_length : int, optional
+        Length of the dashes and of the gaps between them, in pixels (default is 6).
+    """
+    size = rgba.shape[0]
+    origin_row, origin_col = to_pixels(np.zeros(1), np.zeros(1), transform, size, bool_clip=False)
+    is_dash = (np.arange(size) // dash_length) % 2 == 0
+    if 0 <= origin_row[0] < size:
+        rgba[origin_row[0], is_dash] = (0, 0, 0, 255)
+    if 0 <= origin_col[0] < size:
+        rgba[is_dash, origin_col[0]] = (0, 0, 0, 255)
+
+
+@lru_cache(maxsize=64)
+def render_compass(base: int, size: int) -> np.ndarray:
+    """
+    Render the compass of a given base into a transparent bitmap, once per (base, size).
+
+    Parameters
+    ----------
+    base : int
+        Radix base (number of possible directions).
+    size : int
+        Width and height of the bitmap, in pixels.
+
+    Returns
+    -------
+    rgba : ndarray of uint8
+        Read-only bitmap of shape (size, size, 4), shared by all the callers.
+    """
+    dpi = 100
+    fig = Figure(figsize=(size/dpi, size/dpi), dpi=dpi)
+    fig.patch.set_alpha(0)
+    canvas = FigureCanvasAgg(fig)
+    ax = fig.add_axes((.1, .1, .8, .8))
+    draw_compass(ax, base)
+    canvas.draw()
+    rgba = np.asarray(canvas.buffer_rgba())[:size, :size].copy()
+    rgba.flags.writeable = False
+
+    return rgba
+
+
+def add_raster_inset(rgba: np.ndarray, base: int, legend_position: str = "upper right") -> None:
+    """
+    Alpha-blend the compass of a given base in a corner of an image, in place.
+
+    Parameters
+    ----------
+    rgba : ndarray of uint8
+        Image of shape (size, size, 4).
+    base : int
+        Radix base (number of possible directions).
+    legend_position : str, optional
+        Position of the inset, as ``"<upper|lower> <left|right>"`` (default is ``upper right``).
+    """
+    size = rgba.shape[0]
+    compass = render_compass(base, size // 5)
+    inset_size = compass.shape[0]
+    row = 0 if "upper" in legend_position else size - inset_size
+    col = size - inset_size if "right" in legend_position else 0
+    window = rgba[row:(row+inset_size), col:(col+inset_size)]
+    alpha = compass[..., 3:] / 255
+    window[..., :3] = np.rint(compass[..., :3]*alpha + window[..., :3]*(1-alpha)).astype(np.uint8)
+
+
+def rasterize_point_chunks(index_grid: np.ndarray, line_grid: np.ndarray, point_chunks: PointChunks,
+                           transform: Tuple[float, float, float], bool_lines: bool = True
+                           ) -> Tuple[Optional[Tuple[float, float]], Optional[Tuple[float, float]]]:
+    """
+    Bin all the points of a trajectory given by chunks, and draw the lines between them, in place.
+
+    Parameters
+    ----------
+    index_grid : ndarray of int
+        Square grid of digit indices, -1 for empty pixels.
+    line_grid : ndarray of bool
+        Square grid, ``True`` where a line goes through the pixel.
+    point_chunks : iterable of tuple of ndarray
+        Consecutive (xs, ys) chunks of the trajectory.
+    transform : tuple of float
+        (scale, x_offset, y_offset), see ``get_raster_transform``.
+    bool_lines : bool, optional
+        If ``True``, draw lines between consecutive points (default is ``True``).
+
+    Returns
+    -------
+    start_point : tuple of float or None
+        First point of the trajectory, ``None`` if it is empty.
+    end_point : tuple of float or None
+        Last point of the trajectory, ``None`` if it is empty.
+    """
+    first_index = 0
+    start_point, end_point = None, None
+    for xs, ys in point_chunks:
+        if not len(xs):
+            continue
+        rasterize_points(index_grid, xs, ys, first_index, transform)
+        if bool_lines:
+            # join the chunk to the end of the previous one
+            if end_point is None:
+                rasterize_segments(line_grid, xs, ys, transform)
+            else:
+                rasterize_segments(line_grid, np.append(end_point[0], xs), np.append(end_point[1], ys),
+                                   transform)
+        if start_point is None:
+            start_point = (xs[0], ys[0])
+        end_point = (xs[-1], ys[-1])
+        first_index += len(xs)
+
+    return (start_point, end_point)
+
+
+def render_background(transform: Tuple[float, float, float], size: int = RASTER_SIZE) -> np.ndarray:
+    """
+    Render the bottom layer of an image: the dashed axes on a white background.
+
+    Parameters
+    ----------
+    transform : tuple of float
+        (scale, x_offset, y_offset), see ``get_raster_transform``.
+    size : int, optional
+        Width and height of the image, in pixels (default is ``RASTER_SIZE``).
+
+    Returns
+    -------
+    background : ndarray of uint8
+        Image of shape (size, size, 4).
+    """
+    background = np.full((size, size, 4), 255, dtype=np.uint8)
+    draw_axes(background, transform)
+
+    return background
+
+
+def colorize_layers(index_grid: np.ndarray, line_grid: np.ndarray, background: np.ndarray,
+                    nb_digits: int) -> np.ndarray:
+    """
+    Color the points of an index grid over the lines and the background.
+
+    The grids may be matching windows of whole images, to only recolor a region.
+
+    Parameters
+    ----------
+    index_grid : ndarray of int
+        Grid of digit indices, -1 for empty pixels.
+    line_grid : ndarray of bool
+        Grid of the same shape, ``True`` where a line goes through the pixel.
+    background : ndarray of uint8
+        Background of the same shape, with 4 channels, see ``render_background``.
+    nb_digits : int
+        Number of digits in the sequence.
+
+    Returns
+    -------
+    rgba : ndarray of uint8
+        Image of the shape of the grids, with 4 channels.
+    """
+    rgba = colorize_index_grid(index_grid, nb_digits)
+    is_empty = index_grid < 0
+    rgba[is_empty] = background[is_empty]
+    rgba[is_empty & line_grid] = (128, 128, 128, 255)
+
+    return rgba
+
+
+def compose_layers(index_grid: np.ndarray, line_grid: np.ndarray, transform: Tuple[float, float, float],
+                   nb_digits: int, base: int, markers: List[Tuple[Tuple[float, float], int]],
+                   legend_position: Optional[str] = "upper right") -> np.ndarray:
+    """
+    Composite the layers of a rasterized trajectory, from bottom to top: axes, lines, points, markers, compass.
+
+    Parameters
+    ----------
+    index_grid : ndarray of int
+        Square grid of digit indices, -1 for empty pixels.
+    line_grid : ndarray of bool
+        Square grid, ``True`` where a line goes through the pixel.
+    transform : tuple of float
+        (scale, x_offset, y_offset), see ``get_raster_transform``.
+    nb_digits : int
+        Number of digits in the sequence.
+    base : int
+        Radix base (number of possible directions).
+    markers : list of tuple
+        ((x, y), index) of each marker, colored like the digit of the same index.
+    legend_position : str, optional
+        Position of the compass inset (default is ``upper right``), ``None`` to omit it.
+
+    Returns
+    -------
+    rgba : ndarray of uint8
+        Image of shape (size, size, 4).
+    """
+    size = index_grid.shape[0]
+    rgba = colorize_layers(index_grid, line_grid, render_background(transform, size), nb_digits)
+
+    if markers:
+        marker_colors = colorize_index_grid(np.array([[index for _, index in markers]]), nb_digits)[0]
+        for (point, _), color in zip(markers, marker_colors):
+            rows, cols = to_pixels(np.array([point[0]]), np.array([point[1]]), transform, size, bool_clip=False)
+            draw_marker(rgba, rows[0], cols[0], color)
+    if legend_position:
+        add_raster_inset(rgba, base, legend_position)
+
+    return rgba
+
+
+def rasterize_sequence(point_chunks_factory: Callable[[], PointChunks], number_params: Tuple[str, int, int],
+                       size: int = RASTER_SIZE, bool_lines: bool = True,
+                       legend_position: Optional[str] = "upper right",
+                       pyramid: Optional[TrajectoryPyramid] = None) -> np.ndarray:
+    """
+    Rasterize a whole trajectory given by chunks of points, with memory bounded by the image size.
+
+    Without pyramid, the points are read twice: once to compute the bounding box, once to bin them.
+    With a pyramid, the bounding box is known, and only one point per block of about a pixel
+    is binned (see ``utils.pyramid.select_blocks``): the points are only read for the parts
+    of the path that are too sparse for the pyramid.
+
+    Parameters
+    ----------
+    point_chunks_factory : callable
+        Function returning a new iterable over the consecutive (xs, ys) chunks of the trajectory.
+    number_params : tuple
+        (expr, base, nb_digits) for the sequence.
+    size : int, optional
+        Width and height of the image, in pixels (default is ``RASTER_SIZE``).
+    bool_lines : bool, optional
+        If ``True``, draw gray lines between consecutive points (default is ``True``).
+    legend_position : str, optional
+        Position of the compass inset (default is ``upper right``), ``None`` to omit it.
+    pyramid : TrajectoryPyramid, optional
+        Level-of-detail pyramid of the trajectory.
+
+    Returns
+    -------
+    rgba : ndarray of uint8
+        Image of shape (size, size, 4).
+    """
+    _, base, nb_digits = number_params
+    bounds = compute_bounds(point_chunks_factory()) if pyramid is None else get_pyramid_bounds(pyramid)
+    transform = get_raster_transform(bounds, size)
+
+    index_grid = np.full((size, size), -1, dtype=np.int64)
+    line_grid = np.zeros((size, size), dtype=bool)
+    if pyramid is None:
+        start_point, end_point = rasterize_point_chunks(index_grid, line_grid, point_chunks_factory(), transform,
+                                                        bool_lines)
+    else:
+        xs, ys, indices = select_blocks(pyramid, transform[0], point_chunks=point_chunks_factory())
+        rasterize_points(index_grid, xs, ys, 0, transform, indices=indices)
+        start_point, end_point = pyramid.endpoints
+        if bool_lines:
+            rasterize_segments(line_grid, np.concatenate(([start_point[0]], xs, [end_point[0]])),
+                               np.concatenate(([start_point[1]], ys, [end_point[1]])), transform)
+
+    markers = [(start_point, 0), (end_point, nb_digits)] if start_point is not None else []
+
+    return compose_layers(index_grid, line_grid, transform, nb_digits, base, markers, legend_position)
+
+
+def show_image(rgba: np.ndarray, title: str) -> None:
+    """
+    Show a rendered image in a pyplot window, at its size in pixels.
+
+    Parameters
+    ----------
+    rgba : ndarray of uint8
+        Image of shape (height, width, 4).
+    title : str
+        Title of the window.
+    """
+    import matplotlib.pyplot as plt  # pylint: disable=import-outside-toplevel
+    dpi = 100
+    fig = plt.figure(figsize=(rgba.shape[1] / dpi, rgba.shape[0] / dpi), dpi=dpi)
+    fig.figimage(rgba)
+    fig.canvas.manager.set_window_title(title)
+    fig.show()
+
+
+def plot_sequence_raster(point_chunks_factory: Callable[[], PointChunks],
+                         number_params: Tuple[str, int, int], legend_position: str = "upper right",
+                         size: int = RASTER_SIZE, bool_lines: bool = True, bool_show: bool = False,
+                         bool_save: bool = True, pyramid: Optional[TrajectoryPyramid] = None) -> np.ndarray:
+    """
+    Rasterize the colored path of a digit sequence, and save it as a PNG and/or show it.
+
+    Parameters
+    ----------
+    point_chunks_factory : callable
+        Function returning a new iterable over the consecutive (xs, ys) chunks of the trajectory.
+    number_params : tuple
+        (expr, base, nb_digits) for the sequence.
+    legend_position : str, optional
+        Position of the compass inset (default is ``upper right``).
+    size : int, optional
+        Width and height of the image, in pixels (default is ``RASTER_SIZE``).
+    bool_lines : bool, optional
+        If ``True``, draw gray lines between consecutive points (default is ``True``).
+    bool_show : bool, optional
+        If ``True``, show the image (default is ``False``).
+    bool_save : bool, optional
+        If ``True``, save the image (default is ``True``).
+    pyramid : TrajectoryPyramid, optional
+        Level-of-detail pyramid of the trajectory, see ``rasterize_sequence``.
+
+    Returns
+    -------
+    rgba : ndarray of uint8
+        Image of shape (size, size, 4).
+    """
+    expr, base, nb_digits = number_params
+    with profile_stage("rasterize", nb_digits):
+        rgba = rasterize_sequence(point_chunks_factory, number_params, size, bool_lines, legend_position, pyramid)
+
+    if bool_save:
+        basename = build_basename(expr)
+        savepath = f"out/{basename}_{base:03d}_{nb_digits:06d}.png"
+        with profile_stage("savefig"):
+            matplotlib.image.imsave(savepath, rgba)
+        print(f"  Plot saved:     {savepath}")
+    if bool_show:
+        show_image(rgba, f"{nb_digits:,} digits of {expr} (base {base})")
+
+    return rgba
+
+
+def rasterize_window(window_points: WindowPoints, bounds: Tuple[float, float, float, float],
+                     number_params: Tuple[str, int, int], markers: List[Tuple[Tuple[float, float], int]],
+                     size: int = RASTER_SIZE, bool_lines: bool = True,
+                     legend_position: Optional[str] = "upper right") -> np.ndarray:
+    """
+    Rasterize the selected points of a region of interest, the points out of its bounds being dropped.
+
+    Parameters
+    ----------
+    window_points : tuple of ndarray
+        (xs, ys, indices, is_joined) of the selected points, see ``utils.pyramid.select_window``.
+    bounds : tuple of float
+        (x_min, x_max, y_min, y_max) of the region of interest, fitted in the image.
+    number_params : tuple
+        (expr, base, nb_digits) for the sequence.
+    markers : list of tuple
+        ((x, y), index) of each marker, see ``compose_layers``.
+    size : int, optional
+        Width and height of the image, in pixels (default is ``RASTER_SIZE``).
+    bool_lines : bool, optional
+        If ``True``, draw gray lines between consecutive points (default is ``True``).
+    legend_position : str, optional
+        Position of the compass inset (default is ``upper right``), ``None`` to omit it.
+
+    Returns
+    -------
+    rgba : ndarray of uint8
+        Image of shape (size, size, 4).
+    """
+    _, base, nb_digits = number_params
+    xs, ys, indices, is_joined = window_points
+    transform = get_raster_transform(bounds, size)
+
+    index_grid = np.full((size, size), -1, dtype=np.int64)
+    line_grid = np.zeros((size, size), dtype=bool)
+    rasterize_points(index_grid, xs, ys, 0, transform, indices=indices, bool_crop=True)
+    if bool_lines:
+        rasterize_segments(line_grid, xs, ys, transform, is_joined=is_joined, bool_crop=True)
+
+    return compose_layers(index_grid, line_grid, transform, nb_digits, base, markers, legend_position)
+
+
+def plot_window_raster(window_points: WindowPoints, bounds: Tuple[float, float, float, float],
+                       number_params: Tuple[str, int, int], markers: List[Tuple[Tuple[float, float], int]],
+                       savepath: Optional[str] = None, legend_position: str = "upper right",
+                       size: int = RASTER_SIZE, bool_show: bool = False) -> np.ndarray:
+    """
+    Rasterize a region of interest of a trajectory, and save it as a PNG and/or show it.
+
+    Parameters
+    ----------
+    window_points : tuple of ndarray
+        (xs, ys, indices, is_joined) of the selected points, see ``utils.pyramid.select_window``.
+    bounds : tuple of float
+        (x_min, x_max, y_min, y_max) of the region of interest.
+    number_params : tuple
+        (expr, base, nb_digits) for the sequence.
+    markers : list of tuple
+        ((x, y), index) of each marker, see ``compose_layers``.
+    savepath : str, optional
+        Path of the PNG image, ``None`` (default) to not save it.
+    legend_position : str, optional
+        Position of the compass inset (default is ``upper right``).
+    size : int, optional
+        Width and height of the image, in pixels (default is ``RASTER_SIZE``).
+    bool_show : bool, optional
+        If ``True``, show the image (default is ``False``).
+
+    Returns
+    -------
+    rgba : ndarray of uint8
+        Image of shape (size, size, 4).
+    """
+    with profile_stage("rasterize", len(window_points[0])):
+        rgba = rasterize_window(window_points, bounds, number_params, markers, size,
+                                legend_position=legend_position)
+
+    if savepath is not None:
+        with profile_stage("savefig"):
+            matplotlib.image.imsave(savepath, rgba)
+        print(f"  Plot saved:     {savepath}")
+    if bool_show:
+        expr, base, nb_digits = number_params
+        show_image(rgba, f"{nb_digits:,} digits of {expr} (base {base}), zoom")
+
+    return rgba